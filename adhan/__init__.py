@@ -18,4 +18,61 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 """
 
-from .adhan import adhan
+from importlib import import_module
+
+from .adhan import adhan, PrayerCalculator
+from .location import Location
+from .queries import next_prayer, previous_prayer
+
+#
+# The core API above only needs the standard library's lighter modules, so
+# importing adhan stays cheap for short-lived processes. Everything built on
+# NumPy, mmap, multiprocessing or asyncio is imported on first access
+# instead, as adhan.<name> or with from adhan import <name>.
+#
+_LAZY_SUBMODULES = frozenset([
+    'batch',
+    'events',
+    'fitted',
+    'grid',
+    'parallel',
+    'scheduler',
+    'sharedcache',
+    'store',
+    'timetable',
+])
+
+_LAZY_ATTRIBUTES = {
+    'adhan_grid': 'batch',
+    'EventIndex': 'events',
+    'FittedCalculator': 'fitted',
+    'LatitudeGrid': 'grid',
+    'build_timetables': 'parallel',
+    'PrayerScheduler': 'scheduler',
+    'SharedResultCache': 'sharedcache',
+    'LocationStore': 'store',
+    'TimetableFile': 'timetable',
+    'iter_times': 'timetable',
+    'write_timetable': 'timetable',
+}
+
+
+def __getattr__(name):
+    """Import lazily loaded submodules and their names on first access."""
+    if name in _LAZY_SUBMODULES:
+        return import_module('.' + name, __name__)
+
+    if name in _LAZY_ATTRIBUTES:
+        module = import_module('.' + _LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+
+    raise AttributeError(
+        'module %r has no attribute %r' % (__name__, name)
+    )
+
+
+def __dir__():
+    """List the eager and lazily loaded names of the package."""
+    return sorted(set(globals()) | _LAZY_SUBMODULES | set(_LAZY_ATTRIBUTES))
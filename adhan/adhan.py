@@ -19,22 +19,115 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 import math
 
+from array import array
+from collections import namedtuple
 from datetime import datetime, timedelta
-from functools import partial
 
 # from adhan import calculations, methods
 
 from .calculations import (
-    compute_time_at_sun_angle,
+    LRUCache,
+    NAN,
+    SOLAR_CACHES,
+    compute_hour_angle,
+    compute_hour_angle_or_nan,
+    compute_shadow_hour_angle,
     compute_zuhr_utc,
-    time_at_shadow_length,
+    solar_ephemeris,
 )
 
-from .methods import ASR_STANDARD
+from .location import Location, as_location
+from .zones import get_zone, is_zone, zone_transitions
+from .methods import compile_method
 
 SUNRISE_ANGLE = 0.833
 SUNSET_ANGLE = 0.833
 
+SIN_SUNRISE_ANGLE = math.sin(math.radians(SUNRISE_ANGLE))
+SIN_SUNSET_ANGLE = math.sin(math.radians(SUNSET_ANGLE))
+
+PrayerTimes = namedtuple('PrayerTimes', [
+    'fajr',
+    'shuruq',
+    'zuhr',
+    'asr',
+    'maghrib',
+    'isha',
+])
+
+#
+# The time from Zuhr to each of the other prayers
+#
+LatitudeOffsets = namedtuple('LatitudeOffsets', [
+    'fajr',
+    'shuruq',
+    'asr',
+    'maghrib',
+    'isha',
+])
+
+#
+# The times of arbitrary solar events on a day, from times_at_angles
+#
+AngleTimes = namedtuple('AngleTimes', [
+    'zuhr',
+    'before',
+    'after',
+    'shadows',
+])
+
+OUTPUTS = ('datetime', 'minutes', 'hours')
+
+#
+# An optional cache of whole days of rounded times behind adhan(), such as
+# adhan.sharedcache.SharedResultCache, set with set_result_cache
+#
+_RESULT_CACHE = None
+
+LATITUDE_PRECISION = 0.01
+LATITUDE_OFFSETS_CACHE_SIZE = 4096
+
+
+class TimetableRow(namedtuple('TimetableRow', ('day',) + PrayerTimes._fields)):
+    """The adhan times of a day as whole minutes since local midnight.
+
+    This is the compact form of what adhan() returns: no datetime objects are
+    created until one of the conversion methods is called. Minutes can be
+    negative or past 1440 when a prayer falls on the previous or next day.
+    """
+
+    __slots__ = ()
+
+    def to_datetime(self, name):
+        """Return the time of a prayer as a naive local datetime.
+
+        A row holds no time zone, so this is the datetime adhan() returns
+        with a fixed timezone_offset. For a row calculated with a time zone
+        it is the same wall clock time, but naive: the caller must localize
+        it, e.g. with replace(tzinfo=zone), which gives adhan()'s datetime
+        except in the hour repeated when clocks go back, where adhan() also
+        sets fold for the second occurrence.
+
+        :param name: The name of the prayer, e.g. 'fajr'
+        :returns: A naive datetime of the prayer's local time
+        """
+        day = self.day
+        midnight = datetime(year=day.year, month=day.month, day=day.day)
+        return midnight + timedelta(minutes=getattr(self, name))
+
+    def to_datetimes(self):
+        """Return a dict of naive local datetimes, as to_datetime."""
+        return dict(
+            (name, self.to_datetime(name)) for name in PrayerTimes._fields
+        )
+
+    def to_strings(self):
+        """Return a dict of the prayer times formatted as 'HH:MM'."""
+        return dict(
+            (name, '%02d:%02d' % divmod(getattr(self, name) % 1440, 60))
+            for name in PrayerTimes._fields
+        )
+
 
 def floating_point_to_datetime(day, fp_time):
     """Convert a floating point time to a datetime."""
@@ -43,71 +136,591 @@ def floating_point_to_datetime(day, fp_time):
     return result
 
 
-def adhan(day, location, parameters, timezone_offset=0):
-    """Calculate adhan times given the parameters.
+def floating_point_to_minutes(fp_time):
+    """Convert a floating point time to whole minutes since midnight.
 
-    This function will compute the adhan times for a certain location on
-    certain day. The method for calculating the prayers as well as the time for
-    Asr can also be specified. The timezone offset naively adds the specified
-    number of hours to each time that is returned.
+    Rounds the same way as floating_point_to_datetime.
+    """
+    return int(math.ceil(60 * fp_time))
 
-    :param day: The datetime.date to calculate for
-    :param location: 2-tuple of floating point coordiantes for latitude and
-                     longitude of location in degrees
-    :param parameters: A dictionary-like object of parameters for computing
-                       adhan times. Commonly used calculation methods are
-                       available in the adhan.methods module
-    :param timezone_offset: The number of hours to add to each prayer time
-                            to account for timezones. Can be floating point
 
+def compute_latitude_offsets(location, plan, ephemeris):
+    """Compute the time between Zuhr and every other prayer.
+
+    These offsets depend only on the day (through its ephemeris) and the
+    latitude; longitude only moves Zuhr. Adding them to Zuhr with
+    prayer_times_from_offsets gives the same times as compute_prayer_times.
+
+    :param location: A Location; only its latitude terms are used
+    :param plan: A CalculationPlan from adhan.methods.compile_method
+    :param ephemeris: The Ephemeris of the day
+    :returns: A LatitudeOffsets of floating point hours, negative for the
+              prayers before Zuhr
     """
-    latitude, longitude = location
+    sin_latitude = location.sin_latitude
+    cos_latitude = location.cos_latitude
+
+    def time_at_sun_angle(sin_angle):
+        return compute_hour_angle(
+            sin_angle, sin_latitude, cos_latitude, ephemeris
+        )
+
+    shuruq = time_at_sun_angle(SIN_SUNRISE_ANGLE)
+    maghrib = time_at_sun_angle(SIN_SUNSET_ANGLE)
 
     #
-    # To reduce a little repetitiveness, using a partial function that has the
-    # day and latitude already set
+    # Most methods define Isha as a certain angle the sun has to be below
+    # the horizon, but some methods define it as a certain number of minutes
+    # after Maghrib
     #
-    time_at_sun_angle = partial(
-        compute_time_at_sun_angle,
-        day=day,
-        latitude=latitude
+    if plan.high_latitude_rule is not None:
+        fajr, isha = _high_latitude_hour_angles(
+            location, plan, ephemeris, shuruq, maghrib
+        )
+    else:
+        fajr = time_at_sun_angle(plan.sin_fajr_angle)
+        isha = None
+        if not plan.isha_delay:
+            isha = time_at_sun_angle(plan.sin_isha_angle)
+
+    if plan.isha_delay:
+        isha = maghrib + plan.isha_delay
+
+    return LatitudeOffsets(
+        fajr=-fajr,
+        shuruq=-shuruq,
+        asr=compute_shadow_hour_angle(
+            plan.asr_multiplier, location.latitude_rad, sin_latitude,
+            cos_latitude, ephemeris
+        ),
+        maghrib=maghrib,
+        isha=isha,
+    )
+
+
+def _high_latitude_hour_angles(location, plan, ephemeris, shuruq, maghrib):
+    """Compute the Fajr and Isha hour angles under a high latitude rule.
+
+    Fajr is kept within the plan's portion of the night before sunrise, and
+    Isha within its portion after sunset, taking the place of times the sun
+    doesn't reach as well as those too far from sunrise or sunset.
+
+    :returns: A (fajr, isha) pair of hour angles; isha is None for plans
+              with an Isha delay
+    """
+    night = 24 - (shuruq + maghrib)
+
+    fajr = compute_hour_angle_or_nan(
+        plan.sin_fajr_angle, location.sin_latitude, location.cos_latitude,
+        ephemeris
     )
+    portion = plan.fajr_night_portion * night
+    # Comparisons with NaN are false, so undefined times are replaced too
+    if not fajr - shuruq <= portion:
+        fajr = shuruq + portion
 
-    zuhr_time = compute_zuhr_utc(day, longitude)
+    if plan.isha_night_portion is None:
+        return fajr, None
 
-    shuruq_time = zuhr_time - time_at_sun_angle(angle=SUNRISE_ANGLE)
-    maghrib_time = zuhr_time + time_at_sun_angle(angle=SUNSET_ANGLE)
+    isha = compute_hour_angle_or_nan(
+        plan.sin_isha_angle, location.sin_latitude, location.cos_latitude,
+        ephemeris
+    )
+    portion = plan.isha_night_portion * night
+    if not isha - maghrib <= portion:
+        isha = maghrib + portion
 
-    fajr_time = zuhr_time - time_at_sun_angle(angle=parameters['fajr_angle'])
+    return fajr, isha
+
+
+def prayer_times_from_offsets(zuhr_time, offsets, plan):
+    """Combine Zuhr with the other prayers' offsets from it.
+
+    :param zuhr_time: The floating point UTC time of Zuhr
+    :param offsets: A LatitudeOffsets
+    :param plan: The CalculationPlan the offsets were computed with
+    :returns: A PrayerTimes of floating point UTC hours since midnight
+    """
+    maghrib_time = zuhr_time + offsets.maghrib
 
     #
-    # Most methods define Isha as a certain angle the sun has to be below
-    # the horizon, but some methods define it as a certain number of minutes
-    # after Maghrib
+    # Added to Maghrib rather than Zuhr so the result rounds exactly like
+    # the Isha delay has always been applied
     #
-    if parameters.get('isha_delay', None):
-        isha_time = maghrib_time + parameters['isha_delay']
+    if plan.isha_delay:
+        isha_time = maghrib_time + plan.isha_delay
     else:
-        isha_time = (
-            zuhr_time +
-            time_at_sun_angle(angle=parameters['isha_angle'])
-        )
+        isha_time = zuhr_time + offsets.isha
+
+    return PrayerTimes(
+        zuhr_time + offsets.fajr,
+        zuhr_time + offsets.shuruq,
+        zuhr_time,
+        zuhr_time + offsets.asr,
+        maghrib_time,
+        isha_time,
+    )
+
+
+def compute_prayer_times(day, location, plan, ephemeris=None):
+    """Compute the UTC floating point time of every prayer on a day.
+
+    :param day: The datetime.date to calculate for
+    :param location: A Location
+    :param plan: A CalculationPlan from adhan.methods.compile_method
+    :param ephemeris: Optional precomputed Ephemeris for day
+    :returns: A PrayerTimes of floating point UTC hours since midnight
+    """
+    #
+    # Every prayer shares the same solar declination and equation of time,
+    # so look them up once for the day
+    #
+    if ephemeris is None:
+        ephemeris = solar_ephemeris(day)
+
+    zuhr_time = compute_zuhr_utc(day, location.longitude, ephemeris=ephemeris)
+    offsets = compute_latitude_offsets(location, plan, ephemeris)
+
+    return prayer_times_from_offsets(zuhr_time, offsets, plan)
+
+
+def _cached_latitude_offsets(key):
+    """Compute the LatitudeOffsets for a LATITUDE_OFFSETS_CACHE key."""
+    day, latitude_index, precision, plan = key
+    return compute_latitude_offsets(
+        Location(latitude_index * precision, 0), plan, solar_ephemeris(day)
+    )
+
+
+LATITUDE_OFFSETS_CACHE = LRUCache(
+    _cached_latitude_offsets, LATITUDE_OFFSETS_CACHE_SIZE
+)
+SOLAR_CACHES.append(LATITUDE_OFFSETS_CACHE)
+
+
+def day_latitude_offsets(day, latitude, plan, precision=LATITUDE_PRECISION):
+    """Look up the offsets from Zuhr shared by every site near a latitude.
+
+    The latitude is rounded to a multiple of precision and the offsets are
+    kept in LATITUDE_OFFSETS_CACHE, so every site in the same city, or
+    anywhere on the same latitude band, shares one computation of the
+    expensive trigonometry. Each site then only needs its own Zuhr:
+
+    .. code:: python
+
+        offsets = day_latitude_offsets(day, latitude, plan)
+        zuhr_time = compute_zuhr_utc(day, longitude, solar_ephemeris(day))
+        times = prayer_times_from_offsets(zuhr_time, offsets, plan)
+
+    With the default precision of 0.01 degrees (about a kilometre), rounding
+    moves the times by under a second at moderate latitudes; it grows near
+    latitudes where Fajr or Isha stop being defined.
+
+    :param day: The datetime.date to calculate for
+    :param latitude: The latitude in degrees
+    :param plan: A CalculationPlan from adhan.methods.compile_method
+    :param precision: The size of the latitude bands, in degrees
+    :returns: A LatitudeOffsets
+    """
+    return LATITUDE_OFFSETS_CACHE.get(
+        (day, int(round(latitude / precision)), precision, plan)
+    )
+
+
+def compute_prayer_time(name, day, location, plan, ephemeris=None):
+    """Compute the UTC floating point time of a single prayer on a day.
+
+    This gives the same result as the matching field of compute_prayer_times
+    but only does the work that prayer needs, which is cheaper when only one
+    or two prayers are wanted.
+
+    :param name: The name of the prayer, one of PrayerTimes._fields
+    :param day: The datetime.date to calculate for
+    :param location: A Location
+    :param plan: A CalculationPlan from adhan.methods.compile_method
+    :param ephemeris: Optional precomputed Ephemeris for day
+    :returns: The floating point UTC hours since midnight
+    """
+    if ephemeris is None:
+        ephemeris = solar_ephemeris(day)
 
     #
-    # Default to standard Asr method if not specified
+    # High latitude rules tie Fajr and Isha to sunrise and sunset
     #
-    asr_multiplier = parameters.get('asr_multiplier', ASR_STANDARD)
-    asr_time = zuhr_time + time_at_shadow_length(
-        day=day, latitude=latitude, multiplier=asr_multiplier
+    if plan.high_latitude_rule is not None and name in ('fajr', 'isha'):
+        times = compute_prayer_times(day, location, plan, ephemeris)
+        return getattr(times, name)
+
+    try:
+        prayer_time = _PRAYER_TIMES[name]
+    except KeyError:
+        raise ValueError('unknown prayer %r' % (name,)) from None
+
+    zuhr_time = compute_zuhr_utc(day, location.longitude, ephemeris=ephemeris)
+    return prayer_time(zuhr_time, location, plan, ephemeris)
+
+
+def _time_at_sun_angle(sin_angle, location, ephemeris):
+    """Compute the hour angle of the sun at an angle below the horizon."""
+    return compute_hour_angle(
+        sin_angle, location.sin_latitude, location.cos_latitude, ephemeris
+    )
+
+
+def _fajr_time(zuhr_time, location, plan, ephemeris):
+    """Compute Fajr, for compute_prayer_time."""
+    return zuhr_time - _time_at_sun_angle(plan.sin_fajr_angle, location,
+                                          ephemeris)
+
+
+def _shuruq_time(zuhr_time, location, _plan, ephemeris):
+    """Compute Shuruq, for compute_prayer_time."""
+    return zuhr_time - _time_at_sun_angle(SIN_SUNRISE_ANGLE, location,
+                                          ephemeris)
+
+
+def _zuhr_time(zuhr_time, _location, _plan, _ephemeris):
+    """Return Zuhr, for compute_prayer_time."""
+    return zuhr_time
+
+
+def _asr_time(zuhr_time, location, plan, ephemeris):
+    """Compute Asr, for compute_prayer_time."""
+    return zuhr_time + compute_shadow_hour_angle(
+        plan.asr_multiplier, location.latitude_rad, location.sin_latitude,
+        location.cos_latitude, ephemeris
     )
 
-    offset = timedelta(minutes=60 * timezone_offset)
-    return {
-        'fajr': floating_point_to_datetime(day, fajr_time) + offset,
-        'zuhr': floating_point_to_datetime(day, zuhr_time) + offset,
-        'shuruq': floating_point_to_datetime(day, shuruq_time) + offset,
-        'asr': floating_point_to_datetime(day, asr_time) + offset,
-        'maghrib': floating_point_to_datetime(day, maghrib_time) + offset,
-        'isha': floating_point_to_datetime(day, isha_time) + offset,
-    }
 
+def _maghrib_time(zuhr_time, location, _plan, ephemeris):
+    """Compute Maghrib, for compute_prayer_time."""
+    return zuhr_time + _time_at_sun_angle(SIN_SUNSET_ANGLE, location,
+                                          ephemeris)
+
+
+def _isha_time(zuhr_time, location, plan, ephemeris):
+    """Compute Isha, for compute_prayer_time."""
+    if plan.isha_delay:
+        return (
+            _maghrib_time(zuhr_time, location, plan, ephemeris) +
+            plan.isha_delay
+        )
+    return zuhr_time + _time_at_sun_angle(plan.sin_isha_angle, location,
+                                          ephemeris)
+
+
+#
+# How compute_prayer_time works out each prayer from Zuhr
+#
+_PRAYER_TIMES = {
+    'fajr': _fajr_time,
+    'shuruq': _shuruq_time,
+    'zuhr': _zuhr_time,
+    'asr': _asr_time,
+    'maghrib': _maghrib_time,
+    'isha': _isha_time,
+}
+
+
+def times_at_angles(day, location, angles=(), shadows=(), ephemeris=None):
+    """Compute the times of any number of solar events on a day at once.
+
+    Where compute_time_at_sun_angle and time_at_shadow_length work out the
+    solar and latitude terms on every call, this computes them and Zuhr once
+    and then only needs one arccosine per event, which makes a dozen custom
+    events (imsak, duha, twilight bands, ...) cost little more than one.
+
+    :param day: The datetime.date to calculate for
+    :param location: An adhan.location.Location, or a 2-tuple of latitude and
+                     longitude in degrees
+    :param angles: Angles of the sun below the horizon, in degrees, negative
+                   for above it
+    :param shadows: Shadow length multipliers, as for time_at_shadow_length
+    :param ephemeris: Optional precomputed Ephemeris for day
+    :returns: An AngleTimes of floating point UTC hours: zuhr, then before
+              and after, array('d') holding the time the sun reaches each
+              angle before and after Zuhr, and shadows, an array('d') of the
+              time each shadow multiplier is reached after Zuhr. Events that
+              don't happen that day, as the sun never gets that low or high,
+              are NaN
+    """
+    location = as_location(location)
+    if ephemeris is None:
+        ephemeris = solar_ephemeris(day)
+
+    zuhr_time = compute_zuhr_utc(day, location.longitude, ephemeris)
+    sin_latitude = location.sin_latitude
+    cos_latitude = location.cos_latitude
+
+    before = array('d')
+    after = array('d')
+    for angle in angles:
+        hour_angle = compute_hour_angle_or_nan(
+            math.sin(math.radians(angle)), sin_latitude, cos_latitude,
+            ephemeris
+        )
+        before.append(zuhr_time - hour_angle)
+        after.append(zuhr_time + hour_angle)
+
+    shadow_times = array('d')
+    for multiplier in shadows:
+        try:
+            hour_angle = compute_shadow_hour_angle(
+                multiplier, location.latitude_rad, sin_latitude,
+                cos_latitude, ephemeris
+            )
+        except ValueError:
+            hour_angle = NAN
+        shadow_times.append(zuhr_time + hour_angle)
+
+    return AngleTimes(zuhr_time, before, after, shadow_times)
+
+
+def prayer_times_to_datetimes(day, times, offset):
+    """Convert floating point PrayerTimes to a dict of datetimes.
+
+    :param day: The datetime.date the times were computed for
+    :param times: A PrayerTimes of floating point UTC hours
+    :param offset: A timedelta to add to each time
+    :returns: A dict mapping each prayer name to a datetime
+    """
+    return dict(
+        (name, floating_point_to_datetime(day, fp_time) + offset)
+        for name, fp_time in zip(PrayerTimes._fields, times)
+    )
+
+
+def convert_prayer_times(day, times, timezone_offset, output='datetime'):
+    """Convert floating point PrayerTimes to one of the output formats.
+
+    :param day: The datetime.date the times were computed for
+    :param times: A PrayerTimes of floating point UTC hours
+    :param timezone_offset: The number of hours to add to each time, or a
+                            time zone, as accepted by adhan()
+    :param output: 'datetime' for a dict of datetimes, 'minutes' for a
+                   TimetableRow of whole minutes since local midnight or
+                   'hours' for a PrayerTimes of fractional local hours
+    :returns: The times in the requested format
+    """
+    if is_zone(timezone_offset):
+        return convert_zoned_prayer_times(
+            day, times, get_zone(timezone_offset), output
+        )
+
+    if output == 'datetime':
+        offset = timedelta(minutes=60 * timezone_offset)
+        return prayer_times_to_datetimes(day, times, offset)
+
+    if output == 'minutes':
+        offset = int(round(60 * timezone_offset))
+        return TimetableRow(day, *[
+            floating_point_to_minutes(fp_time) + offset for fp_time in times
+        ])
+
+    if output == 'hours':
+        return PrayerTimes(*[fp_time + timezone_offset for fp_time in times])
+
+    raise ValueError(
+        'output must be one of %s, got %r' % (', '.join(OUTPUTS), output)
+    )
+
+
+def convert_prayer_minutes(day, minutes, timezone_offset, output='datetime'):
+    """Convert prayer times in whole UTC minutes to an output format.
+
+    This gives the same results as convert_prayer_times for the rounded
+    outputs, from the times as floating_point_to_minutes rounds them.
+
+    :param day: The datetime.date the times were computed for
+    :param minutes: The six prayers as whole minutes since UTC midnight
+    :param timezone_offset: The number of hours to add to each time, or a
+                            time zone, as accepted by adhan()
+    :param output: 'datetime' or 'minutes', as for convert_prayer_times
+    :returns: The times in the requested format
+    :raises ValueError: For any other output, which needs unrounded times
+    """
+    if output not in ('datetime', 'minutes'):
+        raise ValueError(
+            "output must be 'datetime' or 'minutes', got %r" % (output,)
+        )
+
+    if is_zone(timezone_offset):
+        zone = get_zone(timezone_offset)
+        offsets = zone_transitions(zone, day.year).day_offsets(day, minutes)
+        return _zoned_minutes(day, minutes, zone, offsets, output)
+
+    if output == 'datetime':
+        midnight = datetime(year=day.year, month=day.month, day=day.day)
+        offset = timedelta(minutes=60 * timezone_offset)
+        return dict(
+            (name, midnight + timedelta(minutes=minute) + offset)
+            for name, minute in zip(PrayerTimes._fields, minutes)
+        )
+
+    offset = int(round(60 * timezone_offset))
+    return TimetableRow(day, *[minute + offset for minute in minutes])
+
+
+def convert_zoned_prayer_times(day, times, zone, output='datetime'):
+    """Convert floating point PrayerTimes to local times in a time zone.
+
+    Each prayer gets the UTC offset in effect at its own (rounded) instant,
+    so a daylight saving switch between two prayers is handled, and the
+    offsets come from the zone's cached transitions for the year rather
+    than a tzinfo conversion per prayer.
+
+    :param day: The datetime.date the times were computed for
+    :param times: A PrayerTimes of floating point UTC hours
+    :param zone: A tzinfo
+    :param output: As for convert_prayer_times; 'datetime' gives a dict of
+                   aware datetimes in zone
+    :returns: The times in the requested format
+    """
+    minutes = [floating_point_to_minutes(fp_time) for fp_time in times]
+    offsets = zone_transitions(zone, day.year).day_offsets(day, minutes)
+
+    if output in ('datetime', 'minutes'):
+        return _zoned_minutes(day, minutes, zone, offsets, output)
+
+    if output == 'hours':
+        return PrayerTimes(*[
+            fp_time + offset / 3600
+            for fp_time, (offset, _) in zip(times, offsets)
+        ])
+
+    raise ValueError(
+        'output must be one of %s, got %r' % (', '.join(OUTPUTS), output)
+    )
+
+
+def _zoned_minutes(day, minutes, zone, offsets, output):
+    """Localize whole UTC minutes with their (offset, fold) in a zone."""
+    if output == 'datetime':
+        midnight = datetime(year=day.year, month=day.month, day=day.day)
+        return dict(
+            (name, (midnight + timedelta(minutes=minute, seconds=offset))
+             .replace(tzinfo=zone, fold=fold))
+            for name, minute, (offset, fold)
+            in zip(PrayerTimes._fields, minutes, offsets)
+        )
+
+    return TimetableRow(day, *[
+        minute + int(round(offset / 60))
+        for minute, (offset, _) in zip(minutes, offsets)
+    ])
+
+
+def adhan(day, location, parameters, timezone_offset=0, output='datetime'):
+    """Calculate adhan times given the parameters.
+
+    This function will compute the adhan times for a certain location on
+    certain day. The method for calculating the prayers as well as the time for
+    Asr can also be specified. The timezone offset naively adds the specified
+    number of hours to each time that is returned.
+
+    :param day: The datetime.date to calculate for
+    :param location: 2-tuple of floating point coordiantes for latitude and
+                     longitude of location in degrees, or an
+                     adhan.location.Location
+    :param parameters: A dictionary-like object of parameters for computing
+                       adhan times, or a CalculationPlan compiled from one with
+                       adhan.methods.compile_method. Commonly used calculation
+                       methods are available in the adhan.methods module
+    :param timezone_offset: The number of hours to add to each prayer time
+                            to account for timezones. Can be floating point.
+                            Can also be an IANA time zone name such as
+                            'America/Chicago' or a tzinfo, in which case the
+                            times are localized to that zone, daylight saving
+                            included, and datetimes are timezone aware
+    :param output: The format of the result. 'datetime' (the default) gives a
+                   dict of datetimes. 'minutes' gives a TimetableRow of whole
+                   minutes since local midnight, rounded the same way, which
+                   only builds datetimes when asked to. 'hours' gives a
+                   PrayerTimes of unrounded fractional hours
+
+    With a result cache set by set_result_cache, the rounded outputs are
+    served from it and 'hours' is still computed each time.
+
+    """
+    plan = compile_method(parameters, strict=False)
+    if _RESULT_CACHE is not None and output != 'hours':
+        minutes = _RESULT_CACHE.get(day, location, plan)
+        return convert_prayer_minutes(day, minutes, timezone_offset, output)
+
+    times = compute_prayer_times(day, as_location(location), plan)
+
+    return convert_prayer_times(day, times, timezone_offset, output)
+
+
+def result_cache():
+    """Return the cache adhan() currently uses, or None."""
+    return _RESULT_CACHE
+
+
+def set_result_cache(cache):
+    """Set the cache adhan() serves rounded times from.
+
+    The cache needs a get(day, location, plan) method returning the six
+    prayers of a day as whole minutes since UTC midnight, computing them on
+    a miss, like adhan.sharedcache.SharedResultCache.
+
+    :param cache: The cache, or None to compute every call again
+    :returns: The previous cache, or None
+    """
+    global _RESULT_CACHE  # pylint: disable=global-statement
+    previous, _RESULT_CACHE = _RESULT_CACHE, cache
+    return previous
+
+
+class PrayerCalculator:
+    """Calculates adhan times for one fixed location and method.
+
+    Where adhan() works everything out from scratch on every call, a
+    PrayerCalculator compiles its parameters and the latitude terms of its
+    location once, so each day only costs the per-day solar terms (which are
+    shared across calculators through the ephemeris cache).
+    """
+
+    __slots__ = ('location', 'plan', 'timezone_offset')
+
+    def __init__(self, location, parameters, timezone_offset=0):
+        """Create a calculator.
+
+        :param location: An adhan.location.Location, or a 2-tuple of latitude
+                         and longitude in degrees
+        :param parameters: A parameter dict or CalculationPlan, as accepted by
+                           adhan()
+        :param timezone_offset: The number of hours to add to each prayer time,
+                                or a time zone, as accepted by adhan()
+        """
+        if is_zone(timezone_offset):
+            timezone_offset = get_zone(timezone_offset)
+
+        self.location = as_location(location)
+        self.plan = compile_method(parameters, strict=False)
+        self.timezone_offset = timezone_offset
+
+    def times(self, day, output='datetime'):
+        """Calculate the adhan times on a day.
+
+        :param day: The datetime.date to calculate for
+        :param output: The format of the result, as for adhan()
+        :returns: The times in that format, the same as adhan() returns
+        """
+        times = compute_prayer_times(day, self.location, self.plan)
+        return convert_prayer_times(day, times, self.timezone_offset, output)
+
+    def times_range(self, start, end, output='datetime'):
+        """Calculate the adhan times for every day from start to end.
+
+        :param start: The first datetime.date to calculate for
+        :param end: The last datetime.date to calculate for, inclusive
+        :param output: The format of the times, as for adhan()
+        :returns: A generator of (day, times) pairs, where times is what
+                  times() returns
+        """
+        one_day = timedelta(days=1)
+        day = start
+        while day <= end:
+            yield day, self.times(day, output)
+            day += one_day
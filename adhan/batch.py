@@ -0,0 +1,322 @@
+"""
+batch.py - Vectorized adhan calculations over many days and locations.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import numpy as np
+
+from .adhan import SIN_SUNRISE_ANGLE, SIN_SUNSET_ANGLE
+from . import calculations
+from .calculations import Ephemeris
+from .methods import compile_method
+
+PRAYERS = ('fajr', 'shuruq', 'zuhr', 'asr', 'maghrib', 'isha')
+
+PRAYER_DTYPE = np.dtype([(name, np.int16) for name in PRAYERS])
+
+HOURS_DTYPE = np.dtype([(name, np.float64) for name in PRAYERS])
+
+#
+# The minutes given for a prayer that doesn't happen, as the sun never gets
+# that low or high; prayers are never this far from midnight
+#
+UNDEFINED_MINUTES = np.iinfo(np.int16).min
+
+
+def day_of_year(days):
+    """Compute the zero-based day of the year for a sequence of dates.
+
+    :param days: An iterable of datetime.date objects
+    :returns: An array of integer days since January 1 of each date's year
+    """
+    return np.array(
+        [calculations.day_of_year(day) for day in days], dtype=np.float64
+    )
+
+
+def compute_zuhr_utc(eot, longitude):
+    """Compute UTC Zuhr for every combination of day and longitude.
+
+    :param eot: Array of shape (days, 1) holding the Equation of Time
+    :param longitude: Array of shape (1, locations) holding longitudes
+    :returns: Array of shape (days, locations) of floating point UTC times
+    """
+    zuhr_time_utc = 12 + (np.abs(longitude) / 15) - eot
+    return np.abs(zuhr_time_utc) % 24
+
+
+def compute_ephemeris(day_index):
+    """Look up the solar terms shared by every prayer, vectorized over days.
+
+    The terms are gathered from adhan.calculations.spencer_tables, so they
+    are exactly those of the scalar functions.
+
+    :param day_index: Array of zero-based days of the year
+    :returns: An adhan.calculations.Ephemeris whose fields are arrays
+    """
+    tables = calculations.spencer_tables()
+    day_index = np.asarray(day_index).astype(np.intp)
+    return Ephemeris(*[
+        np.frombuffer(getattr(tables, field), dtype=np.float64)[day_index]
+        for field in Ephemeris._fields
+    ])
+
+
+def compute_hour_angle(sin_angle, sin_latitude, cos_latitude, ephemeris):
+    """Compute the time between mid-day and the sun reaching an angle.
+
+    Vectorized counterpart of adhan.calculations.compute_hour_angle_or_nan:
+    NaN where the sun never reaches the angle, rather than raising.
+
+    :param sin_angle: Sine of the (positive) angle below the horizon
+    :param sin_latitude: Array of shape (1, locations) of latitude sines
+    :param cos_latitude: Array of shape (1, locations) of latitude cosines
+    :param ephemeris: Ephemeris of arrays of shape (days, 1)
+    :returns: Array of shape (days, locations) of floating point time deltas
+    """
+    numerator = -sin_angle - sin_latitude * ephemeris.sin_declination
+
+    denominator = cos_latitude * ephemeris.cos_declination
+
+    with np.errstate(invalid='ignore'):
+        return np.degrees(np.arccos(numerator/denominator)) / 15
+
+
+def high_latitude_hour_angles(plan, sin_latitude, cos_latitude, ephemeris,
+                              shuruq, maghrib):
+    """Compute the Fajr and Isha hour angles under a high latitude rule.
+
+    Vectorized counterpart of the scalar rule in adhan.adhan: undefined days
+    are replaced with np.where rather than handled one by one.
+
+    :param plan: A CalculationPlan with a high_latitude_rule
+    :param sin_latitude: Array of shape (1, locations) of latitude sines
+    :param cos_latitude: Array of shape (1, locations) of latitude cosines
+    :param ephemeris: Ephemeris of arrays of shape (days, 1)
+    :param shuruq: Array of shape (days, locations) of sunrise hour angles
+    :param maghrib: Array of shape (days, locations) of sunset hour angles
+    :returns: A (fajr, isha) pair of arrays of hour angles; isha is None for
+              plans with an Isha delay
+    """
+    night = 24 - (shuruq + maghrib)
+
+    def limit(sin_angle, base, night_portion):
+        hour_angle = compute_hour_angle(
+            sin_angle, sin_latitude, cos_latitude, ephemeris
+        )
+        portion = night_portion * night
+        # Comparisons with NaN are false, so undefined times are replaced too
+        with np.errstate(invalid='ignore'):
+            defined = hour_angle - base <= portion
+        return np.where(defined, hour_angle, base + portion)
+
+    fajr = limit(plan.sin_fajr_angle, shuruq, plan.fajr_night_portion)
+    if plan.isha_night_portion is None:
+        return fajr, None
+
+    return fajr, limit(plan.sin_isha_angle, maghrib, plan.isha_night_portion)
+
+
+def compute_shadow_hour_angle(multiplier, latitude_rad, sin_latitude,
+                              cos_latitude, ephemeris):
+    """Compute the time between mid-day and a shadow length multiple.
+
+    Vectorized counterpart of adhan.calculations.compute_shadow_hour_angle,
+    NaN where the shadow never gets that short.
+
+    :param multiplier: The multiplier of the object's length
+    :param latitude_rad: Array of shape (1, locations) of latitudes in radians
+    :param sin_latitude: Array of shape (1, locations) of latitude sines
+    :param cos_latitude: Array of shape (1, locations) of latitude cosines
+    :param ephemeris: Ephemeris of arrays of shape (days, 1)
+    :returns: Array of shape (days, locations) of floating point time deltas
+    """
+    angle = np.arctan(
+        1/(multiplier + np.tan(np.abs(latitude_rad - ephemeris.declination)))
+    )
+
+    numerator = (
+        np.sin(angle) - sin_latitude*ephemeris.sin_declination
+    )
+    denominator = cos_latitude * ephemeris.cos_declination
+
+    with np.errstate(invalid='ignore'):
+        return np.degrees(np.arccos(numerator/denominator)) / 15
+
+
+def day_ephemerides(days):
+    """Compute the Ephemeris of each day with the current solar backend.
+
+    The default Spencer backend is vectorized; any other backend is computed
+    day by day through adhan.calculations.solar_ephemeris.
+
+    :param days: A sequence of datetime.date objects
+    :returns: An adhan.calculations.Ephemeris whose fields are arrays of
+              shape (len(days), 1)
+    """
+    if isinstance(calculations.solar_backend(), calculations.SpencerBackend):
+        return compute_ephemeris(day_of_year(days).reshape(-1, 1))
+
+    ephemerides = np.array(
+        [calculations.solar_ephemeris(day) for day in days], dtype=np.float64
+    ).reshape(-1, len(Ephemeris._fields))
+    return Ephemeris(*[column.reshape(-1, 1) for column in ephemerides.T])
+
+
+def adhan_grid(days, latitudes, longitudes, parameters, timezone_offset=0,
+               output='minutes'):
+    """Calculate adhan times for every combination of days and locations.
+
+    This is the array counterpart of adhan.adhan. Instead of datetimes, each
+    prayer is returned as the integer number of minutes since local midnight
+    of its day, rounded the same way adhan.adhan rounds, so
+    ``day + timedelta(minutes=result[i, j]['fajr'])`` is the Fajr time
+    adhan.adhan would return for ``days[i]`` at location ``j``.
+
+    Where adhan.adhan raises ValueError because the sun never reaches a
+    prayer's angle (near the poles, say), the prayer is UNDEFINED_MINUTES,
+    or NaN for 'hours', and the rest of the grid is unaffected.
+
+    :param days: A sequence of datetime.date objects to calculate for
+    :param latitudes: A sequence of latitudes, in degrees
+    :param longitudes: A sequence of longitudes, in degrees, the same length
+                       as latitudes
+    :param parameters: A dictionary-like object of parameters or a
+                       CalculationPlan, as accepted by adhan.adhan. With a
+                       high_latitude_rule, days where Fajr or Isha are
+                       undefined are adjusted in the same vectorized pass
+    :param timezone_offset: The number of hours to add to each prayer time
+    :param output: 'minutes' for whole minutes as described above, or 'hours'
+                   for unrounded fractional local hours, as for adhan.adhan
+    :returns: A structured array of shape (len(days), len(latitudes)) with an
+              int16 field (float64 for 'hours') per prayer
+    """
+    if output not in ('minutes', 'hours'):
+        raise ValueError(
+            "output must be 'minutes' or 'hours', got %r" % (output,)
+        )
+
+    plan = compile_method(parameters, strict=False)
+
+    latitudes = np.asarray(latitudes, dtype=np.float64).reshape(1, -1)
+    longitudes = np.asarray(longitudes, dtype=np.float64).reshape(1, -1)
+    if latitudes.shape != longitudes.shape:
+        raise ValueError('latitudes and longitudes must be the same length')
+
+    latitude_rad = np.radians(latitudes)
+    sin_latitude = np.sin(latitude_rad)
+    cos_latitude = np.cos(latitude_rad)
+
+    ephemeris = day_ephemerides(days)
+
+    def time_at_sun_angle(sin_angle):
+        return compute_hour_angle(
+            sin_angle, sin_latitude, cos_latitude, ephemeris
+        )
+
+    zuhr_time = compute_zuhr_utc(ephemeris.equation_of_time, longitudes)
+
+    shuruq = time_at_sun_angle(SIN_SUNRISE_ANGLE)
+    maghrib = time_at_sun_angle(SIN_SUNSET_ANGLE)
+
+    if plan.high_latitude_rule is None:
+        fajr = time_at_sun_angle(plan.sin_fajr_angle)
+        isha = None
+        if not plan.isha_delay:
+            isha = time_at_sun_angle(plan.sin_isha_angle)
+    else:
+        fajr, isha = high_latitude_hour_angles(
+            plan, sin_latitude, cos_latitude, ephemeris, shuruq, maghrib
+        )
+
+    shuruq_time = zuhr_time - shuruq
+    maghrib_time = zuhr_time + maghrib
+    fajr_time = zuhr_time - fajr
+
+    if plan.isha_delay:
+        isha_time = maghrib_time + plan.isha_delay
+    else:
+        isha_time = zuhr_time + isha
+
+    asr_time = zuhr_time + compute_shadow_hour_angle(
+        plan.asr_multiplier, latitude_rad, sin_latitude, cos_latitude,
+        ephemeris
+    )
+
+    times = zip(PRAYERS, (fajr_time, shuruq_time, zuhr_time, asr_time,
+                          maghrib_time, isha_time))
+
+    if output == 'hours':
+        result = np.empty(zuhr_time.shape, dtype=HOURS_DTYPE)
+        for name, fp_time in times:
+            result[name] = fp_time + timezone_offset
+        return result
+
+    offset = int(round(60 * timezone_offset))
+    result = np.empty(zuhr_time.shape, dtype=PRAYER_DTYPE)
+    for name, fp_time in times:
+        result[name] = np.where(
+            np.isnan(fp_time), UNDEFINED_MINUTES, np.ceil(60 * fp_time) + offset
+        )
+
+    return result
+
+
+def store_grid(days, store, output='minutes'):
+    """Calculate adhan times for every combination of days and stored sites.
+
+    Sites are grouped by method and timezone offset straight from the
+    columns of the store, and each group is computed with one adhan_grid
+    call, so no per-site objects are created.
+
+    :param days: A sequence of datetime.date objects to calculate for
+    :param store: An adhan.store.LocationStore whose sites all have fixed
+                  timezone offsets
+    :param output: 'minutes' or 'hours', as for adhan_grid
+    :returns: A structured array of shape (len(days), len(store)), column j
+              being the site at row j of the store, as for adhan_grid
+    :raises ValueError: If a site has a time zone rather than an offset
+    """
+    if output not in ('minutes', 'hours'):
+        raise ValueError(
+            "output must be 'minutes' or 'hours', got %r" % (output,)
+        )
+    if store.has_zones():
+        raise ValueError('store_grid needs fixed timezone offsets')
+
+    latitudes = np.frombuffer(store.latitudes, dtype=np.float64)
+    longitudes = np.frombuffer(store.longitudes, dtype=np.float64)
+    groups = (
+        np.frombuffer(store.method_codes, dtype=np.uint16).astype(np.intp) *
+        len(store.timezones) +
+        np.frombuffer(store.timezone_codes, dtype=np.uint16)
+    )
+
+    dtype = PRAYER_DTYPE if output == 'minutes' else HOURS_DTYPE
+    result = np.empty((len(days), len(store)), dtype=dtype)
+
+    order = np.argsort(groups, kind='stable')
+    keys, starts = np.unique(groups[order], return_index=True)
+    for key, columns in zip(keys, np.split(order, starts[1:])):
+        method_code, timezone_code = divmod(int(key), len(store.timezones))
+        result[:, columns] = adhan_grid(
+            days, latitudes[columns], longitudes[columns],
+            store.plans[method_code], store.timezones[timezone_code], output
+        )
+
+    return result
@@ -18,13 +18,13 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 """
 
-from __future__ import division
-
+from array import array
+from collections import namedtuple, OrderedDict
 from datetime import date
 
 from math import (
     pi,
-    sin, cos, tan, acos, atan, atan2,
+    sin, cos, tan, acos, asin, atan, atan2,
     degrees, radians
 )
 
@@ -41,6 +41,9 @@ MARCH = 3
 JULIAN_START_YEAR = -4800
 EARTH_AXIS_TILT = radians(23.44)
 EARTH_ORIBITAL_VELOCITY = 360/365.24
+EPHEMERIS_CACHE_SIZE = 64
+DAYS_PER_TABLE = 366
+NAN = float('nan')
 
 
 def gregorian_to_julian(day):
@@ -78,6 +81,15 @@ def gregorian_to_julian(day):
     ])
 
 
+def day_of_year(day):
+    """Compute the zero-based day of the year of a date.
+
+    :param day: A datetime.date
+    :returns: The number of days since January 1 of the date's year
+    """
+    return day.toordinal() - date(day.year, 1, 1).toordinal()
+
+
 def sun_declination(day):
     """Compute the declination angle of the sun for the given date.
 
@@ -87,8 +99,28 @@ def sun_declination(day):
     :param day: The datetime.date to compute the declination angle for
     :returns: The angle, in degrees, of the angle of declination
     """
-    day_of_year = day.toordinal() - date(day.year, 1, 1).toordinal()
-    day_angle = 2 * pi * day_of_year / 365
+    return sun_declination_at(day_of_year(day))
+
+
+def sun_declination_at(day_index):
+    """Look up the declination angle of the sun on a day of the year.
+
+    :param day_index: The zero-based day of the year, as from day_of_year
+    :returns: The angle, in degrees, of the angle of declination
+    """
+    return (_SPENCER_TABLES or spencer_tables()).declination_degrees[day_index]
+
+
+def spencer_declination(day_index):
+    """Compute the declination angle of the sun on a day of the year.
+
+    This evaluates the Spencer series that fills the lookup tables, see
+    spencer_tables.
+
+    :param day_index: The zero-based day of the year, as from day_of_year
+    :returns: The angle, in degrees, of the angle of declination
+    """
+    day_angle = 2 * pi * day_index / 365
     declination_radians = sum([
         0.006918,
         0.001480*sin(3*day_angle),
@@ -111,21 +143,40 @@ def equation_of_time(day):
     :param day: The datetime.date to compute the equation of time for
     :returns: The angle, in radians, of the Equation of Time
     """
-    day_of_year = day.toordinal() - date(day.year, 1, 1).toordinal()
+    return equation_of_time_at(day_of_year(day))
+
+
+def equation_of_time_at(day_index):
+    """Look up the equation of time on a day of the year.
 
+    :param day_index: The zero-based day of the year, as from day_of_year
+    :returns: The angle, in radians, of the Equation of Time
+    """
+    return (_SPENCER_TABLES or spencer_tables()).equation_of_time[day_index]
+
+
+def spencer_equation_of_time(day_index):
+    """Compute the equation of time on a day of the year.
+
+    This evaluates the formula that fills the lookup tables, see
+    spencer_tables.
+
+    :param day_index: The zero-based day of the year, as from day_of_year
+    :returns: The angle, in radians, of the Equation of Time
+    """
     # pylint: disable=invalid-name
 
     #
     # Distance Earth moves from solstice to January 1 (so about 10 days)
     #
-    A = EARTH_ORIBITAL_VELOCITY * (day_of_year + 10)
+    A = EARTH_ORIBITAL_VELOCITY * (day_index + 10)
 
     #
-    # Distance Earth moves from solstice to day_of_year
+    # Distance Earth moves from solstice to day_index
     # 2 is the number of days from Jan 1 to periheleon
     # This is the result of a lot of constants collapsing
     #
-    B = A + 1.914 * sin(radians(EARTH_ORIBITAL_VELOCITY * (day_of_year - 2)))
+    B = A + 1.914 * sin(radians(EARTH_ORIBITAL_VELOCITY * (day_index - 2)))
 
     #
     # Compute "the difference between the angles moved at mean speed, and at
@@ -145,7 +196,353 @@ def equation_of_time(day):
     return radians(result)
 
 
-def compute_zuhr_utc(day, longitude):
+Ephemeris = namedtuple('Ephemeris', [
+    'declination',
+    'sin_declination',
+    'cos_declination',
+    'equation_of_time',
+])
+
+SpencerTables = namedtuple('SpencerTables', [
+    'declination_degrees',
+    'declination',
+    'sin_declination',
+    'cos_declination',
+    'equation_of_time',
+])
+
+_SPENCER_TABLES = None
+
+
+def spencer_tables():
+    """Return the Spencer solar terms of every day of the year.
+
+    Both formulas depend only on the day of the year, so they are evaluated
+    once for each of the DAYS_PER_TABLE days, on first use, and every later
+    lookup is an index into an array('d').
+
+    :returns: A SpencerTables of arrays indexed by day of the year, holding
+              the declination in degrees and in radians, its sine and
+              cosine, and the Equation of Time
+    """
+    global _SPENCER_TABLES  # pylint: disable=global-statement
+
+    if _SPENCER_TABLES is None:
+        declination_degrees = array('d', [
+            spencer_declination(day_index)
+            for day_index in range(DAYS_PER_TABLE)
+        ])
+        declination = array('d', [radians(x) for x in declination_degrees])
+        _SPENCER_TABLES = SpencerTables(
+            declination_degrees=declination_degrees,
+            declination=declination,
+            sin_declination=array('d', [sin(x) for x in declination]),
+            cos_declination=array('d', [cos(x) for x in declination]),
+            equation_of_time=array('d', [
+                spencer_equation_of_time(day_index)
+                for day_index in range(DAYS_PER_TABLE)
+            ]),
+        )
+
+    return _SPENCER_TABLES
+
+
+class LRUCache:
+    """A bounded, least recently used cache with hit and miss counters.
+
+    Values are computed by calling compute with the key on a cache miss.
+    """
+
+    def __init__(self, compute, maxsize):
+        """Create an empty cache holding at most maxsize values."""
+        self.compute = compute
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        """Return the number of values currently cached."""
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the value for key, computing it on a cache miss.
+
+        :param key: The key to look up
+        :returns: The cached or newly computed value
+        """
+        entries = self._entries
+        try:
+            value = entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            value = self.compute(key)
+            if len(entries) >= self.maxsize:
+                entries.popitem(last=False)
+        else:
+            self.hits += 1
+
+        entries[key] = value
+        return value
+
+    def clear(self):
+        """Drop every cached value and reset the hit and miss counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        """Return the cache statistics as a dict."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'maxsize': self.maxsize,
+            'size': len(self._entries),
+        }
+
+
+class EphemerisCache(LRUCache):
+    """A bounded, least recently used cache of per-day solar ephemerides.
+
+    Every prayer on a given day shares the same declination and equation of
+    time, and so do all locations, so computing them once per day and keeping
+    the most recently used days around removes most of the trigonometry from
+    repeated calls.
+    """
+
+    def __init__(self, maxsize=EPHEMERIS_CACHE_SIZE):
+        """Create an empty cache holding at most maxsize days."""
+        super().__init__(compute_ephemeris, maxsize)
+
+
+def compute_ephemeris(day):
+    """Compute the solar terms shared by every prayer on a given day.
+
+    :param day: The datetime.date to compute the ephemeris for
+    :returns: An Ephemeris holding the declination of the sun in radians, its
+              sine and cosine, and the Equation of Time, from the current
+              solar backend
+    """
+    return _SOLAR_BACKEND.ephemeris(day)
+
+
+def compute_ephemeris_at(day_index):
+    """Compute the solar terms shared by every prayer on a day of the year.
+
+    Unlike compute_ephemeris this takes the day of the year directly, so
+    callers walking through consecutive days can advance it themselves. Only
+    backends whose results depend on nothing but the day of the year (see
+    SolarBackend.by_day_of_year) support this.
+
+    :param day_index: The zero-based day of the year, as from day_of_year
+    :returns: An Ephemeris for that day
+    :raises ValueError: If the current backend depends on the year too
+    """
+    return _SOLAR_BACKEND.ephemeris_at(day_index)
+
+
+#
+# Solar Backends
+#
+
+
+class SolarBackend:
+    """A model of the sun's position, giving the Ephemeris of each day.
+
+    Subclasses implement ephemeris(day). Those whose results depend only on
+    the day of the year set by_day_of_year and implement ephemeris_at too,
+    which lets whole ranges of days be walked without building dates.
+    """
+
+    name = None
+    by_day_of_year = False
+
+    def ephemeris(self, day):
+        """Compute the Ephemeris of a datetime.date."""
+        raise NotImplementedError
+
+    def ephemeris_at(self, day_index):
+        """Compute the Ephemeris of a zero-based day of the year.
+
+        :raises ValueError: Unless the backend sets by_day_of_year
+        """
+        raise ValueError('the %s solar backend needs full dates' % self.name)
+
+    def __repr__(self):
+        """Represent the backend by its name."""
+        return '<%s %r>' % (type(self).__name__, self.name)
+
+
+class SpencerBackend(SolarBackend):
+    """The default, fast solar model.
+
+    Spencer's declination series and a simplified Equation of Time, as in
+    sun_declination and equation_of_time. Both depend only on the day of the
+    year, so they are read from spencer_tables, and the Equation of Time is
+    applied to Zuhr as computed by the original PrayTimes.org port, so
+    results are within a minute or two of published timetables.
+    """
+
+    name = 'spencer'
+    by_day_of_year = True
+
+    def ephemeris(self, day):
+        """Look up the Ephemeris of a datetime.date."""
+        return self.ephemeris_at(day_of_year(day))
+
+    def ephemeris_at(self, day_index):
+        """Look up the Ephemeris of a zero-based day of the year."""
+        tables = _SPENCER_TABLES or spencer_tables()
+        return Ephemeris(
+            declination=tables.declination[day_index],
+            sin_declination=tables.sin_declination[day_index],
+            cos_declination=tables.cos_declination[day_index],
+            equation_of_time=tables.equation_of_time[day_index],
+        )
+
+
+class NOAABackend(SolarBackend):
+    """A more accurate solar model, from the NOAA solar calculator.
+
+    Uses the Julian century of each date (so it tracks the leap year cycle
+    and the slow drift of the Earth's orbit) with the low precision formulas
+    of Meeus' Astronomical Algorithms that NOAA uses, evaluated at noon UTC.
+    It is a few times slower than Spencer, which only matters on cache misses.
+    """
+
+    name = 'noaa'
+
+    def ephemeris(self, day):
+        """Compute the Ephemeris of a datetime.date."""
+        return noaa_solar_position(gregorian_to_julian(day))
+
+
+def noaa_solar_position(julian_day):
+    """Compute the sun's declination and Equation of Time at a Julian day.
+
+    :param julian_day: The (fractional) Julian day; whole numbers are noon UTC
+    :returns: An Ephemeris, with the Equation of Time in hours
+    """
+    # pylint: disable=invalid-name
+    T = (julian_day - 2451545) / 36525
+
+    mean_longitude = radians((280.46646 + T*(36000.76983 + T*0.0003032)) % 360)
+    mean_anomaly = radians(357.52911 + T*(35999.05029 - T*0.0001537))
+    eccentricity = 0.016708634 - T*(0.000042037 + T*0.0000001267)
+
+    equation_of_center = (
+        sin(mean_anomaly) * (1.914602 - T*(0.004817 + T*0.000014)) +
+        sin(2*mean_anomaly) * (0.019993 - T*0.000101) +
+        sin(3*mean_anomaly) * 0.000289
+    )
+
+    omega = radians(125.04 - 1934.136*T)
+    apparent_longitude = (
+        mean_longitude +
+        radians(equation_of_center - 0.00569 - 0.00478*sin(omega))
+    )
+
+    mean_obliquity = 23 + (
+        26 + (21.448 - T*(46.815 + T*(0.00059 - T*0.001813))) / 60
+    ) / 60
+    obliquity = radians(mean_obliquity + 0.00256*cos(omega))
+
+    declination = asin(sin(obliquity) * sin(apparent_longitude))
+
+    y = tan(obliquity / 2) ** 2
+    equation_of_time_radians = (
+        y*sin(2*mean_longitude) -
+        2*eccentricity*sin(mean_anomaly) +
+        4*eccentricity*y*sin(mean_anomaly)*cos(2*mean_longitude) -
+        0.5*y*y*sin(4*mean_longitude) -
+        1.25*eccentricity*eccentricity*sin(2*mean_anomaly)
+    )
+
+    return Ephemeris(
+        declination=declination,
+        sin_declination=sin(declination),
+        cos_declination=cos(declination),
+        # Four minutes of time per degree
+        equation_of_time=4 * degrees(equation_of_time_radians) / 60,
+    )
+
+
+def _day_ephemeris(day):
+    """Compute the Ephemeris of the single day helpers.
+
+    With the Spencer backend, compute_zuhr_utc, compute_time_at_sun_angle
+    and time_at_shadow_length take their terms from sun_declination and
+    equation_of_time, so substituting either of those changes them too.
+    """
+    if not isinstance(_SOLAR_BACKEND, SpencerBackend):
+        return compute_ephemeris(day)
+
+    declination = radians(sun_declination(day))
+    return Ephemeris(
+        declination=declination,
+        sin_declination=sin(declination),
+        cos_declination=cos(declination),
+        equation_of_time=equation_of_time(day),
+    )
+
+
+SOLAR_BACKENDS = OrderedDict([
+    (SpencerBackend.name, SpencerBackend()),
+    (NOAABackend.name, NOAABackend()),
+])
+
+_SOLAR_BACKEND = SOLAR_BACKENDS['spencer']
+
+#
+# Caches of values derived from the solar backend, cleared when it changes
+#
+SOLAR_CACHES = []
+
+
+def solar_backend():
+    """Return the SolarBackend currently in use."""
+    return _SOLAR_BACKEND
+
+
+def set_solar_backend(backend):
+    """Choose the solar model used by every calculation.
+
+    Switching clears the caches derived from the previous backend.
+
+    :param backend: The name of a backend in SOLAR_BACKENDS, or a
+                    SolarBackend instance
+    :raises ValueError: If the name is unknown
+    """
+    global _SOLAR_BACKEND  # pylint: disable=global-statement
+
+    if not isinstance(backend, SolarBackend):
+        if backend not in SOLAR_BACKENDS:
+            raise ValueError(
+                'solar backend must be one of %s, got %r' %
+                (', '.join(SOLAR_BACKENDS), backend)
+            )
+        backend = SOLAR_BACKENDS[backend]
+
+    if backend is not _SOLAR_BACKEND:
+        _SOLAR_BACKEND = backend
+        for cache in SOLAR_CACHES:
+            cache.clear()
+
+
+EPHEMERIS_CACHE = EphemerisCache()
+SOLAR_CACHES.append(EPHEMERIS_CACHE)
+
+
+def solar_ephemeris(day):
+    """Return the Ephemeris for a day from the shared EPHEMERIS_CACHE.
+
+    :param day: The datetime.date to look up
+    :returns: The Ephemeris for that day
+    """
+    return EPHEMERIS_CACHE.get(day)
+
+
+def compute_zuhr_utc(day, longitude, ephemeris=None):
     """Compute the UTC floating point time for Zuhr given date and longitude.
 
     This function is necessary since all other prayer times are based on the
@@ -153,9 +550,12 @@ def compute_zuhr_utc(day, longitude):
 
     :param day: The day to compute Zuhr adhan for
     :param longitude: Longitude of the place of interest
+    :param ephemeris: Optional precomputed Ephemeris for day
     :returns: The UTC time for Zuhr, as a floating point number in [0, 24)
     """
-    eot = equation_of_time(day)
+    if ephemeris is None:
+        ephemeris = _day_ephemeris(day)
+    eot = ephemeris.equation_of_time
 
     #
     # Formula as described by PrayTime.org doesn't work in Eastern hemisphere
@@ -167,7 +567,76 @@ def compute_zuhr_utc(day, longitude):
     return abs(zuhr_time_utc) % 24
 
 
-def compute_time_at_sun_angle(day, latitude, angle):
+def compute_hour_angle(sin_angle, sin_latitude, cos_latitude, ephemeris):
+    """Compute the time between mid-day and the sun reaching an angle.
+
+    This is the core of compute_time_at_sun_angle, taking the sine of the
+    angle and of the latitude directly so callers that reuse them (compiled
+    methods, fixed locations) don't have to recompute them.
+
+    :param sin_angle: Sine of the (positive) angle below the horizon
+    :param sin_latitude: Sine of the latitude of the place of interest
+    :param cos_latitude: Cosine of the latitude of the place of interest
+    :param ephemeris: The Ephemeris for the day of interest
+    :returns: The positive floating point time delta from Zuhr
+    """
+    numerator = -sin_angle - sin_latitude * ephemeris.sin_declination
+
+    denominator = cos_latitude * ephemeris.cos_declination
+
+    return degrees(acos(numerator/denominator)) / 15
+
+
+def compute_hour_angle_or_nan(sin_angle, sin_latitude, cos_latitude,
+                              ephemeris):
+    """Compute the time between mid-day and the sun reaching an angle.
+
+    Same as compute_hour_angle, but where the sun never gets that far below
+    the horizon (at high latitudes, around the summer) this returns NaN
+    instead of raising ValueError, for high latitude rules to replace.
+
+    :param sin_angle: Sine of the (positive) angle below the horizon
+    :param sin_latitude: Sine of the latitude of the place of interest
+    :param cos_latitude: Cosine of the latitude of the place of interest
+    :param ephemeris: The Ephemeris for the day of interest
+    :returns: The positive floating point time delta from Zuhr, or NaN
+    """
+    numerator = -sin_angle - sin_latitude * ephemeris.sin_declination
+
+    denominator = cos_latitude * ephemeris.cos_declination
+
+    cosine = numerator/denominator
+    if -1 <= cosine <= 1:
+        return degrees(acos(cosine)) / 15
+    return NAN
+
+
+def compute_shadow_hour_angle(multiplier, latitude_rad, sin_latitude,
+                              cos_latitude, ephemeris):
+    """Compute the time between mid-day and a shadow length multiple.
+
+    This is the core of time_at_shadow_length, taking the latitude terms
+    directly so callers that reuse them don't have to recompute them.
+
+    :param multiplier: The multiplier of the object's length
+    :param latitude_rad: The latitude of the place of interest, in radians
+    :param sin_latitude: Sine of the latitude
+    :param cos_latitude: Cosine of the latitude
+    :param ephemeris: The Ephemeris for the day of interest
+    :returns: The positive floating point time delta from Zuhr
+    """
+    angle = arccot(
+        multiplier +
+        tan(abs(latitude_rad - ephemeris.declination))
+    )
+
+    numerator = sin(angle) - sin_latitude*ephemeris.sin_declination
+    denominator = cos_latitude * ephemeris.cos_declination
+
+    return degrees(acos(numerator/denominator)) / 15
+
+
+def compute_time_at_sun_angle(day, latitude, angle, ephemeris=None):
     """Compute the floating point time difference between mid-day and an angle.
 
     All the prayers are defined as certain angles from mid-day (Zuhr).
@@ -176,6 +645,7 @@ def compute_time_at_sun_angle(day, latitude, angle):
     :param day: The day to which to compute for
     :param longitude: Longitude of the place of interest
     :angle: The angle at which to compute the time
+    :param ephemeris: Optional precomputed Ephemeris for day
     :returns: The floating point time delta between Zuhr and the angle, the
               sign of the result corresponds to the sign of the angle
     """
@@ -184,18 +654,20 @@ def compute_time_at_sun_angle(day, latitude, angle):
 
     latitude_rad = radians(latitude)
 
-    declination = radians(sun_declination(day))
-
-    numerator = -sin(positive_angle_rad) - sin(latitude_rad) * sin(declination)
+    if ephemeris is None:
+        ephemeris = _day_ephemeris(day)
 
-    denominator = cos(latitude_rad) * cos(declination)
-
-    time_diff = degrees(acos(numerator/denominator)) / 15
+    time_diff = compute_hour_angle(
+        sin(positive_angle_rad),
+        sin(latitude_rad),
+        cos(latitude_rad),
+        ephemeris
+    )
 
     return time_diff * angle_sign
 
 
-def time_at_shadow_length(day, latitude, multiplier):
+def time_at_shadow_length(day, latitude, multiplier, ephemeris=None):
     """Compute the time at which an object's shadow is a multiple of its length.
 
     Specifically, determine the time the length of the shadow is a multiple of
@@ -209,18 +681,19 @@ def time_at_shadow_length(day, latitude, multiplier):
     :param day: The day which to compute for
     :param latitude: The latitude of the place of interest
     :param: multiplier: The multiplier of the object's length
+    :param ephemeris: Optional precomputed Ephemeris for day
     :returns: The floating point time delta between Zuhr and the time at which
               the lenghth of the shadow is as defined
     """
     latitude_rad = radians(latitude)
-    declination = radians(sun_declination(day))
 
-    angle = arccot(
-        multiplier +
-        tan(abs(latitude_rad - declination))
-    )
-
-    numerator = sin(angle) - sin(latitude_rad)*sin(declination)
-    denominator = cos(latitude_rad) * cos(declination)
+    if ephemeris is None:
+        ephemeris = _day_ephemeris(day)
 
-    return degrees(acos(numerator/denominator)) / 15
+    return compute_shadow_hour_angle(
+        multiplier,
+        latitude_rad,
+        sin(latitude_rad),
+        cos(latitude_rad),
+        ephemeris
+    )
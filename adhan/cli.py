@@ -0,0 +1,319 @@
+"""
+cli.py - Command line timetable generator.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import re
+import sys
+
+from datetime import date, datetime, timedelta
+
+from . import methods
+from .adhan import PrayerTimes
+from .methods import ASR_METHODS, METHODS
+from .parallel import iter_timetables
+from .store import LocationStore
+from .timetable import write_timetable_records
+from .zones import get_zone
+
+FORMATS = ('csv', 'jsonl', 'binary')
+
+WRITE_BUFFER_SIZE = 1 << 20
+
+#
+# 'HH:MM' for every minute of the day, so formatting a time is an index
+#
+_CLOCK = ['%02d:%02d' % divmod(minute, 60) for minute in range(24 * 60)]
+
+LOCATION_OPTIONS = ('-l', '--location')
+
+#
+# A location value starting with a minus sign, which argparse would otherwise
+# take for an option
+#
+_NEGATIVE_LOCATION = re.compile(r'^-\d|^-\.\d')
+
+
+def parse_date(text):
+    """Parse a YYYY-MM-DD command line argument."""
+    try:
+        return datetime.strptime(text, '%Y-%m-%d').date()
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(
+            'expected YYYY-MM-DD, got %r' % text
+        ) from error
+
+
+def parse_location(text):
+    """Parse a LATITUDE,LONGITUDE command line argument."""
+    try:
+        latitude, longitude = [float(value) for value in text.split(',')]
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(
+            'expected LATITUDE,LONGITUDE, got %r' % text
+        ) from error
+    return latitude, longitude
+
+
+def parse_timezone(text):
+    """Parse a timezone argument: a number of hours or a time zone name."""
+    try:
+        return _timezone(text)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error)) from error
+
+
+def _timezone(text):
+    """Parse hours or a time zone name, raising ValueError if unknown."""
+    try:
+        return float(text)
+    except ValueError:
+        pass
+
+    try:
+        get_zone(text)
+    except (KeyError, ValueError) as error:
+        raise ValueError('unknown time zone %r' % text) from error
+    return text
+
+
+def _join_negative_locations(argv):
+    """Attach location values starting with '-' to their option.
+
+    argparse takes '-33.87,151.21' for an option rather than the value of
+    -l, so it is passed on as '--location=-33.87,151.21' instead.
+    """
+    result = []
+    arguments = iter(argv)
+    for argument in arguments:
+        if argument in LOCATION_OPTIONS:
+            value = next(arguments, None)
+            if value is not None and _NEGATIVE_LOCATION.match(value):
+                result.append('--location=' + value)
+                continue
+            result.append(argument)
+            if value is not None:
+                result.append(value)
+            continue
+        result.append(argument)
+    return result
+
+
+def write_csv(output, name, days, timetable):
+    """Write one site's timetable as CSV rows of 'HH:MM' times."""
+    quoted = io.StringIO()
+    csv.writer(quoted, lineterminator='').writerow([name])
+    _write_rows(
+        output, days, timetable,
+        quoted.getvalue().replace('%', '%%') + ',%s' +
+        ',%s' * len(PrayerTimes._fields) + '\n'
+    )
+
+
+def write_jsonl(output, name, days, timetable):
+    """Write one site's timetable as JSON objects, one per line."""
+    _write_rows(
+        output, days, timetable,
+        '{"location": %s, "date": "%%s", %s}\n' % (
+            json.dumps(name).replace('%', '%%'),
+            ', '.join('"%s": "%%s"' % name for name in PrayerTimes._fields),
+        )
+    )
+
+
+def _write_rows(output, days, timetable, line):
+    """Format every day of a timetable with a line template in one write.
+
+    :param output: The text file to write to
+    :param days: The ISO date string of each day
+    :param timetable: An array('h') of minutes, as from iter_timetables
+    :param line: A format string taking the date and the six times
+    """
+    clock = [_CLOCK[minute % len(_CLOCK)] for minute in timetable]
+    prayers = len(PrayerTimes._fields)
+    output.write(''.join([
+        line % ((day,) + tuple(clock[i * prayers:(i + 1) * prayers]))
+        for i, day in enumerate(days)
+    ]))
+
+
+def _build_parser():
+    """Create the command line argument parser."""
+    parser = argparse.ArgumentParser(
+        prog='adhan',
+        description='Generate adhan timetables for one or many locations.',
+    )
+    parser.add_argument('-l', '--location', type=parse_location,
+                        action='append', default=[],
+                        metavar='LATITUDE,LONGITUDE',
+                        help='a location to calculate for, may be '
+                             'repeated, e.g. -l -33.87,151.21')
+    parser.add_argument('--locations', metavar='FILE',
+                        help='a CSV file of locations with id, latitude and '
+                             'longitude columns and optional method and '
+                             'timezone_offset columns, as read by '
+                             "adhan.store.LocationStore, or '-' for stdin")
+    parser.add_argument('-m', '--method', choices=METHODS, default='isna',
+                        help='the calculation method of locations without '
+                             'their own (default: isna)')
+    parser.add_argument('--asr', choices=ASR_METHODS, default='standard',
+                        help='the Asr method (default: standard)')
+    parser.add_argument('--high-latitude-rule',
+                        choices=methods.HIGH_LATITUDE_RULES,
+                        help='how to adjust Fajr and Isha at high latitudes')
+    parser.add_argument('-s', '--start', type=parse_date,
+                        default=date.today(),
+                        help='the first day, as YYYY-MM-DD (default: today)')
+    parser.add_argument('-e', '--end', type=parse_date,
+                        help='the last day, inclusive (default: the start)')
+    parser.add_argument('-t', '--timezone-offset', type=parse_timezone,
+                        default=0, metavar='HOURS_OR_ZONE',
+                        help='hours to add to every time, or a time zone '
+                             'name such as America/Chicago (default: 0)')
+    parser.add_argument('-f', '--format', choices=FORMATS, default='csv',
+                        help='the output format (default: csv)')
+    parser.add_argument('-o', '--output', metavar='PATH',
+                        help='the file to write, standard output by default. '
+                             'Binary output with several locations writes '
+                             'one timetable file per location into this '
+                             'directory')
+    parser.add_argument('-j', '--workers', type=int,
+                        help='worker processes (default: one per CPU)')
+    return parser
+
+
+def main(argv=None):
+    """Generate timetables from the command line."""
+    parser = _build_parser()
+    if argv is None:
+        argv = sys.argv[1:]
+    args = parser.parse_args(_join_negative_locations(argv))
+
+    end = args.end or args.start
+    if end < args.start:
+        parser.error('the end date is before the start date')
+
+    parameters = dict(METHODS[args.method], **ASR_METHODS[args.asr])
+    if args.high_latitude_rule:
+        parameters['high_latitude_rule'] = args.high_latitude_rule
+    store, names = _sites(parser, args, methods.compile_method(parameters))
+
+    if args.format == 'binary':
+        if not args.output:
+            parser.error('binary output needs --output')
+        if store.has_zones():
+            parser.error('binary output needs fixed timezone offsets')
+
+    workers = args.workers or min(os.cpu_count() or 1, len(store))
+    timetables = iter_timetables(store, None, (args.start, end), workers)
+
+    #
+    # Prayers the sun never reaches, far from the equator without a high
+    # latitude rule, are reported like bad arguments
+    #
+    try:
+        if args.format == 'binary':
+            _write_binary(args.output, store, args.start, timetables)
+        else:
+            _write_text(args, names, (args.start, end), timetables)
+    except ValueError as error:
+        parser.error('cannot compute the timetables (%s); far from the '
+                     'equator, try --high-latitude-rule' % error)
+
+    return 0
+
+
+def _sites(parser, args, plan):
+    """Collect the sites given with --location and --locations.
+
+    :returns: A LocationStore of the sites and the name of each in the
+              output: its coordinates for --location, its id for a file
+    """
+    store = LocationStore()
+    names = []
+    for index, (latitude, longitude) in enumerate(args.location):
+        store.add(index, latitude, longitude, plan, args.timezone_offset)
+        names.append('%s,%s' % (latitude, longitude))
+
+    if args.locations:
+        try:
+            store.load_csv(args.locations, plan, args.timezone_offset)
+        except (IOError, ValueError) as error:
+            parser.error(str(error))
+        names.extend(str(site_id) for site_id in store.ids[len(names):])
+
+    if not names:
+        parser.error('give at least one --location or a --locations file')
+    return store, names
+
+
+def _write_text(args, names, date_range, timetables):
+    """Write timetables as CSV or JSON lines, to --output or stdout."""
+    start, end = date_range
+    days = [
+        (start + timedelta(days=i)).isoformat()
+        for i in range((end - start).days + 1)
+    ]
+    write = write_csv if args.format == 'csv' else write_jsonl
+
+    if args.output:
+        output = io.open(args.output, 'w', buffering=WRITE_BUFFER_SIZE,
+                         encoding='utf-8', newline='')
+    else:
+        output = contextlib.nullcontext(sys.stdout)
+
+    with output as text:
+        if args.format == 'csv':
+            csv.writer(text, lineterminator='\n').writerow(
+                ['location', 'date'] + list(PrayerTimes._fields)
+            )
+        for name, timetable in zip(names, timetables):
+            write(text, name, days, timetable)
+
+
+def _write_binary(path, store, start, timetables):
+    """Write timetable files, one for a single site or a directory of them."""
+    if len(store) == 1:
+        _write_site(path, store.site(0), start, next(timetables))
+        return
+
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    width = len(str(len(store) - 1))
+    for row, timetable in enumerate(timetables):
+        _write_site(os.path.join(path, '%0*d.adhan' % (width, row)),
+                    store.site(row), start, timetable)
+
+
+def _write_site(path, site, start, timetable):
+    """Write the timetable of a StoredSite to a timetable file."""
+    write_timetable_records(
+        path, (site.latitude, site.longitude), site.parameters, start,
+        timetable, site.timezone_offset
+    )
+
+
+if __name__ == '__main__':
+    sys.exit(main())
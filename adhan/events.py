@@ -0,0 +1,309 @@
+"""
+events.py - Prayer events of many sites in time order.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import heapq
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque, namedtuple
+from datetime import date, datetime, timedelta, timezone
+from itertools import islice
+
+from .adhan import (
+    PrayerTimes,
+    compute_prayer_time,
+    compute_prayer_times,
+    floating_point_to_minutes,
+)
+from .calculations import solar_ephemeris
+from .location import as_location
+from .methods import compile_method
+
+#
+# A prayer computed for a day happens between the UTC midnights before and
+# two days after it, so the prayers happening on a UTC day come from that
+# day and its two neighbours. The index computes the days either side of
+# the two days it covers
+#
+COVERED_DAYS = 2
+DAYS_BEFORE = 1
+DAYS_AFTER = 1
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_SECONDS_PER_DAY = 24 * 60 * 60
+
+Event = namedtuple('Event', ['time', 'prayer', 'site'])
+
+
+class _DayEvents:
+    """The prayers of every site computed for one day, sorted per prayer.
+
+    For each prayer, times holds the instants in ascending order, as seconds
+    since the epoch rounded to the minute as adhan() rounds, and sites holds
+    the index of the site of each.
+    """
+
+    __slots__ = ('day', 'times', 'sites')
+
+    def __init__(self, day, locations, plans, prayers):
+        self.day = day
+        midnight = (day.toordinal() - _EPOCH_ORDINAL) * _SECONDS_PER_DAY
+        ephemeris = solar_ephemeris(day)
+
+        minutes = [[] for _ in prayers]
+        site_ids = [[] for _ in prayers]
+        indices = [PrayerTimes._fields.index(name) for name in prayers]
+
+        for site, (location, plan) in enumerate(zip(locations, plans)):
+            try:
+                times = compute_prayer_times(day, location, plan, ephemeris)
+            except ValueError:
+                times = _defined_prayer_times(day, location, plan, ephemeris)
+
+            for column, index in enumerate(indices):
+                fp_time = times[index]
+                if fp_time is not None:
+                    minutes[column].append(floating_point_to_minutes(fp_time))
+                    site_ids[column].append(site)
+
+        self.times = []
+        self.sites = []
+        for column_minutes, column_sites in zip(minutes, site_ids):
+            order = sorted(range(len(column_minutes)),
+                           key=column_minutes.__getitem__)
+            self.times.append(array('q', [
+                midnight + 60 * column_minutes[i] for i in order
+            ]))
+            self.sites.append(array('i', [column_sites[i] for i in order]))
+
+
+def _defined_prayer_times(day, location, plan, ephemeris):
+    """Compute the prayers of a day one by one, None where undefined."""
+    times = []
+    for name in PrayerTimes._fields:
+        try:
+            times.append(compute_prayer_time(name, day, location, plan,
+                                             ephemeris))
+        except ValueError:
+            times.append(None)
+    return PrayerTimes(*times)
+
+
+class EventIndex:
+    """The prayers of many sites, sorted by time, for live queries.
+
+    The index covers two UTC days, starting at day. For each prayer and
+    each day it computes, the instants of every site are kept in a sorted
+    array, so finding the prayers in a window of time or the next few
+    prayers is a binary search per array rather than a calculation per
+    site. advance moves the index to the next day by computing only the one
+    new day.
+
+    Times are naive UTC datetimes, rounded to the minute the same way as
+    adhan(); aware datetimes are accepted as arguments. Sites where a prayer
+    is undefined on a day (at high latitudes without a rule) have no event
+    for it.
+    """
+
+    def __init__(self, sites, day, prayers=PrayerTimes._fields):
+        """Compute the index.
+
+        :param sites: A sequence of (location, parameters) pairs, locations
+                      and parameters as accepted by adhan.adhan. Events
+                      refer to sites by their index in this sequence
+        :param day: The first UTC datetime.date to cover
+        :param prayers: The names of the prayers to index, all of them (as
+                        returned by adhan.adhan) by default
+        :raises ValueError: If prayers is empty or names unknown prayers
+        """
+        unknown = set(prayers) - set(PrayerTimes._fields)
+        if unknown or not prayers:
+            raise ValueError('prayers must be a non-empty subset of %s' % (
+                ', '.join(PrayerTimes._fields),
+            ))
+
+        self.prayers = tuple(
+            name for name in PrayerTimes._fields if name in prayers
+        )
+        self._locations = []
+        self._plans = []
+
+        #
+        # Sites mostly share a handful of parameter dicts, so compile each
+        # object once, keeping it alive so its id is not reused meanwhile
+        #
+        plans = {}
+        for location, parameters in sites:
+            plan = plans.get(id(parameters))
+            if plan is None:
+                plan = plans[id(parameters)] = (
+                    compile_method(parameters, strict=False), parameters
+                )
+            self._locations.append(as_location(location))
+            self._plans.append(plan[0])
+
+        self._days = deque()
+        self._build(day)
+
+    def __len__(self):
+        """Return the number of sites."""
+        return len(self._locations)
+
+    @property
+    def day(self):
+        """The first UTC day covered by the index."""
+        return self._days[DAYS_BEFORE].day
+
+    def _build(self, day):
+        """Compute every day needed to cover day, from scratch."""
+        self._days.clear()
+        for offset in range(-DAYS_BEFORE, COVERED_DAYS + DAYS_AFTER):
+            self._days.append(self._compute(day + timedelta(days=offset)))
+
+    def _compute(self, day):
+        """Compute the events of one day."""
+        return _DayEvents(day, self._locations, self._plans, self.prayers)
+
+    def advance(self, days=1):
+        """Move the index forward, computing only the days it lacks.
+
+        :param days: The number of days to move forward
+        """
+        target = self.day + timedelta(days=days)
+        if days < 0 or days >= len(self._days):
+            self._build(target)
+            return
+
+        for _ in range(days):
+            last = self._days[-1].day
+            self._days.popleft()
+            self._days.append(self._compute(last + timedelta(days=1)))
+
+    def roll_to(self, day):
+        """Move the index so it covers day and the day after it.
+
+        :param day: The new first UTC datetime.date to cover
+        """
+        if day != self.day:
+            self.advance((day - self.day).days)
+
+    def covers(self, when):
+        """Check whether a moment is within the two covered UTC days."""
+        instant = _instant(when)
+        start, end = self._bounds()
+        return start <= instant < end
+
+    def _bounds(self):
+        """Return the covered instants, as a half open range of seconds."""
+        start = (self.day.toordinal() - _EPOCH_ORDINAL) * _SECONDS_PER_DAY
+        return start, start + COVERED_DAYS * _SECONDS_PER_DAY
+
+    def _columns(self, prayers):
+        """Return the column of each prayer to search, in prayers order."""
+        if prayers is None:
+            return list(range(len(self.prayers)))
+        unknown = set(prayers) - set(self.prayers)
+        if unknown:
+            raise ValueError('prayers not in the index: %s' % (
+                ', '.join(sorted(unknown)),
+            ))
+        return [
+            column for column, name in enumerate(self.prayers)
+            if name in prayers
+        ]
+
+    def window(self, start, end, prayers=None):
+        """Find every prayer from start up to, not including, end.
+
+        :param start: A datetime, the start of the window
+        :param end: A datetime, the end of the window
+        :param prayers: Optional names of the prayers to include, all those
+                        of the index by default
+        :returns: A list of Event, in time order
+        :raises KeyError: If the window is not within the covered days
+        """
+        low, high = _instant(start), _instant(end)
+        first, last = self._bounds()
+        if not first <= low <= high <= last:
+            raise KeyError((start, end))
+
+        found = []
+        for column in self._columns(prayers):
+            for day_events in self._days:
+                times = day_events.times[column]
+                sites = day_events.sites[column]
+                for i in range(bisect_left(times, low),
+                               bisect_left(times, high)):
+                    found.append((times[i], column, sites[i]))
+
+        found.sort()
+        return [self._event(event) for event in found]
+
+    def next_events(self, when, count=1, prayers=None):
+        """Find the first prayers strictly after a moment.
+
+        Only prayers within the covered days are considered, so near the
+        end of them fewer than count may be found.
+
+        :param when: A datetime within the covered days
+        :param count: The number of prayers to find
+        :param prayers: Optional names of the prayers to include, all those
+                        of the index by default
+        :returns: A list of at most count Event, in time order
+        :raises KeyError: If when is not within the covered days
+        """
+        instant = _instant(when)
+        first, last = self._bounds()
+        if not first <= instant < last:
+            raise KeyError(when)
+
+        streams = []
+        for column in self._columns(prayers):
+            for day_events in self._days:
+                times = day_events.times[column]
+                start = bisect_right(times, instant)
+                end = bisect_left(times, last, start)
+                streams.append(_stream(times, day_events.sites[column],
+                                       column, start, end))
+
+        return [
+            self._event(event)
+            for event in islice(heapq.merge(*streams), count)
+        ]
+
+    def _event(self, event):
+        """Build the Event of a (seconds, column, site) tuple."""
+        seconds, column, site = event
+        return Event(_EPOCH + timedelta(seconds=seconds), self.prayers[column],
+                     site)
+
+
+def _stream(times, sites, column, start, end):
+    """Generate the (seconds, column, site) of a range of a sorted column."""
+    for i in range(start, end):
+        yield times[i], column, sites[i]
+
+
+def _instant(when):
+    """Convert a naive UTC or an aware datetime to seconds since the epoch."""
+    if when.tzinfo is not None:
+        when = when.astimezone(timezone.utc).replace(tzinfo=None)
+    return int((when - _EPOCH).total_seconds())
@@ -0,0 +1,399 @@
+"""
+fitted.py - Prayer times from yearly Chebyshev fits at fixed sites.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+from array import array
+from bisect import bisect_right
+from datetime import date
+
+from .adhan import (
+    PrayerCalculator,
+    PrayerTimes,
+    compute_latitude_offsets,
+    convert_prayer_times,
+)
+from .calculations import compute_zuhr_utc
+from .location import as_location
+from .methods import compile_method
+from .timetable import iter_ephemerides
+
+MAX_ERROR_SECONDS = 30.0
+
+#
+# The series fitted for each segment of the year: Zuhr, then the offsets of
+# the other prayers from it in LatitudeOffsets order. Each is a cubic, which
+# _evaluate_segment unrolls
+#
+SERIES = ('zuhr', 'fajr', 'shuruq', 'asr', 'maghrib', 'isha')
+DEGREE = 3
+SEGMENT_SIZE = len(SERIES) * (DEGREE + 1)
+
+
+class FittedTimetable:
+    """A year of prayer times at one site, stored as polynomial coefficients.
+
+    Every prayer time varies smoothly over the year, so rather than running
+    the solar calculations for each request, this fits cubics to Zuhr and to
+    the offsets of the other prayers from it, and a day is then evaluated
+    with three multiplications and additions per prayer.
+
+    The year is cut into segments, halved until every fitted time on every
+    day is within max_error_seconds of compute_prayer_times (checked with the
+    single precision coefficients actually stored), so the bound is verified
+    for the whole year when fitting rather than estimated. A typical site
+    needs about ten segments, around a kilobyte; kinks such as a high
+    latitude rule taking over need a few more around them.
+
+    Times are within max_error_seconds of adhan() before rounding, so
+    rounded to the minute they can differ from it by one minute near minute
+    boundaries.
+    """
+
+    __slots__ = (
+        'location', 'plan', 'year', 'max_error_seconds', 'error',
+        '_start_ordinal', '_days', '_boundaries', '_coefficients', '_wraps',
+    )
+
+    def __init__(self, location, parameters, year,
+                 max_error_seconds=MAX_ERROR_SECONDS):
+        """Fit the prayer times of a year.
+
+        :param location: An adhan.location.Location, or a 2-tuple of latitude
+                         and longitude in degrees
+        :param parameters: A parameter dict or CalculationPlan, as accepted by
+                           adhan.adhan
+        :param year: The year to fit
+        :param max_error_seconds: The largest error allowed on any day
+        :raises ValueError: If a prayer time is undefined on some day, as
+                            adhan() raises
+        """
+        self.location = as_location(location)
+        self.plan = compile_method(parameters, strict=False)
+        self.year = year
+        self.max_error_seconds = max_error_seconds
+        self._start_ordinal = date(year, 1, 1).toordinal()
+
+        exact = []
+        for day, ephemeris in iter_ephemerides(date(year, 1, 1),
+                                               date(year, 12, 31)):
+            offsets = compute_latitude_offsets(self.location, self.plan,
+                                               ephemeris)
+            zuhr = compute_zuhr_utc(day, self.location.longitude, ephemeris)
+            exact.append((zuhr,) + tuple(offsets))
+        self._days = len(exact)
+        zuhr_times = [times[0] for times in exact]
+
+        #
+        # Zuhr wraps around midnight UTC near the date line, so unwrap it
+        # into a continuous series before fitting; evaluation wraps it back
+        #
+        for i in range(1, len(exact)):
+            jump = exact[i][0] - exact[i - 1][0]
+            if abs(jump) > 12:
+                exact[i] = (exact[i][0] - 24 * round(jump / 24),) + \
+                    exact[i][1:]
+
+        self._boundaries = array('H')
+        self._coefficients = array('f')
+        self._wraps = array('H')
+        self.error = 0.0
+        self._fit(exact, 0, len(exact), max_error_seconds / 3600)
+
+        #
+        # Within the error of the fit of a Zuhr just after midnight UTC, the
+        # fitted time can land just before it, a day off once wrapped. Those
+        # few days are remembered and moved back across midnight
+        #
+        for day_index, zuhr_time in enumerate(zuhr_times):
+            fitted = self._evaluate(day_index)[0] % 24
+            if abs(fitted - zuhr_time) > 12:
+                self._wraps.append(day_index)
+
+    def _fit(self, exact, start, end, tolerance):
+        """Fit the days in [start, end), halving the range until it fits."""
+        count = end - start
+        columns = list(zip(*exact[start:end]))
+
+        coefficients = array('f')
+        for values in columns:
+            fitted = chebyshev_fit(values, min(DEGREE, count - 1))
+            fitted.extend([0.0] * (DEGREE + 1 - len(fitted)))
+            coefficients.extend(chebyshev_to_power(fitted))
+
+        error = 0.0
+        for i in range(count):
+            values = _evaluate_segment(coefficients, 0, _scaled(i, count))
+            zuhr_error = values[0] - columns[0][i]
+            error = max(error, abs(zuhr_error), *[
+                abs(values[k] - columns[k][i] + zuhr_error)
+                for k in range(1, len(SERIES))
+            ])
+
+        if error > tolerance and count > DEGREE + 1:
+            middle = start + count // 2
+            self._fit(exact, start, middle, tolerance)
+            self._fit(exact, middle, end, tolerance)
+            return
+
+        self._boundaries.append(start)
+        self._coefficients.extend(coefficients)
+        self.error = max(self.error, error * 3600)
+
+    @property
+    def segments(self):
+        """The number of segments the year was cut into."""
+        return len(self._boundaries)
+
+    @property
+    def nbytes(self):
+        """The number of bytes held by the coefficients and segments."""
+        return sum(
+            len(values) * values.itemsize for values in
+            (self._coefficients, self._boundaries, self._wraps)
+        )
+
+    def __contains__(self, day):
+        """Check whether a day is in the fitted year."""
+        return day.year == self.year
+
+    def prayer_times(self, day):
+        """Evaluate the UTC floating point prayer times on a day.
+
+        :param day: A datetime.date in the fitted year
+        :returns: A PrayerTimes of floating point UTC hours, within
+                  max_error_seconds of compute_prayer_times
+        :raises KeyError: If the day is outside the fitted year
+        """
+        day_index = day.toordinal() - self._start_ordinal
+        if not 0 <= day_index < self._days:
+            raise KeyError(day)
+
+        zuhr, fajr, shuruq, asr, maghrib, isha = self._evaluate(day_index)
+        zuhr_time = zuhr % 24
+        if day_index in self._wraps:
+            zuhr_time += -24 if zuhr_time > 12 else 24
+
+        #
+        # As prayer_times_from_offsets, unrolled
+        #
+        maghrib_time = zuhr_time + maghrib
+        if self.plan.isha_delay:
+            isha_time = maghrib_time + self.plan.isha_delay
+        else:
+            isha_time = zuhr_time + isha
+
+        return PrayerTimes(
+            zuhr_time + fajr,
+            zuhr_time + shuruq,
+            zuhr_time,
+            zuhr_time + asr,
+            maghrib_time,
+            isha_time,
+        )
+
+    def _evaluate(self, day_index):
+        """Evaluate every series of SERIES on a day of the year."""
+        boundaries = self._boundaries
+        segment = bisect_right(boundaries, day_index) - 1
+        start = boundaries[segment]
+        end = (boundaries[segment + 1] if segment + 1 < len(boundaries)
+               else self._days)
+
+        return _evaluate_segment(
+            self._coefficients, segment * SEGMENT_SIZE,
+            _scaled(day_index - start, end - start)
+        )
+
+    def times(self, day, timezone_offset=0, output='datetime'):
+        """Evaluate the adhan times on a day.
+
+        :param day: A datetime.date in the fitted year
+        :param timezone_offset: The number of hours to add to each prayer time,
+                                or a time zone, as accepted by adhan.adhan
+        :param output: The format of the result, as for adhan.adhan
+        :returns: The adhan times, as adhan.adhan returns them
+        :raises KeyError: If the day is outside the fitted year
+        """
+        return convert_prayer_times(
+            day, self.prayer_times(day), timezone_offset, output
+        )
+
+
+class FittedCalculator(PrayerCalculator):
+    """A PrayerCalculator answering from yearly fits of its site.
+
+    The first time a year is asked for, its FittedTimetable is fitted and
+    kept, and every day of that year is then evaluated from it instead of
+    being calculated. Use it in place of a PrayerCalculator for the sites
+    asked for most often, where the fit soon pays for itself.
+    """
+
+    __slots__ = ('max_error_seconds', '_fits')
+
+    def __init__(self, location, parameters, timezone_offset=0,
+                 max_error_seconds=MAX_ERROR_SECONDS):
+        """Create a calculator.
+
+        :param location: An adhan.location.Location, or a 2-tuple of latitude
+                         and longitude in degrees
+        :param parameters: A parameter dict or CalculationPlan, as accepted by
+                           adhan.adhan
+        :param timezone_offset: The number of hours to add to each prayer time,
+                                or a time zone, as accepted by adhan.adhan
+        :param max_error_seconds: The largest error allowed on any day
+        """
+        super().__init__(
+            location, parameters, timezone_offset
+        )
+        self.max_error_seconds = max_error_seconds
+        self._fits = {}
+
+    def fitted(self, year):
+        """Return the FittedTimetable of a year, fitting it if needed.
+
+        :raises ValueError: If a prayer time is undefined on some day of the
+                            year, as adhan() raises
+        """
+        fitted = self._fits.get(year)
+        if fitted is None:
+            fitted = self._fits[year] = FittedTimetable(
+                self.location, self.plan, year, self.max_error_seconds
+            )
+        return fitted
+
+    def times(self, day, output='datetime'):
+        """Evaluate the adhan times on a day.
+
+        :param day: The datetime.date to calculate for
+        :param output: The format of the result, as for adhan()
+        :returns: The times in that format, within max_error_seconds of what
+                  adhan() returns before rounding
+        """
+        times = self.fitted(day.year).prayer_times(day)
+        return convert_prayer_times(day, times, self.timezone_offset, output)
+
+
+def _evaluate_segment(coefficients, low, x):
+    """Evaluate the SERIES cubics of a segment at x, in Horner form."""
+    #
+    # Unrolled, as this is the whole cost of a fitted lookup: a loop over
+    # the series takes twice as long, slower than calculating the day
+    #
+    # pylint: disable=invalid-name,too-many-locals
+    (a0, a1, a2, a3, b0, b1, b2, b3, c0, c1, c2, c3,
+     d0, d1, d2, d3, e0, e1, e2, e3, f0, f1, f2, f3) = \
+        coefficients[low:low + SEGMENT_SIZE]
+    return (
+        a0 + x * (a1 + x * (a2 + x * a3)),
+        b0 + x * (b1 + x * (b2 + x * b3)),
+        c0 + x * (c1 + x * (c2 + x * c3)),
+        d0 + x * (d1 + x * (d2 + x * d3)),
+        e0 + x * (e1 + x * (e2 + x * e3)),
+        f0 + x * (f1 + x * (f2 + x * f3)),
+    )
+
+
+def chebyshev_fit(values, degree):
+    """Fit a Chebyshev series to equally spaced values by least squares.
+
+    :param values: The values at equally spaced points spanning [-1, 1]
+    :param degree: The degree of the series, below len(values)
+    :returns: The degree + 1 coefficients, as a list
+    """
+    count = len(values)
+    size = degree + 1
+
+    #
+    # Accumulate the normal equations. The Chebyshev basis keeps them well
+    # conditioned, unlike powers of x
+    #
+    matrix = [[0.0] * size for _ in range(size)]
+    vector = [0.0] * size
+    for i, value in enumerate(values):
+        basis = _chebyshev_basis(_scaled(i, count), size)
+        for row in range(size):
+            vector[row] += basis[row] * value
+            for column in range(size):
+                matrix[row][column] += basis[row] * basis[column]
+
+    return _solve(matrix, vector)
+
+
+def chebyshev_to_power(coefficients):
+    """Convert a Chebyshev series to the coefficients of powers of x.
+
+    :param coefficients: The Chebyshev coefficients, lowest degree first
+    :returns: The coefficients of 1, x, x**2, ..., as a list
+    """
+    result = [0.0] * len(coefficients)
+    previous, current = [1.0], [0.0, 1.0]
+    for degree, coefficient in enumerate(coefficients):
+        if degree == 0:
+            polynomial = previous
+        elif degree == 1:
+            polynomial = current
+        else:
+            #
+            # T(n) = 2x T(n - 1) - T(n - 2)
+            #
+            polynomial = [0.0] + [2 * term for term in current]
+            for power, term in enumerate(previous):
+                polynomial[power] -= term
+            previous, current = current, polynomial
+        for power, term in enumerate(polynomial):
+            result[power] += coefficient * term
+    return result
+
+
+def _scaled(index, count):
+    """Map the index of one of count equally spaced points onto [-1, 1]."""
+    if count == 1:
+        return 0.0
+    return 2 * index / (count - 1) - 1
+
+
+def _chebyshev_basis(position, size):
+    """Compute the first size Chebyshev polynomials at a position."""
+    basis = [1.0, position][:size]
+    while len(basis) < size:
+        basis.append(2 * position * basis[-1] - basis[-2])
+    return basis
+
+
+def _solve(matrix, vector):
+    """Solve a small linear system by Gaussian elimination with pivoting."""
+    size = len(vector)
+    for column in range(size):
+        pivot = max(range(column, size),
+                    key=lambda row, column=column: abs(matrix[row][column]))
+        matrix[column], matrix[pivot] = matrix[pivot], matrix[column]
+        vector[column], vector[pivot] = vector[pivot], vector[column]
+        for row in range(column + 1, size):
+            factor = matrix[row][column] / matrix[column][column]
+            for k in range(column, size):
+                matrix[row][k] -= factor * matrix[column][k]
+            vector[row] -= factor * vector[column]
+
+    solution = [0.0] * size
+    for row in range(size - 1, -1, -1):
+        total = vector[row] - sum(
+            matrix[row][k] * solution[k] for k in range(row + 1, size)
+        )
+        solution[row] = total / matrix[row][row]
+    return solution
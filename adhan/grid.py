@@ -0,0 +1,349 @@
+"""
+grid.py - Precomputed latitude grids for arbitrary coordinates.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import math
+import struct
+import sys
+
+from array import array
+from datetime import date
+
+from .adhan import (
+    PrayerTimes,
+    compute_latitude_offsets,
+    compute_prayer_times,
+    convert_prayer_times,
+)
+from .calculations import compute_hour_angle_or_nan, solar_ephemeris
+from .location import Location
+from .methods import compile_method
+from .timetable import (
+    header_parameters,
+    iter_ephemerides,
+    plan_header_fields,
+)
+
+#
+# The prayers stored in the grid, as offsets from Zuhr
+#
+OFFSET_PRAYERS = ('fajr', 'shuruq', 'asr', 'maghrib', 'isha')
+
+GRID_MAGIC = b'ADHG'
+GRID_VERSION = 2
+GRID_HEADER = struct.Struct('<4sHiidddiddddB')
+
+NAN = float('nan')
+
+
+class LatitudeGrid:
+    """Prayer times for arbitrary coordinates from a precomputed grid.
+
+    Only Zuhr depends on longitude, and it is cheap: the time between Zuhr
+    and every other prayer depends on nothing but the day and the latitude.
+    So rather than a latitude by longitude grid, this precomputes those
+    offsets for each day on a grid of latitudes, and a query interpolates
+    them linearly between the two nearest latitudes and adds the exact Zuhr
+    for the longitude. A query is a few array lookups and multiplications.
+
+    Linear interpolation is poor in a few places: where Asr's formula has a
+    kink (the latitude equal to the sun's declination), where a high
+    latitude rule starts or stops capping Fajr or Isha, and where they
+    approach latitudes at which they stop being defined. So while building,
+    the cells holding each day's kinks are marked to be computed exactly,
+    and every other cell is checked at its midpoint, where the error of
+    interpolating a smooth curve peaks, against the exact times; cells off
+    by more than max_error_seconds are marked too. Interpolated
+    times are therefore within max_error_seconds of adhan() (before
+    rounding to the minute), and most queries never touch the trigonometry.
+    """
+
+    def __init__(self, parameters, start, end, step=0.25,
+                 min_latitude=-60, max_latitude=60, max_error_seconds=1.0):
+        """Precompute the grid.
+
+        :param parameters: A parameter dict or CalculationPlan, as accepted by
+                           adhan.adhan
+        :param start: The first datetime.date of the grid
+        :param end: The last datetime.date of the grid, inclusive
+        :param step: The spacing of the grid's latitudes, in degrees
+        :param min_latitude: The southernmost latitude of the grid
+        :param max_latitude: The northernmost latitude of the grid
+        :param max_error_seconds: The largest interpolation error allowed in
+                                  a cell before it is computed exactly
+        """
+        self.plan = compile_method(parameters, strict=False)
+        self.start = start
+        self.end = end
+        self._start_ordinal = start.toordinal()
+        self.step = step
+        self.min_latitude = min_latitude
+        self.latitude_count = int(round(
+            (max_latitude - min_latitude) / step
+        )) + 1
+        self.max_latitude = min_latitude + step * (self.latitude_count - 1)
+        self.max_error_seconds = max_error_seconds
+
+        self._equation_of_time = array('d')
+        self._offsets = array('d')
+        self._exact = bytearray()
+
+        nodes = [
+            Location(min_latitude + i * step, 0)
+            for i in range(self.latitude_count)
+        ]
+
+        for _, ephemeris in iter_ephemerides(start, end):
+            self._equation_of_time.append(ephemeris.equation_of_time)
+
+            offsets = []
+            for node in nodes:
+                offsets.extend(_node_offsets(node, self.plan, ephemeris))
+            self._offsets.extend(offsets)
+            self._exact.extend(self._inexact_cells(offsets, ephemeris))
+
+    def _inexact_cells(self, offsets, ephemeris):
+        """Find the cells of a day that interpolation gets wrong.
+
+        :param offsets: The day's offsets at every node, node after node
+        :param ephemeris: The Ephemeris of the day
+        :returns: A bytearray with a flag per cell, set for the cells to
+                  compute exactly
+        """
+        width = len(OFFSET_PRAYERS)
+        tolerance = self.max_error_seconds / 3600
+        inexact = bytearray()
+        for i in range(self.latitude_count - 1):
+            low = i * width
+            latitude = self.min_latitude + (i + 0.5) * self.step
+            exact = _node_offsets(Location(latitude, 0), self.plan, ephemeris)
+            inexact.append(not all(
+                abs((offsets[low + k] + offsets[low + k + width]) / 2 -
+                    exact[k]) <= tolerance
+                for k in range(width)
+            ))
+
+        #
+        # Asr has a kink where the latitude equals the sun's declination,
+        # which a check at the midpoint can miss, so that cell is always
+        # computed exactly
+        #
+        position = (
+            (math.degrees(ephemeris.declination) - self.min_latitude) /
+            self.step
+        )
+        if 0 <= position <= self.latitude_count - 1:
+            inexact[min(int(position), self.latitude_count - 2)] = True
+
+        #
+        # So does a high latitude rule where it takes over from the angle
+        # of Fajr or Isha: the cells whose two nodes disagree on which
+        # prayers are capped hold the kink
+        #
+        if self.plan.high_latitude_rule is not None:
+            capped = [
+                _capped_prayers(
+                    Location(self.min_latitude + i * self.step, 0),
+                    self.plan, ephemeris, offsets[i * width:(i + 1) * width]
+                )
+                for i in range(self.latitude_count)
+            ]
+            for i in range(self.latitude_count - 1):
+                if capped[i] != capped[i + 1]:
+                    inexact[i] = True
+        return inexact
+
+    @property
+    def days(self):
+        """The number of days in the grid."""
+        return len(self._equation_of_time)
+
+    def __contains__(self, key):
+        """Check whether a (day, latitude) pair is covered by the grid."""
+        day, latitude = key
+        return (
+            0 <= day.toordinal() - self._start_ordinal < self.days and
+            self.min_latitude <= latitude <= self.max_latitude
+        )
+
+    def prayer_times(self, day, latitude, longitude):
+        """Interpolate the UTC floating point prayer times at a point.
+
+        :param day: A datetime.date covered by the grid
+        :param latitude: A latitude covered by the grid, in degrees
+        :param longitude: Any longitude, in degrees
+        :returns: A PrayerTimes of floating point UTC hours
+        :raises KeyError: If the day or latitude is outside the grid
+        :raises ValueError: If a prayer time is undefined there, as
+                            adhan() raises
+        """
+        day_index = day.toordinal() - self._start_ordinal
+        position = (latitude - self.min_latitude) / self.step
+        if not (0 <= day_index < len(self._equation_of_time) and
+                0 <= position <= self.latitude_count - 1):
+            raise KeyError((day, latitude))
+
+        node = min(int(position), self.latitude_count - 2)
+
+        if self._exact[day_index * (self.latitude_count - 1) + node]:
+            return compute_prayer_times(
+                day, Location(latitude, longitude), self.plan,
+                solar_ephemeris(day)
+            )
+
+        weight = position - node
+        low = (day_index * self.latitude_count + node) * 5
+        high = low + 5
+        offsets = self._offsets
+        zuhr = abs(
+            12 + (abs(longitude) / 15) - self._equation_of_time[day_index]
+        ) % 24
+
+        #
+        # Same as compute_zuhr_utc, then the offsets interpolated in
+        # OFFSET_PRAYERS order, unrolled for speed
+        #
+        return PrayerTimes(
+            zuhr + offsets[low] + weight * (offsets[high] - offsets[low]),
+            zuhr + offsets[low + 1] +
+            weight * (offsets[high + 1] - offsets[low + 1]),
+            zuhr,
+            zuhr + offsets[low + 2] +
+            weight * (offsets[high + 2] - offsets[low + 2]),
+            zuhr + offsets[low + 3] +
+            weight * (offsets[high + 3] - offsets[low + 3]),
+            zuhr + offsets[low + 4] +
+            weight * (offsets[high + 4] - offsets[low + 4]),
+        )
+
+    def query(self, day, location, timezone_offset=0, output='datetime'):
+        """Interpolate the adhan times at a location.
+
+        :param day: A datetime.date covered by the grid
+        :param location: A (latitude, longitude) pair or Location
+        :param timezone_offset: The number of hours to add to each prayer time
+        :param output: The format of the result, as for adhan.adhan
+        :returns: The times in that format, as adhan.adhan returns them
+        """
+        latitude, longitude = location
+        times = self.prayer_times(day, latitude, longitude)
+        return convert_prayer_times(day, times, timezone_offset, output)
+
+    def save(self, path):
+        """Write the grid to a file.
+
+        :param path: The path of the file to write
+        """
+        header = GRID_HEADER.pack(
+            GRID_MAGIC, GRID_VERSION, self.start.toordinal(), self.days,
+            self.min_latitude, self.step, self.max_error_seconds,
+            self.latitude_count, *plan_header_fields(self.plan)
+        )
+        with open(path, 'wb') as output:
+            output.write(header)
+            for values in (self._equation_of_time, self._offsets):
+                if sys.byteorder != 'little':
+                    values = array('d', values)
+                    values.byteswap()
+                output.write(values.tobytes())
+            output.write(self._exact)
+
+    @classmethod
+    def load(cls, path):
+        """Read a grid written by save.
+
+        :param path: The path of the grid file
+        :returns: A LatitudeGrid
+        :raises ValueError: If the file is not a grid file
+        """
+        with open(path, 'rb') as grid_file:
+            data = grid_file.read()
+
+        if len(data) < GRID_HEADER.size:
+            raise ValueError('file is too small to be a grid')
+        fields = GRID_HEADER.unpack_from(data)
+        (magic, version, start_ordinal, days, min_latitude, step,
+         max_error_seconds, latitude_count) = fields[:-5]
+        if magic != GRID_MAGIC:
+            raise ValueError('not a grid file')
+        if version != GRID_VERSION:
+            raise ValueError('unsupported grid version %d' % version)
+
+        value_count = days * (1 + latitude_count * len(OFFSET_PRAYERS))
+        exact_offset = GRID_HEADER.size + value_count * 8
+        exact = bytearray(data[exact_offset:])
+        if len(exact) != days * (latitude_count - 1):
+            raise ValueError('grid file is truncated')
+
+        values = array('d')
+        values.frombytes(data[GRID_HEADER.size:exact_offset])
+        if sys.byteorder != 'little':
+            values.byteswap()
+
+        grid = cls.__new__(cls)
+        grid.plan = compile_method(header_parameters(fields[-5:]))
+        grid.start = date.fromordinal(start_ordinal)
+        grid._start_ordinal = start_ordinal
+        grid.end = date.fromordinal(start_ordinal + days - 1)
+        grid.step = step
+        grid.min_latitude = min_latitude
+        grid.latitude_count = latitude_count
+        grid.max_latitude = min_latitude + step * (latitude_count - 1)
+        grid.max_error_seconds = max_error_seconds
+        grid._equation_of_time = values[:days]
+        grid._offsets = values[days:]
+        grid._exact = exact
+        return grid
+
+
+def _node_offsets(location, plan, ephemeris):
+    """Compute the offsets from Zuhr of a grid node, NaN where undefined."""
+    try:
+        return list(compute_latitude_offsets(location, plan, ephemeris))
+    except ValueError:
+        return [NAN] * len(OFFSET_PRAYERS)
+
+
+def _capped_prayers(location, plan, ephemeris, offsets):
+    """Tell which of Fajr and Isha a high latitude rule caps at a node.
+
+    :param offsets: The node's offsets, in OFFSET_PRAYERS order
+    :returns: A tuple of a flag for Fajr, then one for Isha unless the plan
+              has an Isha delay
+    """
+    _, shuruq_offset, _, maghrib, _ = offsets
+    night = 24 + shuruq_offset - maghrib
+
+    #
+    # As adhan._high_latitude_hour_angles, where comparisons with NaN are
+    # false too
+    #
+    fajr = compute_hour_angle_or_nan(
+        plan.sin_fajr_angle, location.sin_latitude, location.cos_latitude,
+        ephemeris
+    )
+    capped = (not fajr + shuruq_offset <= plan.fajr_night_portion * night,)
+    if plan.isha_night_portion is None:
+        return capped
+
+    isha = compute_hour_angle_or_nan(
+        plan.sin_isha_angle, location.sin_latitude, location.cos_latitude,
+        ephemeris
+    )
+    return capped + (not isha - maghrib <= plan.isha_night_portion * night,)
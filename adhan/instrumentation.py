@@ -0,0 +1,232 @@
+"""
+instrumentation.py - Opt-in counters and timers for the calculation stages.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import functools
+import sys
+
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from importlib import import_module
+from timeit import default_timer
+
+#
+# The functions timed as each stage, as (module, attribute). The pipeline
+# calls them through module globals, so while instrumentation is enabled
+# they are replaced by timing wrappers everywhere they are bound in the
+# package, and put back afterwards; when it is disabled nothing is wrapped
+# and nothing is counted.
+#
+# Stages nest (prayer_times includes the hour angles it computes), so their
+# times are inclusive.
+#
+STAGES = OrderedDict([
+    ('ephemeris', ('adhan.calculations', 'EPHEMERIS_CACHE.compute')),
+    ('ephemeris_at', ('adhan.calculations', 'compute_ephemeris_at')),
+    ('zuhr', ('adhan.calculations', 'compute_zuhr_utc')),
+    ('hour_angle', ('adhan.calculations', 'compute_hour_angle')),
+    ('hour_angle_or_nan', ('adhan.calculations', 'compute_hour_angle_or_nan')),
+    ('shadow_hour_angle', ('adhan.calculations', 'compute_shadow_hour_angle')),
+    ('latitude_offsets', ('adhan.adhan', 'compute_latitude_offsets')),
+    ('prayer_times', ('adhan.adhan', 'compute_prayer_times')),
+    ('prayer_time', ('adhan.adhan', 'compute_prayer_time')),
+    ('convert', ('adhan.adhan', 'convert_prayer_times')),
+    ('to_datetime', ('adhan.adhan', 'floating_point_to_datetime')),
+    ('zone_offsets', ('adhan.zones', 'ZoneTransitions.day_offsets')),
+])
+
+#
+# The caches whose hits and misses are reported, as (module, attribute)
+#
+CACHES = OrderedDict([
+    ('ephemeris', ('adhan.calculations', 'EPHEMERIS_CACHE')),
+    ('latitude_offsets', ('adhan.adhan', 'LATITUDE_OFFSETS_CACHE')),
+    ('zone_transitions', ('adhan.zones', 'ZONE_TRANSITIONS_CACHE')),
+])
+
+_COLLECTORS = []
+_PATCHES = []
+
+
+class Collector:
+    """The calls and time spent per stage while it was collecting."""
+
+    def __init__(self):
+        """Create an empty collector."""
+        self.calls = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self._cache_start = _cache_counts()
+        self._cache_end = None
+
+    def record(self, stage, seconds):
+        """Count one call of a stage taking a number of seconds."""
+        self.calls[stage] += 1
+        self.seconds[stage] += seconds
+
+    def stop(self):
+        """Freeze the cache statistics at their current values."""
+        self._cache_end = _cache_counts()
+
+    def cache_stats(self):
+        """Return the hits, misses and hit rate of each cache meanwhile."""
+        end = self._cache_end or _cache_counts()
+        stats = OrderedDict()
+        for name, (hits, misses) in end.items():
+            hits -= self._cache_start[name][0]
+            misses -= self._cache_start[name][1]
+            lookups = hits + misses
+            stats[name] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / lookups if lookups else None,
+            }
+        return stats
+
+    def as_dict(self):
+        """Export everything collected as a dict of plain values.
+
+        :returns: A dict with 'stages', mapping each stage that was called to
+                  its 'calls', total 'seconds' and 'mean_seconds', and
+                  'caches', mapping each cache to its 'hits', 'misses' and
+                  'hit_rate' (None when it wasn't used)
+        """
+        stages = OrderedDict()
+        for name in STAGES:
+            calls = self.calls.get(name, 0)
+            if calls:
+                stages[name] = {
+                    'calls': calls,
+                    'seconds': self.seconds[name],
+                    'mean_seconds': self.seconds[name] / calls,
+                }
+        return {'stages': stages, 'caches': self.cache_stats()}
+
+
+@contextmanager
+def collect():
+    """Collect the calls and time of each stage within a with block.
+
+    .. code:: python
+
+        with collect() as collector:
+            adhan(day, location, parameters)
+        metrics = collector.as_dict()
+
+    Collections can be nested; each collector sees everything that happens
+    while it is open. Instrumentation is process wide and not thread safe.
+
+    :returns: A context manager giving a Collector
+    """
+    collector = Collector()
+    if not _COLLECTORS:
+        _patch()
+    _COLLECTORS.append(collector)
+    try:
+        yield collector
+    finally:
+        _COLLECTORS.remove(collector)
+        if not _COLLECTORS:
+            _unpatch()
+        collector.stop()
+
+
+def is_enabled():
+    """Check whether instrumentation is currently collecting."""
+    return bool(_COLLECTORS)
+
+
+def _resolve(module_name, attribute):
+    """Find the object holding a dotted attribute and its last name."""
+    owner = import_module(module_name)
+    path = attribute.split('.')
+    for name in path[:-1]:
+        owner = getattr(owner, name)
+    return owner, path[-1]
+
+
+def _cache_counts():
+    """Return the current (hits, misses) of each cache."""
+    counts = OrderedDict()
+    for name, (module_name, attribute) in CACHES.items():
+        cache = getattr(import_module(module_name), attribute)
+        counts[name] = (cache.hits, cache.misses)
+    return counts
+
+
+def _timed(stage, func):
+    """Wrap a function to report each call's duration to the collectors."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = default_timer()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = default_timer() - start
+            for collector in _COLLECTORS:
+                collector.record(stage, elapsed)
+    return wrapper
+
+
+def _package_modules():
+    """Return the loaded modules of the package."""
+    return [
+        module for name, module in list(sys.modules.items())
+        if module is not None and name.split('.')[0] == 'adhan'
+    ]
+
+
+def _patch():
+    """Replace every binding of each stage function with a timing wrapper."""
+    for stage, (module_name, attribute) in STAGES.items():
+        owner, name = _resolve(module_name, attribute)
+        original = getattr(owner, name)
+        wrapper = _timed(stage, original)
+        _PATCHES.append((owner, name, original, wrapper))
+
+        if owner is not sys.modules[module_name]:
+            setattr(owner, name, wrapper)
+            continue
+
+        #
+        # Other modules import the function by name, so replace it in every
+        # loaded module of the package that refers to it
+        #
+        for module in _package_modules():
+            for key, value in list(vars(module).items()):
+                if value is original:
+                    setattr(module, key, wrapper)
+
+
+def _unpatch():
+    """Put back every function replaced by _patch.
+
+    Modules imported while instrumentation was enabled may have imported a
+    wrapper by name, so every module is searched for them, not only those
+    that were patched.
+    """
+    originals = {}
+    while _PATCHES:
+        owner, name, original, wrapper = _PATCHES.pop()
+        setattr(owner, name, original)
+        originals[id(wrapper)] = (wrapper, original)
+
+    for module in _package_modules():
+        for key, value in list(vars(module).items()):
+            if id(value) in originals and originals[id(value)][0] is value:
+                setattr(module, key, originals[id(value)][1])
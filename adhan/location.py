@@ -0,0 +1,88 @@
+"""
+location.py - Fixed places of interest with precomputed latitude terms.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+from math import cos, radians, sin
+
+
+class Location:
+    """A fixed place of interest.
+
+    Every prayer time calculation needs the sine and cosine of the latitude,
+    so a Location computes them once when it is created. Locations use
+    __slots__ so that registries of many thousands of them stay small.
+    """
+
+    __slots__ = (
+        'latitude',
+        'longitude',
+        'latitude_rad',
+        'sin_latitude',
+        'cos_latitude',
+    )
+
+    def __init__(self, latitude, longitude):
+        """Create a location from its coordinates.
+
+        :param latitude: Latitude of the location in degrees
+        :param longitude: Longitude of the location in degrees
+        """
+        self.latitude = latitude
+        self.longitude = longitude
+        self.latitude_rad = radians(latitude)
+        self.sin_latitude = sin(self.latitude_rad)
+        self.cos_latitude = cos(self.latitude_rad)
+
+    def __iter__(self):
+        """Unpack like a (latitude, longitude) tuple."""
+        yield self.latitude
+        yield self.longitude
+
+    def __eq__(self, other):
+        """Compare locations by their coordinates."""
+        if not isinstance(other, Location):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __ne__(self, other):
+        """Compare locations by their coordinates."""
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __hash__(self):
+        """Hash locations by their coordinates."""
+        return hash(tuple(self))
+
+    def __repr__(self):
+        """Represent the location by its coordinates."""
+        return 'Location(%r, %r)' % (self.latitude, self.longitude)
+
+
+def as_location(location):
+    """Return location as a Location, converting a (lat, lon) pair if needed.
+
+    :param location: A Location or a 2-tuple of latitude and longitude
+    :returns: A Location
+    """
+    if isinstance(location, Location):
+        return location
+    latitude, longitude = location
+    return Location(latitude, longitude)
@@ -20,6 +20,10 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 # pylint: disable=pointless-string-statement
 
+from collections import OrderedDict, namedtuple
+from math import radians, sin
+from numbers import Real
+
 
 """
 
@@ -74,3 +78,195 @@ ASR_STANDARD = {
 ASR_HANAFI = {
     'asr_multiplier': 2,
 }
+
+
+"""
+
+High Latitude Rules
+
+Far from the equator the sun may not get as far below the horizon as the
+Fajr or Isha angle, so those times are undefined (or absurdly far apart)
+around the summer. These rules cap the time between Fajr and sunrise, and
+between sunset and Isha, at a portion of the night. Without one, computing
+an undefined time raises ValueError.
+
+"""
+MIDDLE_OF_NIGHT = {
+    'high_latitude_rule': 'middle_of_night',
+}
+
+ONE_SEVENTH = {
+    'high_latitude_rule': 'one_seventh',
+}
+
+ANGLE_BASED = {
+    'high_latitude_rule': 'angle_based',
+}
+
+HIGH_LATITUDE_RULES = ('middle_of_night', 'one_seventh', 'angle_based')
+
+
+"""
+
+Method Names
+
+The names the methods above go by on the command line and in location files
+
+"""
+METHODS = OrderedDict([
+    ('isna', ISNA),
+    ('muslim_world_league', MUSLIM_WORLD_LEAGUE),
+    ('egypt', EGYPT),
+    ('makkah', MAKKAH),
+    ('karachi', KARACHI),
+    ('tehran', TEHRAN),
+    ('shia', SHIA),
+])
+
+ASR_METHODS = OrderedDict([
+    ('standard', ASR_STANDARD),
+    ('hanafi', ASR_HANAFI),
+])
+
+
+"""
+
+Compiled Calculation Plans
+
+"""
+PARAMETER_NAMES = frozenset([
+    'fajr_angle',
+    'isha_angle',
+    'isha_delay',
+    'asr_multiplier',
+    'high_latitude_rule',
+])
+
+#
+# The fraction of the night each high latitude rule allows between Fajr and
+# sunrise or between sunset and Isha. Angle based, which has no fixed
+# portion, divides the night into sixtieths and allows the angle's worth
+#
+NIGHT_PORTIONS = {
+    'middle_of_night': 1 / 2,
+    'one_seventh': 1 / 7,
+}
+
+CalculationPlan = namedtuple('CalculationPlan', [
+    'fajr_angle',
+    'sin_fajr_angle',
+    'isha_angle',
+    'sin_isha_angle',
+    'isha_delay',
+    'asr_multiplier',
+    'high_latitude_rule',
+    'fajr_night_portion',
+    'isha_night_portion',
+])
+
+
+def _positive_number(name, value):
+    """Check that the value of a parameter is a positive number."""
+    if isinstance(value, bool) or not isinstance(value, Real) or value <= 0:
+        raise ValueError(
+            '%s must be a positive number, got %r' % (name, value)
+        )
+    return value
+
+
+def _angle(parameters, name, strict):
+    """Fetch the angle parameters[name] below the horizon.
+
+    Unless strict, an angle given as negative is taken by its size.
+    """
+    value = parameters[name]
+    if not strict and isinstance(value, Real) and value < 0:
+        value = -value
+    return _positive_number(name, value)
+
+
+def _night_portion(high_latitude_rule, angle):
+    """Return the portion of the night a rule allows for an angle."""
+    if high_latitude_rule == 'angle_based':
+        return angle / 60
+    return NIGHT_PORTIONS[high_latitude_rule]
+
+
+def compile_method(parameters, strict=True):
+    """Validate a parameter dict and compile it into a CalculationPlan.
+
+    The methods in this module are constant, so everything adhan() derives
+    from them (the sine of each angle, whether Isha is an angle or a delay,
+    the Asr multiplier) can be worked out once up front. The returned plan
+    is immutable and can be passed anywhere a parameter dict is accepted.
+
+    adhan() and the other functions that take a parameter dict compile it
+    with strict=False, which keeps what adhan() has always accepted: keys
+    other than the parameters are ignored and a negative angle is taken as
+    its size below the horizon.
+
+    :param parameters: A dictionary-like object of parameters, as accepted by
+                       adhan.adhan
+    :param strict: Whether to reject unknown parameters and negative angles
+    :returns: A CalculationPlan
+    :raises ValueError: If a parameter is missing, not a known high latitude
+                        rule, not a positive number or, when strict, unknown
+    """
+    if isinstance(parameters, CalculationPlan):
+        return parameters
+
+    unknown = set(parameters) - PARAMETER_NAMES
+    if unknown and strict:
+        raise ValueError(
+            'unknown parameters: %s' % ', '.join(sorted(unknown))
+        )
+
+    if 'fajr_angle' not in parameters:
+        raise ValueError('fajr_angle is required')
+    fajr_angle = _angle(parameters, 'fajr_angle', strict)
+
+    #
+    # Like adhan(), a truthy isha_delay takes precedence over isha_angle
+    #
+    isha_angle = sin_isha_angle = isha_delay = None
+    if parameters.get('isha_delay', None):
+        isha_delay = _positive_number('isha_delay', parameters['isha_delay'])
+    elif 'isha_angle' in parameters:
+        isha_angle = _angle(parameters, 'isha_angle', strict)
+        sin_isha_angle = sin(radians(isha_angle))
+    else:
+        raise ValueError('one of isha_angle or isha_delay is required')
+
+    asr_multiplier = ASR_STANDARD['asr_multiplier']
+    if 'asr_multiplier' in parameters:
+        asr_multiplier = _positive_number('asr_multiplier',
+                                          parameters['asr_multiplier'])
+
+    high_latitude_rule = parameters.get('high_latitude_rule', None)
+    if high_latitude_rule not in HIGH_LATITUDE_RULES + (None,):
+        raise ValueError(
+            'high_latitude_rule must be one of %s, got %r' %
+            (', '.join(HIGH_LATITUDE_RULES), high_latitude_rule)
+        )
+
+    #
+    # An Isha delay is always defined, so rules only ever move an Isha angle
+    #
+    fajr_night_portion = isha_night_portion = None
+    if high_latitude_rule is not None:
+        fajr_night_portion = _night_portion(high_latitude_rule, fajr_angle)
+        if isha_angle is not None:
+            isha_night_portion = _night_portion(high_latitude_rule,
+                                                isha_angle)
+
+    return CalculationPlan(
+        fajr_angle=fajr_angle,
+        sin_fajr_angle=sin(radians(fajr_angle)),
+        isha_angle=isha_angle,
+        sin_isha_angle=sin_isha_angle,
+        isha_delay=isha_delay,
+        asr_multiplier=asr_multiplier,
+        high_latitude_rule=high_latitude_rule,
+        fajr_night_portion=fajr_night_portion,
+        isha_night_portion=isha_night_portion,
+    )
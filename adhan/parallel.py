@@ -0,0 +1,235 @@
+"""
+parallel.py - Building timetables for many locations on multiple cores.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import os
+
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from numbers import Real
+
+from .adhan import (
+    PrayerTimes,
+    compute_prayer_times,
+    convert_zoned_prayer_times,
+    floating_point_to_minutes,
+)
+from .calculations import set_solar_backend, solar_backend
+from .location import Location
+from .methods import compile_method
+from .store import LocationStore
+from .timetable import iter_ephemerides
+from .zones import get_zone, is_zone
+
+CHUNKS_PER_WORKER = 4
+MAX_CHUNK_SIZE = 256
+
+#
+# A slice of the columns of a LocationStore and its tables, with the days to
+# compute and the SolarBackend of the parent process
+#
+_Chunk = namedtuple('_Chunk', [
+    'latitudes',
+    'longitudes',
+    'method_codes',
+    'timezone_codes',
+    'plans',
+    'timezones',
+    'start',
+    'end',
+    'backend',
+])
+
+
+def build_timetables(locations, parameters, date_range, workers=None,
+                     timezone_offset=0):
+    """Compute the timetables of many locations using a pool of processes.
+
+    The calculations are pure Python, so they are spread over worker
+    processes rather than threads. Locations are sent to the workers in
+    chunks, each worker computes the solar ephemeris of every day once per
+    chunk, and results come back as flat int16 arrays rather than dicts of
+    datetimes so that little has to be pickled.
+
+    :param locations: A sequence of adhan.location.Location objects or
+                      (latitude, longitude) pairs, or an
+                      adhan.store.LocationStore, whose sites each keep their
+                      own method and time zone
+    :param parameters: A parameter dict or CalculationPlan, as accepted by
+                       adhan.adhan, or None for a LocationStore
+    :param date_range: A (start, end) pair of datetime.date, end inclusive
+    :param workers: The number of worker processes, defaulting to the number
+                    of CPUs. With 1 worker everything runs in this process
+    :param timezone_offset: The number of hours to add to each prayer time,
+                            or a time zone as accepted by adhan.adhan, or a
+                            sequence of either, one per location. Not
+                            used with a LocationStore
+    :returns: A list with an array('h') per location, holding for each day
+              the prayers as minutes since local midnight in PrayerTimes
+              order, as iter_times would produce them
+    """
+    return list(iter_timetables(
+        locations, parameters, date_range, workers, timezone_offset
+    ))
+
+
+def iter_timetables(locations, parameters, date_range, workers=None,
+                    timezone_offset=0):
+    """Compute the timetables of many locations, yielding them in order.
+
+    Takes the same arguments as build_timetables, but each location's
+    timetable is yielded as soon as its chunk is done, so a consumer can
+    write results out while the workers carry on, without holding every
+    timetable in memory.
+
+    :returns: A generator of array('h'), one per location, in order
+    :raises ValueError: If the end date is before the start date
+    """
+    start, end = date_range
+    if end < start:
+        raise ValueError('the end date %s is before the start date %s' %
+                         (end, start))
+
+    if isinstance(locations, LocationStore):
+        if parameters is not None:
+            raise ValueError('a LocationStore has its own parameters')
+        store = locations
+    else:
+        store = _single_method_store(locations, parameters, timezone_offset)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    return _run_chunks(_chunks(store, workers, start, end), workers, start,
+                       end)
+
+
+def _chunks(store, workers, start, end):
+    """Slice a LocationStore into the chunks handed to _build_chunk."""
+    chunk_size = max(1, min(
+        MAX_CHUNK_SIZE,
+        -(-len(store) // (workers * CHUNKS_PER_WORKER))
+    ))
+    backend = solar_backend()
+    return [
+        _Chunk(store.latitudes[i:i + chunk_size],
+               store.longitudes[i:i + chunk_size],
+               store.method_codes[i:i + chunk_size],
+               store.timezone_codes[i:i + chunk_size],
+               store.plans, store.timezones, start, end, backend)
+        for i in range(0, len(store), chunk_size)
+    ]
+
+
+def _run_chunks(chunks, workers, start, end):
+    """Build the chunks, in this process or a pool, yielding timetables.
+
+    Kept apart from iter_timetables so that its arguments are checked when
+    it is called rather than when the first timetable is asked for.
+    """
+    if workers == 1:
+        yield from _split_chunks(map(_build_chunk, chunks), start, end)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from _split_chunks(executor.map(_build_chunk, chunks), start,
+                                 end)
+
+
+def _single_method_store(locations, parameters, timezone_offset):
+    """Put locations sharing one method into a LocationStore.
+
+    :param locations: A sequence of Location or (latitude, longitude)
+    :param parameters: A parameter dict or CalculationPlan
+    :param timezone_offset: One timezone argument, or one per location
+    :returns: A LocationStore, ids being the index of each location
+    """
+    plan = compile_method(parameters, strict=False)
+    coordinates = [tuple(location) for location in locations]
+    if isinstance(timezone_offset, Real) or is_zone(timezone_offset):
+        offsets = [timezone_offset] * len(coordinates)
+    else:
+        offsets = list(timezone_offset)
+        if len(offsets) != len(coordinates):
+            raise ValueError('expected one timezone offset per location')
+
+    store = LocationStore()
+    for site_id, ((latitude, longitude), offset) in enumerate(
+            zip(coordinates, offsets)):
+        store.add(site_id, latitude, longitude, plan, offset)
+    return store
+
+
+def _build_chunk(chunk):
+    """Compute the timetables of a chunk of locations in a worker.
+
+    :param chunk: A _Chunk
+    :returns: The bytes of an int16 array holding every location's timetable
+              one after the other
+    """
+    if chunk.backend.name != solar_backend().name:
+        set_solar_backend(chunk.backend)
+    ephemerides = list(iter_ephemerides(chunk.start, chunk.end))
+
+    result = array('h')
+    for latitude, longitude, method_code, timezone_code in zip(
+            chunk.latitudes, chunk.longitudes, chunk.method_codes,
+            chunk.timezone_codes):
+        _extend_timetable(
+            result, Location(latitude, longitude), chunk.plans[method_code],
+            chunk.timezones[timezone_code], ephemerides
+        )
+    return result.tobytes()
+
+
+def _extend_timetable(result, location, plan, timezone_offset, ephemerides):
+    """Append a location's prayers as local minutes for each ephemeris day."""
+    if is_zone(timezone_offset):
+        zone = get_zone(timezone_offset)
+        for day, ephemeris in ephemerides:
+            times = compute_prayer_times(day, location, plan, ephemeris)
+            result.extend(
+                convert_zoned_prayer_times(day, times, zone, 'minutes')[1:]
+            )
+        return
+
+    offset = int(round(60 * timezone_offset))
+    for day, ephemeris in ephemerides:
+        times = compute_prayer_times(day, location, plan, ephemeris)
+        result.extend([
+            floating_point_to_minutes(fp_time) + offset for fp_time in times
+        ])
+
+
+def _split_chunks(results, start, end):
+    """Split the chunk results from the workers into one array per location.
+
+    :param results: An iterable of the bytes returned by _build_chunk
+    :param start: The first datetime.date of the timetables
+    :param end: The last datetime.date of the timetables
+    :returns: A generator of array('h'), one per location
+    """
+    length = ((end - start).days + 1) * len(PrayerTimes._fields)
+
+    for data in results:
+        values = array('h')
+        values.frombytes(data)
+        for i in range(0, len(values), length):
+            yield values[i:i + length]
@@ -0,0 +1,206 @@
+"""
+queries.py - Finding the prayer nearest to a moment in time.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+from datetime import datetime, timedelta
+
+from .adhan import (
+    PrayerTimes,
+    compute_prayer_time,
+    floating_point_to_minutes,
+)
+from .location import as_location
+from .methods import compile_method
+from .zones import get_zone, is_zone, zone_transitions
+
+MINUTES_PER_DAY = 1440
+
+
+class _PrayerSequence:
+    """The prayers of consecutive days as one chronological sequence.
+
+    Positions are (day offset, index into prayers) pairs relative to a base
+    day, and each prayer is only computed when its position is first looked
+    at. Times are whole minutes since local midnight of the base day, rounded
+    the same way as adhan().
+    """
+
+    def __init__(self, base_day, location, plan, timezone_offset, prayers):
+        self.base_day = base_day
+        self.location = location
+        self.plan = plan
+        self.timezone_offset = timezone_offset
+        if is_zone(timezone_offset):
+            self.timezone_offset = get_zone(timezone_offset)
+        self.prayers = prayers
+        self._times = {}
+
+    def minutes(self, position):
+        """Return the time of the prayer at a position, computing it once."""
+        return self._time(position)[0]
+
+    def _time(self, position):
+        """Return the (minutes, fold) of the prayer at a position.
+
+        In a time zone, each prayer gets the UTC offset in effect at its own
+        instant, and fold is set as for datetime.fold when the local time
+        repeats after the clocks go back; it is 0 for a fixed offset.
+        """
+        try:
+            return self._times[position]
+        except KeyError:
+            pass
+
+        day_offset, index = position
+        day = self.base_day + timedelta(days=day_offset)
+        minutes = floating_point_to_minutes(compute_prayer_time(
+            self.prayers[index], day, self.location, self.plan
+        ))
+
+        fold = 0
+        if is_zone(self.timezone_offset):
+            offset, fold = zone_transitions(
+                self.timezone_offset, day.year
+            ).day_offsets(day, [minutes])[0]
+            minutes += int(round(offset / 60))
+        else:
+            minutes += int(round(60 * self.timezone_offset))
+
+        result = self._times[position] = (
+            day_offset * MINUTES_PER_DAY + minutes, fold
+        )
+        return result
+
+    def first_after(self, when_minutes):
+        """Bisect the base day for the first prayer after when_minutes.
+
+        :returns: The position of that prayer, or of the next day's first
+                  prayer if none of the base day's prayers are after it
+        """
+        low, high = 0, len(self.prayers)
+        while low < high:
+            middle = (low + high) // 2
+            if self.minutes((0, middle)) > when_minutes:
+                high = middle
+            else:
+                low = middle + 1
+
+        if low == len(self.prayers):
+            return 1, 0
+        return 0, low
+
+    def next_position(self, position):
+        """Return the position of the prayer after position."""
+        day_offset, index = position
+        if index + 1 < len(self.prayers):
+            return day_offset, index + 1
+        return day_offset + 1, 0
+
+    def previous_position(self, position):
+        """Return the position of the prayer before position."""
+        day_offset, index = position
+        if index > 0:
+            return day_offset, index - 1
+        return day_offset - 1, len(self.prayers) - 1
+
+    def result(self, position):
+        """Return the (name, datetime) of the prayer at a position."""
+        base = self.base_day
+        minutes, fold = self._time(position)
+        result = datetime(base.year, base.month, base.day) + \
+            timedelta(minutes=minutes)
+        if is_zone(self.timezone_offset):
+            result = result.replace(tzinfo=self.timezone_offset, fold=fold)
+        return self.prayers[position[1]], result
+
+
+def _sequence(location, parameters, when, timezone_offset, prayers):
+    """Build the prayer sequence around when, and when in its minutes."""
+    unknown = set(prayers) - set(PrayerTimes._fields)
+    if unknown or not prayers:
+        raise ValueError('prayers must be a non-empty subset of %s' % (
+            ', '.join(PrayerTimes._fields),
+        ))
+
+    prayers = [name for name in PrayerTimes._fields if name in prayers]
+    base_day = when.date()
+    midnight = datetime(base_day.year, base_day.month, base_day.day)
+    when_minutes = (when.replace(tzinfo=None) - midnight).total_seconds() / 60
+
+    sequence = _PrayerSequence(
+        base_day, as_location(location),
+        compile_method(parameters, strict=False), timezone_offset, prayers
+    )
+    return sequence, when_minutes
+
+
+def next_prayer(location, parameters, when, timezone_offset=0,
+                prayers=PrayerTimes._fields):
+    """Find the first prayer strictly after a moment in time.
+
+    The prayers of when's day are bisected, so only the two or three around
+    when are computed, one at a time, using the cached solar terms of their
+    day. The previous or next day's prayers are only looked at when they are
+    the nearest ones, e.g. after Isha or before Fajr.
+
+    :param location: An adhan.location.Location, or a 2-tuple of latitude and
+                     longitude in degrees
+    :param parameters: A parameter dict or CalculationPlan, as accepted by
+                       adhan.adhan
+    :param when: A datetime, in the same local time as timezone_offset
+    :param timezone_offset: The number of hours to add to each prayer time,
+                            or a time zone, as accepted by adhan.adhan
+    :param prayers: The names of the prayers to consider, all of them (as
+                    returned by adhan.adhan) by default
+    :returns: A (name, datetime) pair, the datetime as adhan.adhan gives it
+    """
+    sequence, when_minutes = _sequence(
+        location, parameters, when, timezone_offset, prayers
+    )
+
+    position = sequence.first_after(when_minutes)
+    previous = sequence.previous_position(position)
+    while sequence.minutes(previous) > when_minutes:
+        position, previous = previous, sequence.previous_position(previous)
+    while sequence.minutes(position) <= when_minutes:
+        position = sequence.next_position(position)
+
+    return sequence.result(position)
+
+
+def previous_prayer(location, parameters, when, timezone_offset=0,
+                    prayers=PrayerTimes._fields):
+    """Find the last prayer at or before a moment in time.
+
+    The counterpart of next_prayer, with the same parameters.
+
+    :returns: A (name, datetime) pair, the datetime as adhan.adhan gives it
+    """
+    sequence, when_minutes = _sequence(
+        location, parameters, when, timezone_offset, prayers
+    )
+
+    position = sequence.previous_position(sequence.first_after(when_minutes))
+    following = sequence.next_position(position)
+    while sequence.minutes(following) <= when_minutes:
+        position, following = following, sequence.next_position(following)
+    while sequence.minutes(position) > when_minutes:
+        position = sequence.previous_position(position)
+
+    return sequence.result(position)
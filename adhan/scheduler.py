@@ -0,0 +1,304 @@
+"""
+scheduler.py - An asyncio scheduler firing events at prayer times.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import asyncio
+import heapq
+import inspect
+import time
+
+from collections import namedtuple
+from datetime import date, timedelta
+from itertools import count
+
+from .adhan import (
+    PrayerCalculator,
+    PrayerTimes,
+    compute_prayer_times,
+    convert_prayer_minutes,
+    floating_point_to_minutes,
+)
+from .location import as_location
+from .methods import compile_method
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+SECONDS_PER_DAY = 86400
+
+#
+# A prayer firing: its name, the day whose timetable it belongs to, its local
+# time as adhan() gives it, its UTC timestamp and the subscribers to notify
+#
+PrayerEvent = namedtuple('PrayerEvent', [
+    'name',
+    'day',
+    'time',
+    'timestamp',
+    'subscribers',
+])
+
+
+class _Group:
+    """The subscribers sharing a location, method and timezone.
+
+    A group walks through its prayers one at a time, computing each day once
+    when it first needs it, and has at most one entry in the scheduler's heap.
+    """
+
+    __slots__ = (
+        'key', 'calculator', 'subscribers', 'day', 'minutes', 'index',
+        'entry',
+    )
+
+    def __init__(self, key, calculator):
+        self.key = key
+        self.calculator = calculator
+        self.subscribers = set()
+        self.day = self.minutes = self.index = self.entry = None
+
+    def start(self, now, prayers):
+        """Position the group on its first prayer after now."""
+        #
+        # Start two days back since, far from the time zone's meridian, a
+        # day's prayers can fall on the UTC days either side of it
+        #
+        self._load(date.fromordinal(
+            EPOCH_ORDINAL + int(now // SECONDS_PER_DAY) - 2
+        ))
+        self.index = 0
+        while self.timestamp(prayers) <= now:
+            self.advance(prayers)
+
+    def _load(self, day):
+        """Compute the prayer times of a day, in UTC minutes."""
+        calculator = self.calculator
+        self.day = day
+        self.minutes = PrayerTimes(*[
+            floating_point_to_minutes(fp_time) for fp_time in
+            compute_prayer_times(day, calculator.location, calculator.plan)
+        ])
+
+    def timestamp(self, prayers):
+        """Return the UTC timestamp of the group's current prayer."""
+        return (
+            (self.day.toordinal() - EPOCH_ORDINAL) * SECONDS_PER_DAY +
+            getattr(self.minutes, prayers[self.index]) * 60
+        )
+
+    def local_time(self, prayers):
+        """Return the group's current prayer as adhan() gives it.
+
+        Time zones are resolved here, for the prayer that fired, so a
+        daylight saving switch between two prayers is handled.
+        """
+        return convert_prayer_minutes(
+            self.day, self.minutes, self.calculator.timezone_offset
+        )[prayers[self.index]]
+
+    def advance(self, prayers):
+        """Move on to the next prayer, computing the next day if needed."""
+        self.index += 1
+        if self.index == len(prayers):
+            self._load(self.day + timedelta(days=1))
+            self.index = 0
+
+
+class PrayerScheduler:
+    """Fires an event at every prayer time of many subscriptions.
+
+    Subscribers with the same location, method and timezone share a group,
+    so each distinct combination is computed once however many subscribers
+    it has. The groups' upcoming prayers are kept in a heap, so adding or
+    removing a subscription costs O(log n) in the number of groups, and
+    each group computes a day's times only once, when it reaches that day.
+
+    Events are delivered either by iterating over events() or by passing a
+    callback and awaiting run().
+    """
+
+    def __init__(self, callback=None, prayers=PrayerTimes._fields,
+                 clock=time.time):
+        """Create a scheduler with no subscriptions.
+
+        :param callback: Optional function called with each PrayerEvent by
+                         run(). If it returns an awaitable it is awaited
+        :param prayers: The names of the prayers to fire events for
+        :param clock: A function returning the current UTC timestamp
+        """
+        self.callback = callback
+        self.prayers = [
+            name for name in PrayerTimes._fields if name in prayers
+        ]
+        self.clock = clock
+        self._groups = {}
+        self._subscriptions = {}
+        self._heap = []
+        self._sequence = count()
+        self._changed = None
+
+    def __len__(self):
+        """Return the number of subscribers."""
+        return len(self._subscriptions)
+
+    @property
+    def group_count(self):
+        """The number of distinct location, method and timezone groups."""
+        return len(self._groups)
+
+    def subscribe(self, subscriber, location, parameters, timezone_offset=0):
+        """Subscribe to the prayer times of a location.
+
+        Subscribing an existing subscriber again replaces its subscription.
+
+        :param subscriber: Any hashable identifying the subscriber, passed
+                           back in each PrayerEvent
+        :param location: An adhan.location.Location, or a 2-tuple of latitude
+                         and longitude in degrees
+        :param parameters: A parameter dict or CalculationPlan, as accepted by
+                           adhan.adhan
+        :param timezone_offset: The number of hours to add to each prayer
+                                time, or a time zone, as accepted by
+                                adhan.adhan
+        """
+        location = as_location(location)
+        plan = compile_method(parameters, strict=False)
+        key = (location, plan, timezone_offset)
+
+        if self._subscriptions.get(subscriber) == key:
+            return
+        self.unsubscribe(subscriber)
+
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = _Group(
+                key, PrayerCalculator(location, plan, timezone_offset)
+            )
+            group.start(self.clock(), self.prayers)
+            self._push(group)
+
+        group.subscribers.add(subscriber)
+        self._subscriptions[subscriber] = key
+
+    def unsubscribe(self, subscriber):
+        """Remove a subscriber, if it is subscribed.
+
+        When the last subscriber of a group leaves, the group's entry in the
+        heap is left to be discarded when it reaches the top, unless stale
+        entries come to outnumber live ones, when the heap is rebuilt.
+        """
+        key = self._subscriptions.pop(subscriber, None)
+        if key is None:
+            return
+
+        group = self._groups[key]
+        group.subscribers.discard(subscriber)
+        if not group.subscribers:
+            del self._groups[key]
+            group.entry = None
+
+            #
+            # Every live group has exactly one entry in the heap
+            #
+            if len(self._heap) > 2 * len(self._groups):
+                self._heap = [
+                    live.entry for live in self._groups.values()
+                ]
+                heapq.heapify(self._heap)
+
+    def _push(self, group):
+        """Add a group's current prayer to the heap."""
+        group.entry = (
+            group.timestamp(self.prayers), next(self._sequence), group
+        )
+        heapq.heappush(self._heap, group.entry)
+        if self._changed is not None:
+            self._changed.set()
+
+    def _peek(self):
+        """Return the earliest live heap entry, dropping stale ones."""
+        heap = self._heap
+        while heap and heap[0][2].entry is not heap[0]:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def pop_due(self, now=None):
+        """Return the earliest event if it is due, advancing its group.
+
+        :param now: The current UTC timestamp, defaulting to the clock
+        :returns: A PrayerEvent, or None if no event is due yet
+        """
+        entry = self._peek()
+        if entry is None:
+            return None
+
+        timestamp, _, group = entry
+        if timestamp > (self.clock() if now is None else now):
+            return None
+
+        heapq.heappop(self._heap)
+        event = PrayerEvent(
+            name=self.prayers[group.index],
+            day=group.day,
+            time=group.local_time(self.prayers),
+            timestamp=timestamp,
+            subscribers=frozenset(group.subscribers),
+        )
+        group.advance(self.prayers)
+        self._push(group)
+        return event
+
+    async def next_event(self):
+        """Wait until the next prayer time and return its PrayerEvent."""
+        if self._changed is None:
+            self._changed = asyncio.Event()
+
+        while True:
+            event = self.pop_due()
+            if event is not None:
+                return event
+
+            self._changed.clear()
+            entry = self._peek()
+            if entry is None:
+                await self._changed.wait()
+                continue
+
+            try:
+                await asyncio.wait_for(
+                    self._changed.wait(), entry[0] - self.clock()
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def events(self):
+        """Asynchronously iterate over PrayerEvents as they become due."""
+        while True:
+            yield await self.next_event()
+
+    async def run(self):
+        """Call the callback with every PrayerEvent as it becomes due.
+
+        :raises ValueError: If the scheduler was created without a callback
+        """
+        if self.callback is None:
+            raise ValueError('run() needs a scheduler with a callback')
+
+        async for event in self.events():
+            result = self.callback(event)
+            if inspect.isawaitable(result):
+                await result
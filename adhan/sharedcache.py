@@ -0,0 +1,314 @@
+"""
+sharedcache.py - A prayer time cache shared by the processes of a server.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import hashlib
+import multiprocessing
+import os
+import struct
+import zlib
+
+from multiprocessing import resource_tracker, shared_memory
+
+from .adhan import compute_prayer_times, floating_point_to_minutes
+from .calculations import solar_backend
+from .location import Location, as_location
+
+MAGIC = b'ADSC'
+VERSION = 1
+
+#
+# The segment starts with a header, followed by capacity slots. Each slot is
+# a sequence number, odd while the slot is being written, the clock's
+# reference bit, then the key (the day's ordinal, the coordinates and a
+# digest of the method and solar backend), the six prayers as minutes since
+# UTC midnight and a CRC32 of the key and minutes.
+#
+HEADER = struct.Struct('<4sHHII48x')
+SLOT = struct.Struct('<IB3xiddQ6hI4x')
+KEY = struct.Struct('<iddQ')
+MINUTES = struct.Struct('<6h')
+SEQUENCE = struct.Struct('<I')
+REFERENCE = struct.Struct('<B')
+HAND = struct.Struct('<I')
+
+REFERENCE_OFFSET = 4
+KEY_OFFSET = 8
+CHECKSUM_OFFSET = KEY_OFFSET + KEY.size + MINUTES.size
+HAND_OFFSET = 12
+
+#
+# Sequence numbers wrap below 2 ** 31 so the even number after an odd one
+# still fits, and an even number is never 0, which marks an empty slot
+#
+MAX_SEQUENCE = (1 << 31) - 1
+
+#
+# A key lives in one of the PROBE_LIMIT slots from its home slot; once they
+# are all taken the clock picks which one to replace
+#
+PROBE_LIMIT = 8
+
+DEFAULT_CAPACITY = 1 << 16
+
+#
+# The names of the segments created by this process or the one it was
+# forked from, whose resource tracker it shares
+#
+_CREATED = set()
+
+
+class SharedResultCache:
+    """A fixed size cache of prayer times in shared memory.
+
+    Every process that has the cache, whether it inherited it through fork
+    or attached to it by name, sees the days any of them computed, so the
+    workers of a pre-forked server share one warm cache instead of each
+    computing and holding their own. set_result_cache plugs it into adhan().
+
+    The table is open-addressed, six int16 minutes per entry, and entries
+    are replaced with the clock algorithm. Neither reads nor writes take a
+    lock: a reader only trusts a slot whose sequence number was even and
+    unchanged around the read and whose checksum matches, so a slot being
+    written, or torn by two processes writing it at once, is a miss that
+    gets computed and written again.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, name=None, create=True):
+        """Create a cache, or attach to one created by another process.
+
+        :param capacity: The number of entries, rounded up to a power of
+                         two. Ignored when attaching
+        :param name: The name of the shared memory segment. A new cache gets
+                     a random one by default
+        :param create: Whether to create the segment rather than attach to
+                       an existing one
+        :raises ValueError: If the segment attached to is not a cache
+        """
+        self.hits = 0
+        self.misses = 0
+        self._methods = {}
+
+        if create:
+            capacity = 1 << max(capacity - 1, PROBE_LIMIT - 1).bit_length()
+            self._memory = shared_memory.SharedMemory(
+                name=name, create=True,
+                size=HEADER.size + capacity * SLOT.size
+            )
+            HEADER.pack_into(self._memory.buf, 0, MAGIC, VERSION, SLOT.size,
+                             capacity, 0)
+            _CREATED.add(self._memory.name)
+        else:
+            self._memory = _attach(name)
+            magic, version, slot_size, capacity, _ = HEADER.unpack_from(
+                self._memory.buf, 0
+            )
+            if (magic, version, slot_size) != (MAGIC, VERSION, SLOT.size):
+                self._memory.close()
+                raise ValueError('%r is not a prayer time cache' % (name,))
+
+        self.capacity = capacity
+        self._mask = capacity - 1
+        self._buffer = self._memory.buf
+
+    @property
+    def name(self):
+        """The name other processes attach to the cache with."""
+        return self._memory.name
+
+    def get(self, day, location, plan):
+        """Return the prayer times of a day, computing them on a miss.
+
+        :param day: The datetime.date to calculate for
+        :param location: A Location or (latitude, longitude) pair
+        :param plan: A CalculationPlan from adhan.methods.compile_method
+        :returns: The six prayers, in PrayerTimes order, as whole minutes
+                  since UTC midnight, rounded as adhan() rounds
+        :raises ValueError: If a prayer is undefined, as for adhan()
+        """
+        if isinstance(location, Location):
+            latitude, longitude = location.latitude, location.longitude
+        else:
+            latitude, longitude = location
+
+        key = (day.toordinal(), float(latitude), float(longitude),
+               self._method_digest(plan))
+        home = zlib.crc32(KEY.pack(*key)) & self._mask
+
+        minutes = self._lookup(home, key)
+        if minutes is not None:
+            self.hits += 1
+            return minutes
+
+        self.misses += 1
+        times = compute_prayer_times(day, as_location(location), plan)
+        minutes = tuple(floating_point_to_minutes(fp_time)
+                        for fp_time in times)
+        self._store(home, key, minutes)
+        return minutes
+
+    def _method_digest(self, plan):
+        """Return a digest of a plan and the solar backend.
+
+        Python's own hashes vary between processes, so methods are keyed by
+        a digest that every process computes the same way.
+        """
+        backend = solar_backend().name
+        digest = self._methods.get((backend, plan))
+        if digest is None:
+            digest = self._methods[(backend, plan)] = int.from_bytes(
+                hashlib.blake2b(repr((backend, tuple(plan))).encode(),
+                                digest_size=8).digest(),
+                'little'
+            )
+        return digest
+
+    def _lookup(self, home, key):
+        """Find the minutes of a key in its slots, None if absent."""
+        buffer = self._buffer
+        for probe in range(PROBE_LIMIT):
+            offset = HEADER.size + ((home + probe) & self._mask) * SLOT.size
+            values = SLOT.unpack_from(buffer, offset)
+            sequence = values[0]
+            if sequence == 0:
+                return None
+            if sequence & 1 or values[2:6] != key:
+                continue
+
+            #
+            # A torn slot is skipped rather than ending the search, so the
+            # copy written again after it is found; the clock evicts it
+            #
+            checksum = zlib.crc32(
+                buffer[offset + KEY_OFFSET:offset + CHECKSUM_OFFSET]
+            )
+            if (checksum != values[12] or
+                    SEQUENCE.unpack_from(buffer, offset)[0] != sequence):
+                continue
+
+            if not values[1]:
+                REFERENCE.pack_into(buffer, offset + REFERENCE_OFFSET, 1)
+            return values[6:12]
+        return None
+
+    def _store(self, home, key, minutes):
+        """Write a key's minutes into a free or evicted slot."""
+        buffer = self._buffer
+        offset = self._victim(home)
+
+        sequence = SEQUENCE.unpack_from(buffer, offset)[0]
+        sequence = ((sequence + 1) & MAX_SEQUENCE) | 1
+        SEQUENCE.pack_into(buffer, offset, sequence)
+
+        #
+        # The checksum covers the same bytes _lookup reads back, packed here
+        # rather than read out of the shared buffer
+        #
+        checksum = zlib.crc32(KEY.pack(*key) + MINUTES.pack(*minutes))
+        SLOT.pack_into(buffer, offset, sequence, 1,
+                       *(key + minutes + (checksum,)))
+        SEQUENCE.pack_into(buffer, offset, sequence + 1)
+
+    def _victim(self, home):
+        """Pick the slot to write a new key into.
+
+        The first empty slot from home is used if there is one. Otherwise
+        the clock hand sweeps the key's slots, clearing reference bits, and
+        stops at the first slot not referenced since the hand last passed.
+        """
+        buffer = self._buffer
+        offsets = [
+            HEADER.size + ((home + probe) & self._mask) * SLOT.size
+            for probe in range(PROBE_LIMIT)
+        ]
+        for offset in offsets:
+            if SEQUENCE.unpack_from(buffer, offset)[0] == 0:
+                return offset
+
+        hand = HAND.unpack_from(buffer, HAND_OFFSET)[0]
+        for step in range(2 * PROBE_LIMIT):
+            offset = offsets[(hand + step) % PROBE_LIMIT]
+            if not REFERENCE.unpack_from(buffer, offset + REFERENCE_OFFSET)[0]:
+                break
+            REFERENCE.pack_into(buffer, offset + REFERENCE_OFFSET, 0)
+
+        HAND.pack_into(buffer, HAND_OFFSET, (hand + step + 1) & 0xffffffff)
+        return offset
+
+    def clear(self):
+        """Drop every entry, in every process, and reset the counters.
+
+        Only safe while no other process is using the cache.
+        """
+        self._buffer[HEADER.size:] = bytes(self.capacity * SLOT.size)
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        """Return this process's cache statistics as a dict."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'capacity': self.capacity,
+        }
+
+    def close(self):
+        """Detach this process from the cache."""
+        self._buffer = None
+        self._memory.close()
+
+    def unlink(self):
+        """Destroy the shared memory segment, once every process is done."""
+        self._memory.unlink()
+        _CREATED.discard(self._memory.name)
+
+    def __enter__(self):
+        """Use the cache as a context manager that closes it."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close the cache."""
+        self.close()
+
+
+def _attach(name):
+    """Attach to an existing segment without taking ownership of it.
+
+    Before Python 3.13 attaching registers the segment with the process's
+    resource tracker, which unlinks it when the tracker exits. The creator
+    and the processes forked from it, or started by multiprocessing, share
+    the creator's tracker, so they leave its registration alone; any other
+    process has a tracker of its own and unregisters the segment again.
+    The creator is responsible for unlinking the segment.
+    """
+    try:
+        # pylint: disable-next=unexpected-keyword-arg
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+
+    memory = shared_memory.SharedMemory(name=name)
+    shared = (memory.name in _CREATED or
+              multiprocessing.parent_process() is not None)
+    if not shared and os.name == 'posix':
+        #
+        # POSIX segments are tracked by their name with a leading slash
+        #
+        resource_tracker.unregister('/' + memory.name, 'shared_memory')
+    return memory
@@ -0,0 +1,444 @@
+"""
+store.py - Columnar storage for large numbers of locations.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import csv
+import io
+import sys
+
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+from .location import Location
+from .methods import (
+    ASR_METHODS,
+    HIGH_LATITUDE_RULES,
+    METHODS,
+    compile_method,
+)
+from .zones import get_zone, is_zone
+
+#
+# Methods and time zones are stored as indices into tables of the distinct
+# values, which fit in two bytes each
+#
+CODE_TYPE = 'H'
+MAX_CODES = 1 << 16
+
+METHOD_SEPARATOR = ':'
+
+DEFAULT_METHOD = 'isna'
+
+StoredSite = namedtuple('StoredSite', [
+    'id',
+    'latitude',
+    'longitude',
+    'parameters',
+    'timezone_offset',
+])
+
+
+class SiteColumns:
+    """The columns of a LocationStore, one array per field of a site."""
+
+    __slots__ = ('ids', 'latitudes', 'longitudes', 'method_codes',
+                 'timezone_codes')
+
+    def __init__(self):
+        """Create empty columns."""
+        self.ids = array('q')
+        self.latitudes = array('d')
+        self.longitudes = array('d')
+        self.method_codes = array(CODE_TYPE)
+        self.timezone_codes = array(CODE_TYPE)
+
+    def __len__(self):
+        """Return the number of sites."""
+        return len(self.ids)
+
+    def arrays(self):
+        """Return the columns, in the order of __slots__."""
+        return (self.ids, self.latitudes, self.longitudes, self.method_codes,
+                self.timezone_codes)
+
+    def append(self, site):
+        """Append a site given as a tuple of a value for each column."""
+        for column, value in zip(self.arrays(), site):
+            column.append(value)
+
+    def extend(self, other):
+        """Append the sites of other SiteColumns."""
+        for column, values in zip(self.arrays(), other.arrays()):
+            column.extend(values)
+
+
+class LocationStore:
+    """Many sites, each with an id, coordinates, a method and a time zone.
+
+    Sites are held in parallel columns rather than as an object each: ids
+    in an array('q'), coordinates in arrays of doubles (which NumPy can
+    wrap without copying with numpy.frombuffer) and the method and time zone
+    of each as an index into the plans and timezones tables of the distinct
+    values, so a site takes 28 bytes however many share a method.
+
+    Methods are given by name, an entry of adhan.methods.METHODS optionally
+    followed by ':' and modifiers, each an entry of adhan.methods.ASR_METHODS
+    or a high latitude rule ('karachi:hanafi', 'isna:angle_based'), or as
+    a parameter dict or CalculationPlan. Each distinct method is compiled
+    once.
+    """
+
+    def __init__(self, methods=None):
+        """Create an empty store.
+
+        :param methods: Optional mapping of extra method names to parameter
+                        dicts or CalculationPlans, looked up before the names
+                        of adhan.methods
+        """
+        self.columns = SiteColumns()
+
+        self.plans = []
+        self.timezones = []
+
+        self._named_methods = dict(methods or ())
+        self._method_index = {}
+        self._timezone_index = {}
+
+        #
+        # The sorted ids and the row of each, built by the first lookup
+        #
+        self._id_index = None
+
+    def __len__(self):
+        """Return the number of sites."""
+        return len(self.columns)
+
+    @property
+    def ids(self):
+        """The ids of the sites, an array('q')."""
+        return self.columns.ids
+
+    @property
+    def latitudes(self):
+        """The latitudes of the sites, an array('d')."""
+        return self.columns.latitudes
+
+    @property
+    def longitudes(self):
+        """The longitudes of the sites, an array('d')."""
+        return self.columns.longitudes
+
+    @property
+    def method_codes(self):
+        """The index of the method of each site in plans."""
+        return self.columns.method_codes
+
+    @property
+    def timezone_codes(self):
+        """The index of the time zone of each site in timezones."""
+        return self.columns.timezone_codes
+
+    @classmethod
+    def from_csv(cls, path, method=DEFAULT_METHOD, timezone_offset=0,
+                 methods=None):
+        """Create a store from a CSV file, as for load_csv.
+
+        :returns: A LocationStore
+        """
+        store = cls(methods)
+        store.load_csv(path, method, timezone_offset)
+        return store
+
+    def add(self, site_id, latitude, longitude, method=DEFAULT_METHOD,
+            timezone_offset=0):
+        """Add a site.
+
+        :param site_id: The integer id of the site
+        :param latitude: Latitude of the site in degrees
+        :param longitude: Longitude of the site in degrees
+        :param method: A method name, parameter dict or CalculationPlan
+        :param timezone_offset: The number of hours to add to prayer times,
+                                or a time zone as accepted by adhan.adhan
+        :returns: The row of the site
+        :raises ValueError: If the method or time zone is unknown
+        """
+        self.columns.append((
+            site_id, latitude, longitude, self.method_code(method),
+            self.timezone_code(timezone_offset),
+        ))
+        self._id_index = None
+        return len(self.columns) - 1
+
+    def load_csv(self, path, method=DEFAULT_METHOD, timezone_offset=0):
+        """Add the sites of a CSV file.
+
+        The file needs a header with id, latitude and longitude columns, and
+        may also have a method column and a timezone_offset column, which
+        holds hours or a time zone name. Blank methods and time zones take
+        the defaults given here.
+
+        :param path: The path of the CSV file, '-' for standard input, or
+                     an open text file
+        :param method: The method of sites without their own
+        :param timezone_offset: The time zone of sites without their own
+        :returns: The number of sites added
+        :raises ValueError: If a column is missing or a value is invalid
+        """
+        if path == '-':
+            return self._load_csv(sys.stdin, method, timezone_offset)
+        if hasattr(path, 'read'):
+            return self._load_csv(path, method, timezone_offset)
+
+        with io.open(path, newline='', encoding='utf-8') as sites:
+            return self._load_csv(sites, method, timezone_offset)
+
+    def _load_csv(self, sites, default_method, default_timezone):
+        """Add the sites of an open CSV file, as for load_csv."""
+        reader = csv.reader(sites)
+        site_columns, method_column, timezone_column = _csv_columns(
+            next(reader, ())
+        )
+
+        #
+        # Most rows repeat a few method and time zone strings, so their codes
+        # are looked up by the raw text before anything is parsed
+        #
+        method_codes = {'': self.method_code(default_method)}
+        timezone_codes = {'': self.timezone_code(default_timezone)}
+
+        columns = SiteColumns()
+        for line, row in enumerate(reader, 2):
+            method = _column_text(row, method_column, line)
+            if method not in method_codes:
+                method_codes[method] = _on_line(line, self.method_code, method)
+
+            timezone = _column_text(row, timezone_column, line)
+            if timezone not in timezone_codes:
+                timezone_codes[timezone] = _on_line(
+                    line, self.timezone_code, _parse_timezone(timezone)
+                )
+
+            columns.append(_parse_site(row, site_columns, line) +
+                           (method_codes[method], timezone_codes[timezone]))
+
+        self.columns.extend(columns)
+        self._id_index = None
+        return len(columns)
+
+    def method_code(self, method):
+        """Return the index of a method in plans, adding it if it is new.
+
+        :param method: A method name, parameter dict or CalculationPlan
+        :returns: An index into plans
+        :raises ValueError: If the method is unknown or invalid
+        """
+        key = method
+        if not isinstance(method, str):
+            key = compile_method(method, strict=False)
+        code = self._method_index.get(key)
+        if code is not None:
+            return code
+
+        plan = key
+        if isinstance(method, str):
+            plan = compile_method(self._named_parameters(method))
+
+        #
+        # Names of the same method share its code
+        #
+        if plan in self._method_index:
+            code = self._method_index[plan]
+        else:
+            code = self._method_index[plan] = _new_code(self.plans, plan)
+        self._method_index[key] = code
+        return code
+
+    def _named_parameters(self, name):
+        """Resolve a method name to its parameters."""
+        if name in self._named_methods:
+            return self._named_methods[name]
+
+        base = name.split(METHOD_SEPARATOR)[0]
+        modifiers = name.split(METHOD_SEPARATOR)[1:]
+        if base not in METHODS:
+            raise ValueError('unknown method %r' % name)
+
+        parameters = dict(METHODS[base])
+        for modifier in modifiers:
+            if modifier in ASR_METHODS:
+                parameters.update(ASR_METHODS[modifier])
+            elif modifier in HIGH_LATITUDE_RULES:
+                parameters['high_latitude_rule'] = modifier
+            else:
+                raise ValueError('unknown method %r' % name)
+        return parameters
+
+    def timezone_code(self, timezone_offset):
+        """Return the index of a time zone in timezones, adding it if new.
+
+        :param timezone_offset: A number of hours or a time zone
+        :returns: An index into timezones
+        :raises ValueError: If a time zone name is unknown
+        """
+        code = self._timezone_index.get(timezone_offset)
+        if code is not None:
+            return code
+
+        if isinstance(timezone_offset, str):
+            try:
+                get_zone(timezone_offset)
+            except KeyError as error:
+                raise ValueError(
+                    'unknown time zone %r' % timezone_offset
+                ) from error
+
+        code = _new_code(self.timezones, timezone_offset)
+        self._timezone_index[timezone_offset] = code
+        return code
+
+    def row(self, site_id):
+        """Find the row of a site by its id.
+
+        The first lookup after sites are added sorts the ids once.
+
+        :param site_id: The id of the site
+        :returns: The index of the site in the columns
+        :raises KeyError: If no site has the id
+        :raises ValueError: If several sites have the same id
+        """
+        if self._id_index is None:
+            self._id_index = self._index_ids()
+
+        sorted_ids, order = self._id_index
+        i = bisect_left(sorted_ids, site_id)
+        if i == len(sorted_ids) or sorted_ids[i] != site_id:
+            raise KeyError(site_id)
+        return order[i]
+
+    def _index_ids(self):
+        """Sort the ids, returning them and the row of each."""
+        ids = self.ids
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        sorted_ids = array('q', [ids[i] for i in order])
+        for previous, site_id in zip(sorted_ids, sorted_ids[1:]):
+            if previous == site_id:
+                raise ValueError('duplicate location id %d' % site_id)
+
+        return sorted_ids, array('q', order)
+
+    def lookup(self, site_id):
+        """Find a site by its id.
+
+        :param site_id: The id of the site
+        :returns: A StoredSite, whose parameters and timezone_offset can be
+                  passed to adhan.adhan or adhan.timetable.iter_times
+        :raises KeyError: If no site has the id
+        """
+        return self.site(self.row(site_id))
+
+    def site(self, row):
+        """Return the site at a row as a StoredSite."""
+        return StoredSite(
+            self.ids[row],
+            self.latitudes[row],
+            self.longitudes[row],
+            self.plans[self.method_codes[row]],
+            self.timezones[self.timezone_codes[row]],
+        )
+
+    def location(self, row):
+        """Return the Location of the site at a row."""
+        return Location(self.latitudes[row], self.longitudes[row])
+
+    def has_zones(self):
+        """Check whether any site uses a time zone, not a fixed offset."""
+        return any(is_zone(timezone) for timezone in self.timezones)
+
+
+def _csv_columns(header):
+    """Find the columns of a locations file from its header row.
+
+    :returns: A tuple of the indices of the id, latitude and longitude
+              columns, then the indices of the method and timezone_offset
+              columns, each None if absent
+    :raises ValueError: If a required column is missing
+    """
+    header = [name.strip() for name in header]
+    missing = set(['id', 'latitude', 'longitude']) - set(header)
+    if missing:
+        raise ValueError('locations file is missing columns: %s' %
+                         ', '.join(sorted(missing)))
+
+    optional = [header.index(name) if name in header else None
+                for name in ('method', 'timezone_offset')]
+    site_columns = tuple(header.index(name)
+                         for name in ('id', 'latitude', 'longitude'))
+    return (site_columns,) + tuple(optional)
+
+
+def _parse_site(row, site_columns, line):
+    """Parse the id and coordinates of a row.
+
+    :raises ValueError: If one is missing or invalid
+    """
+    id_column, latitude_column, longitude_column = site_columns
+    try:
+        return (int(row[id_column]), float(row[latitude_column]),
+                float(row[longitude_column]))
+    except (IndexError, ValueError) as error:
+        raise ValueError('line %d: invalid id or coordinates' % line) \
+            from error
+
+
+def _column_text(row, column, line):
+    """Return the stripped text of an optional column, '' if absent.
+
+    :raises ValueError: If the row is too short to have the column
+    """
+    if column is None:
+        return ''
+    try:
+        return row[column].strip()
+    except IndexError as error:
+        raise ValueError('line %d: too few columns' % line) from error
+
+
+def _parse_timezone(text):
+    """Parse a timezone_offset value: a number of hours or a zone name."""
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def _on_line(line, func, value):
+    """Call func(value), prefixing any ValueError with the line number."""
+    try:
+        return func(value)
+    except ValueError as error:
+        raise ValueError('line %d: %s' % (line, error)) from error
+
+
+def _new_code(table, value):
+    """Append a value to a code table, returning its code."""
+    if len(table) >= MAX_CODES:
+        raise ValueError('more than %d distinct values' % MAX_CODES)
+    table.append(value)
+    return len(table) - 1
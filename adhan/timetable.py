@@ -0,0 +1,388 @@
+"""
+timetable.py - Streaming timetables and a compact binary timetable format.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import math
+import mmap
+import struct
+import sys
+
+from array import array
+from datetime import date, timedelta
+
+from .adhan import (
+    PrayerTimes,
+    TimetableRow,
+    compute_prayer_times,
+    convert_zoned_prayer_times,
+    floating_point_to_minutes,
+)
+from .calculations import (
+    compute_ephemeris,
+    compute_ephemeris_at,
+    day_of_year,
+    solar_backend,
+)
+from .location import as_location
+from .methods import HIGH_LATITUDE_RULES, compile_method
+from .zones import get_zone, is_zone
+
+#
+# A timetable file is a fixed size header followed by one record per day,
+# each record holding the six prayers as little-endian int16 minutes since
+# local midnight, in PrayerTimes order. The header holds:
+#
+#   magic, format version, prayers per record,
+#   latitude, longitude, timezone offset (hours),
+#   ordinal of the first day, number of days,
+#   fajr angle, isha angle, isha delay, asr multiplier,
+#   high latitude rule
+#
+# Isha angle and delay are NaN when the method doesn't use them. The high
+# latitude rule is stored as its position in HIGH_LATITUDE_RULES plus one,
+# or zero for none.
+#
+TIMETABLE_MAGIC = b'ADHN'
+TIMETABLE_VERSION = 2
+TIMETABLE_HEADER = struct.Struct('<4sHHdddiiddddB')
+TIMETABLE_RECORD = struct.Struct('<%dh' % len(PrayerTimes._fields))
+
+_WRITE_BUFFER_DAYS = 1024
+
+
+def high_latitude_rule_code(rule):
+    """Encode a high latitude rule, or None, for a file header."""
+    if rule is None:
+        return 0
+    return HIGH_LATITUDE_RULES.index(rule) + 1
+
+
+def high_latitude_rule_from_code(code):
+    """Decode a high latitude rule written by high_latitude_rule_code."""
+    if code == 0:
+        return None
+    if code > len(HIGH_LATITUDE_RULES):
+        raise ValueError('unknown high latitude rule %d' % code)
+    return HIGH_LATITUDE_RULES[code - 1]
+
+
+def plan_header_fields(plan):
+    """Encode a CalculationPlan for a file header.
+
+    :param plan: A CalculationPlan
+    :returns: The fajr angle, isha angle, isha delay, asr multiplier and
+              high latitude rule code, with NaN for the Isha parameter the
+              plan doesn't use
+    """
+    nan = float('nan')
+    return (
+        plan.fajr_angle,
+        nan if plan.isha_angle is None else plan.isha_angle,
+        nan if plan.isha_delay is None else plan.isha_delay,
+        plan.asr_multiplier,
+        high_latitude_rule_code(plan.high_latitude_rule),
+    )
+
+
+def header_parameters(fields):
+    """Decode the fields written by plan_header_fields into parameters.
+
+    :param fields: The five fields, as unpacked from the header
+    :returns: A parameter dict
+    """
+    fajr_angle, isha_angle, isha_delay, asr_multiplier, rule_code = fields
+    parameters = {
+        'fajr_angle': fajr_angle,
+        'asr_multiplier': asr_multiplier,
+    }
+    if not math.isnan(isha_angle):
+        parameters['isha_angle'] = isha_angle
+    if not math.isnan(isha_delay):
+        parameters['isha_delay'] = isha_delay
+    if rule_code:
+        parameters['high_latitude_rule'] = \
+            high_latitude_rule_from_code(rule_code)
+    return parameters
+
+
+def iter_times(location, parameters, start, end, timezone_offset=0):
+    """Lazily generate the adhan times for every day in a date range.
+
+    Each day is computed only when the consumer asks for it and nothing is
+    kept afterwards, so arbitrarily long ranges can be streamed (to disk, for
+    example) in constant memory. The day of the year is advanced in step with
+    the date rather than being worked out from scratch for every day, and
+    the shared ephemeris cache is bypassed since each day is seen only once.
+
+    :param location: An adhan.location.Location, or a 2-tuple of latitude and
+                     longitude in degrees
+    :param parameters: A parameter dict or CalculationPlan, as accepted by
+                       adhan.adhan
+    :param start: The first datetime.date to calculate for
+    :param end: The last datetime.date to calculate for, inclusive
+    :param timezone_offset: The number of hours to add to each prayer time,
+                            or a time zone, as accepted by adhan.adhan
+    :returns: A generator of TimetableRow, holding the day and each prayer as
+              integer minutes since local midnight, rounded like adhan.adhan
+    """
+    location = as_location(location)
+    plan = compile_method(parameters, strict=False)
+
+    if is_zone(timezone_offset):
+        zone = get_zone(timezone_offset)
+        for day, ephemeris in iter_ephemerides(start, end):
+            times = compute_prayer_times(day, location, plan, ephemeris)
+            yield convert_zoned_prayer_times(day, times, zone, 'minutes')
+        return
+
+    offset = int(round(60 * timezone_offset))
+    for day, ephemeris in iter_ephemerides(start, end):
+        times = compute_prayer_times(day, location, plan, ephemeris)
+        yield TimetableRow(day, *[
+            floating_point_to_minutes(fp_time) + offset for fp_time in times
+        ])
+
+
+def iter_ephemerides(start, end):
+    """Generate the Ephemeris of every day in a date range.
+
+    :param start: The first datetime.date
+    :param end: The last datetime.date, inclusive
+    :returns: A generator of (day, ephemeris) pairs
+    """
+    one_day = timedelta(days=1)
+    day = start
+
+    if not solar_backend().by_day_of_year:
+        while day <= end:
+            yield day, compute_ephemeris(day)
+            day += one_day
+        return
+
+    day_index = day_of_year(start)
+
+    while day <= end:
+        yield day, compute_ephemeris_at(day_index)
+
+        day += one_day
+        if day.month == 1 and day.day == 1:
+            day_index = 0
+        else:
+            day_index += 1
+
+
+def write_timetable(path, location, parameters, start, end,
+                    timezone_offset=0):
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    """Compute a timetable and write it to a binary timetable file.
+
+    Days are streamed from iter_times and written in blocks, so memory use
+    does not depend on the length of the range.
+
+    :param path: The path of the file to write
+    :param location: An adhan.location.Location, or a 2-tuple of latitude and
+                     longitude in degrees
+    :param parameters: A parameter dict or CalculationPlan, as accepted by
+                       adhan.adhan
+    :param start: The first datetime.date of the timetable
+    :param end: The last datetime.date of the timetable, inclusive
+    :param timezone_offset: The number of hours to add to each prayer time.
+                            The file records a single offset, so time zones
+                            are not accepted
+    :raises ValueError: If the end date is before the start date
+    """
+    if end < start:
+        raise ValueError('the end date %s is before the start date %s' %
+                         (end, start))
+
+    location = as_location(location)
+    plan = compile_method(parameters, strict=False)
+    header = _timetable_header(
+        location, plan, start, (end - start).days + 1, timezone_offset
+    )
+
+    with open(path, 'wb') as output:
+        output.write(header)
+
+        block = array('h')
+        rows = iter_times(location, plan, start, end, timezone_offset)
+        for row in rows:
+            block.extend(row[1:])
+            if len(block) >= _WRITE_BUFFER_DAYS * TIMETABLE_RECORD.size // 2:
+                _write_block(output, block)
+                block = array('h')
+        _write_block(output, block)
+
+
+def write_timetable_records(path, location, parameters, start, records,
+                            timezone_offset=0):
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    """Write already computed records to a binary timetable file.
+
+    :param path: The path of the file to write
+    :param location: An adhan.location.Location, or a 2-tuple of latitude and
+                     longitude in degrees
+    :param parameters: The parameter dict or CalculationPlan the records were
+                       computed with
+    :param start: The datetime.date of the first record
+    :param records: An array('h') holding each day's prayers as minutes
+                    since local midnight, as built by
+                    adhan.parallel.build_timetables
+    :param timezone_offset: The number of hours the records were offset by
+    """
+    prayers = len(PrayerTimes._fields)
+    if len(records) % prayers:
+        raise ValueError('records must hold %d prayers per day' % prayers)
+
+    header = _timetable_header(
+        as_location(location), compile_method(parameters, strict=False),
+        start, len(records) // prayers, timezone_offset
+    )
+
+    with open(path, 'wb') as output:
+        output.write(header)
+        _write_block(output, array('h', records))
+
+
+def _timetable_header(location, plan, start, days, timezone_offset):
+    """Pack the header of a timetable file."""
+    if is_zone(timezone_offset):
+        raise ValueError('timetable files need a fixed timezone_offset')
+
+    return TIMETABLE_HEADER.pack(
+        TIMETABLE_MAGIC,
+        TIMETABLE_VERSION,
+        len(PrayerTimes._fields),
+        location.latitude,
+        location.longitude,
+        timezone_offset,
+        start.toordinal(),
+        days,
+        *plan_header_fields(plan)
+    )
+
+
+def _write_block(output, block):
+    """Write an array of int16 to a file as little-endian."""
+    if sys.byteorder != 'little':
+        block.byteswap()
+    output.write(block.tobytes())
+
+
+class TimetableFile:
+    """A read-only, memory-mapped binary timetable file.
+
+    Opening a timetable only reads its header; the records stay on disk and
+    are paged in by the operating system as they are looked up, so a lookup
+    is a single offset read and any number of processes can share the pages.
+    """
+
+    def __init__(self, path):
+        """Open and memory-map a timetable file written by write_timetable.
+
+        :param path: The path of the timetable file
+        :raises ValueError: If the file is not a timetable file
+        """
+        with open(path, 'rb') as timetable:
+            self._map = mmap.mmap(
+                timetable.fileno(), 0, access=mmap.ACCESS_READ
+            )
+
+        try:
+            self._read_header()
+        except ValueError:
+            self.close()
+            raise
+
+    def _read_header(self):
+        """Parse and check the header of the mapped file."""
+        if len(self._map) < TIMETABLE_HEADER.size:
+            raise ValueError('file is too small to be a timetable')
+
+        fields = TIMETABLE_HEADER.unpack_from(self._map)
+        (magic, version, prayers, latitude, longitude, timezone_offset,
+         start_ordinal, days) = fields[:-5]
+
+        if magic != TIMETABLE_MAGIC:
+            raise ValueError('not a timetable file')
+        if version != TIMETABLE_VERSION:
+            raise ValueError('unsupported timetable version %d' % version)
+        if prayers != len(PrayerTimes._fields):
+            raise ValueError('unexpected number of prayers %d' % prayers)
+        if len(self._map) < TIMETABLE_HEADER.size + \
+                days * TIMETABLE_RECORD.size:
+            raise ValueError('timetable file is truncated')
+
+        self.location = as_location((latitude, longitude))
+        self.timezone_offset = timezone_offset
+        self._start_ordinal = start_ordinal
+        self._days = days
+        self.parameters = header_parameters(fields[-5:])
+
+    @property
+    def start(self):
+        """The first day of the timetable."""
+        return date.fromordinal(self._start_ordinal)
+
+    @property
+    def end(self):
+        """The last day of the timetable."""
+        return date.fromordinal(self._start_ordinal + self._days - 1)
+
+    def __len__(self):
+        """Return the number of days in the timetable."""
+        return self._days
+
+    def __contains__(self, day):
+        """Check whether a day is covered by the timetable."""
+        return 0 <= day.toordinal() - self._start_ordinal < self._days
+
+    def lookup(self, day):
+        """Read the adhan times for a day.
+
+        :param day: The datetime.date to look up
+        :returns: A TimetableRow of minutes since local midnight
+        :raises KeyError: If the day is outside the timetable
+        """
+        index = day.toordinal() - self._start_ordinal
+        if not 0 <= index < self._days:
+            raise KeyError(day)
+
+        return TimetableRow(day, *TIMETABLE_RECORD.unpack_from(
+            self._map, TIMETABLE_HEADER.size + index * TIMETABLE_RECORD.size
+        ))
+
+    __getitem__ = lookup
+
+    def __iter__(self):
+        """Iterate over every TimetableRow in the timetable."""
+        for index in range(self._days):
+            yield self.lookup(date.fromordinal(self._start_ordinal + index))
+
+    def close(self):
+        """Unmap the timetable file."""
+        self._map.close()
+
+    def __enter__(self):
+        """Use the timetable as a context manager that closes it."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close the timetable."""
+        self.close()
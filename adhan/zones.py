@@ -0,0 +1,179 @@
+"""
+zones.py - Time zone support through cached UTC offset transitions.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+from bisect import bisect_right
+from datetime import date, datetime, timedelta, tzinfo
+
+from .calculations import LRUCache
+
+ZONE_TRANSITIONS_CACHE_SIZE = 256
+
+#
+# Prayers computed for a day can fall up to a day and a half after its UTC
+# midnight, and some before it, so each year's table reaches a few days into
+# its neighbours
+#
+YEAR_MARGIN_DAYS = 3
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def is_zone(timezone):
+    """Check whether a timezone argument names a zone, not a fixed offset."""
+    return isinstance(timezone, (str, tzinfo))
+
+
+def get_zone(timezone):
+    """Resolve a time zone argument to a tzinfo.
+
+    :param timezone: An IANA time zone name such as 'America/Chicago', or a
+                     tzinfo which is returned as is
+    :returns: A tzinfo
+    """
+    if isinstance(timezone, tzinfo):
+        return timezone
+
+    #
+    # zoneinfo reads the system time zone paths on import, so only pay for
+    # it once a zone name is actually used
+    #
+    from zoneinfo import ZoneInfo  # pylint: disable=import-outside-toplevel
+
+    return ZoneInfo(timezone)
+
+
+def _utc_offset(zone, seconds):
+    """Return a zone's UTC offset in seconds at seconds since the epoch."""
+    instant = _EPOCH + timedelta(seconds=seconds)
+    offset = zone.fromutc(instant.replace(tzinfo=zone)).utcoffset()
+    return int(offset.total_seconds())
+
+
+class ZoneTransitions:
+    """The UTC offsets of a time zone over one year.
+
+    The offset changes at each instant in instants: before instants[0] it is
+    offsets[0], from instants[i] up to the next transition it is
+    offsets[i + 1]. Instants are seconds since the epoch, and offsets are
+    seconds east of UTC.
+    """
+
+    __slots__ = ('zone', 'year', 'instants', 'offsets')
+
+    def __init__(self, zone, year):
+        """Find the transitions of a zone during a year.
+
+        The offset is sampled at every UTC midnight and each change is then
+        narrowed down to the second by bisection, so building the table for
+        a year costs a few hundred tzinfo calls, once.
+
+        :param zone: A tzinfo
+        :param year: The year to cover
+        """
+        self.zone = zone
+        self.year = year
+        self.instants = []
+
+        start = (date(year, 1, 1).toordinal() - _EPOCH_ORDINAL -
+                 YEAR_MARGIN_DAYS) * _SECONDS_PER_DAY
+        end = (date(year + 1, 1, 1).toordinal() - _EPOCH_ORDINAL +
+               YEAR_MARGIN_DAYS) * _SECONDS_PER_DAY
+
+        self.offsets = [_utc_offset(zone, start)]
+
+        low = start
+        while low < end:
+            high = low + _SECONDS_PER_DAY
+            offset = _utc_offset(zone, high)
+            if offset != self.offsets[-1]:
+                self.instants.append(self._find_transition(low, high))
+                self.offsets.append(offset)
+            low = high
+
+    def _find_transition(self, low, high):
+        """Find the first second in (low, high] with a different offset."""
+        before = _utc_offset(self.zone, low)
+        while high - low > 1:
+            middle = (low + high) // 2
+            if _utc_offset(self.zone, middle) == before:
+                low = middle
+            else:
+                high = middle
+        return high
+
+    def day_offsets(self, day, minutes):
+        """Look up the UTC offset of each prayer time on a day.
+
+        Prayers are in ascending order, so the transition table is searched
+        once for the first and then walked forward, which also handles a
+        transition falling between two prayers.
+
+        :param day: The datetime.date the times were computed for
+        :param minutes: Ascending whole minutes since UTC midnight of day
+        :returns: A list of (offset, fold) pairs, with the offset in seconds
+                  and fold set to 1 for the second occurrence of a repeated
+                  local time, as for datetime.fold
+        """
+        instants = self.instants
+        offsets = self.offsets
+        midnight = (day.toordinal() - _EPOCH_ORDINAL) * _SECONDS_PER_DAY
+
+        result = []
+        index = bisect_right(instants, midnight + 60 * minutes[0])
+        for minute in minutes:
+            instant = midnight + 60 * minute
+            while index < len(instants) and instants[index] <= instant:
+                index += 1
+
+            offset = offsets[index]
+            fold = 0
+            if index:
+                #
+                # Local times repeat for a while after the clocks go back
+                #
+                overlap = offsets[index - 1] - offset
+                if overlap > 0 and instant < instants[index - 1] + overlap:
+                    fold = 1
+            result.append((offset, fold))
+
+        return result
+
+
+def _cached_zone_transitions(key):
+    """Compute the ZoneTransitions for a ZONE_TRANSITIONS_CACHE key."""
+    zone, year = key
+    return ZoneTransitions(zone, year)
+
+
+ZONE_TRANSITIONS_CACHE = LRUCache(
+    _cached_zone_transitions, ZONE_TRANSITIONS_CACHE_SIZE
+)
+
+
+def zone_transitions(zone, year):
+    """Look up the cached ZoneTransitions of a zone for a year.
+
+    :param zone: A tzinfo, as returned by get_zone
+    :param year: The year
+    :returns: A ZoneTransitions
+    """
+    return ZONE_TRANSITIONS_CACHE.get((zone, year))
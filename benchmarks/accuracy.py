@@ -0,0 +1,166 @@
+"""
+accuracy.py - measures the error of each solar backend.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+import sys
+
+from collections import OrderedDict
+from datetime import date, timedelta
+from math import radians, sin, cos
+
+from adhan import calculations, methods
+from adhan.adhan import (
+    PrayerTimes,
+    SIN_SUNRISE_ANGLE,
+    SIN_SUNSET_ANGLE,
+    compute_prayer_times,
+)
+from adhan.location import Location
+
+#
+# The reference evaluates the NOAA model at the instant of each prayer
+# rather than once a day, which is as close to the true position of the sun
+# as its formulas go. Zuhr is still computed from the absolute longitude by
+# the library, so only western longitudes are compared. The noaa backend
+# uses the same model but evaluates it once a day at noon, so it is measured
+# like every other backend: its error is what the daily ephemeris costs.
+#
+SITES = OrderedDict([
+    ('austin', (30.25, -97.75)),
+    ('seattle', (47.61, -122.33)),
+    ('mexico_city', (19.43, -99.13)),
+    ('buenos_aires', (-34.60, -58.38)),
+])
+
+START = date(2000, 1, 1)
+END = date(2039, 12, 31)
+STEP_DAYS = 7
+
+REFERENCE_ITERATIONS = 3
+
+
+def reference_prayer_times(day, location, plan):
+    """Compute UTC prayer times with the sun's position at each instant.
+
+    Each time is found by fixed point iteration: the NOAA model is evaluated
+    at the current estimate of the prayer time, which gives the next one.
+
+    :param day: The datetime.date to calculate for
+    :param location: A Location in the western hemisphere
+    :param plan: A CalculationPlan without isha_delay or high latitude rule
+    :returns: A PrayerTimes of floating point UTC hours
+    """
+    noon = calculations.gregorian_to_julian(day)
+    latitude_rad = radians(location.latitude)
+    sin_latitude = sin(latitude_rad)
+    cos_latitude = cos(latitude_rad)
+
+    def solve(hour_angle, sign):
+        time = 12
+        for _ in range(REFERENCE_ITERATIONS):
+            ephemeris = calculations.noaa_solar_position(
+                noon + (time - 12) / 24
+            )
+            zuhr_time = (12 - location.longitude / 15 -
+                         ephemeris.equation_of_time)
+            time = zuhr_time + sign * hour_angle(ephemeris)
+        return time
+
+    def at_sun_angle(sin_angle):
+        return lambda ephemeris: calculations.compute_hour_angle(
+            sin_angle, sin_latitude, cos_latitude, ephemeris
+        )
+
+    def at_shadow(ephemeris):
+        return calculations.compute_shadow_hour_angle(
+            plan.asr_multiplier, latitude_rad, sin_latitude, cos_latitude,
+            ephemeris
+        )
+
+    return PrayerTimes(
+        fajr=solve(at_sun_angle(plan.sin_fajr_angle), -1),
+        shuruq=solve(at_sun_angle(SIN_SUNRISE_ANGLE), -1),
+        zuhr=solve(lambda ephemeris: 0, 0),
+        asr=solve(at_shadow, 1),
+        maghrib=solve(at_sun_angle(SIN_SUNSET_ANGLE), 1),
+        isha=solve(at_sun_angle(plan.sin_isha_angle), 1),
+    )
+
+
+def measure_accuracy(backend, parameters=None):
+    """Measure the error of a solar backend against the reference.
+
+    :param backend: The name of a backend in adhan.calculations.SOLAR_BACKENDS
+    :param parameters: The method to compare, ISNA and standard Asr by default
+    :returns: A dict with the overall 'max_seconds' and 'mean_seconds' of the
+              absolute error and the same per prayer under 'prayers'
+    """
+    if parameters is None:
+        parameters = dict(methods.ISNA, **methods.ASR_STANDARD)
+    plan = methods.compile_method(parameters)
+
+    errors = [[] for _ in PrayerTimes._fields]
+    previous = calculations.solar_backend()
+    calculations.set_solar_backend(backend)
+    try:
+        day = START
+        while day <= END:
+            for coordinates in SITES.values():
+                location = Location(*coordinates)
+                times = compute_prayer_times(day, location, plan)
+                reference = reference_prayer_times(day, location, plan)
+                for index, (time, expected) in enumerate(zip(times,
+                                                             reference)):
+                    errors[index].append(abs(time - expected) * 3600)
+            day += timedelta(days=STEP_DAYS)
+    finally:
+        calculations.set_solar_backend(previous)
+
+    every = [error for prayer in errors for error in prayer]
+    return {
+        'max_seconds': max(every),
+        'mean_seconds': sum(every) / len(every),
+        'prayers': OrderedDict([
+            (name, {
+                'max_seconds': max(prayer),
+                'mean_seconds': sum(prayer) / len(prayer),
+            })
+            for name, prayer in zip(PrayerTimes._fields, errors)
+        ]),
+    }
+
+
+def run_accuracy(log=None):
+    """Measure every registered solar backend.
+
+    :param log: Optional file to report the results to
+    :returns: A dict of backend name to the result of measure_accuracy
+    """
+    results = OrderedDict()
+    for name in calculations.SOLAR_BACKENDS:
+        results[name] = measure_accuracy(name)
+        if log is not None:
+            print('%-40s max %6.1f s  mean %6.1f s' % (
+                'accuracy.%s' % name, results[name]['max_seconds'],
+                results[name]['mean_seconds']
+            ), file=log)
+    return results
+
+
+if __name__ == '__main__':
+    run_accuracy(log=sys.stdout)
@@ -0,0 +1,61 @@
+"""
+bench_batch.py - compares adhan.batch.adhan_grid against scalar adhan calls.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+import argparse
+import random
+import timeit
+
+from datetime import date, timedelta
+
+from adhan import adhan, methods
+from adhan.batch import adhan_grid
+
+
+def main():
+    """Time a days x locations grid through both the scalar and batch paths."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--locations', type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    days = [date(2016, 1, 1) + timedelta(days=i) for i in range(args.days)]
+    latitudes = [rng.uniform(-45, 45) for _ in range(args.locations)]
+    longitudes = [rng.uniform(-180, 180) for _ in range(args.locations)]
+    parameters = dict(methods.ISNA, **methods.ASR_STANDARD)
+
+    def scalar():
+        for day in days:
+            for location in zip(latitudes, longitudes):
+                adhan(day, location, parameters)
+
+    def vectorized():
+        adhan_grid(days, latitudes, longitudes, parameters)
+
+    scalar_time = min(timeit.repeat(scalar, number=1, repeat=3))
+    batch_time = min(timeit.repeat(vectorized, number=1, repeat=3))
+
+    print('%d days x %d locations' % (args.days, args.locations))
+    print('scalar: %8.3fs' % scalar_time)
+    print('batch:  %8.3fs' % batch_time)
+    print('speedup: %.1fx' % (scalar_time / batch_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+bench_fitted.py - checks fitted evaluation is faster than calculating the day.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+import argparse
+import sys
+
+from .run import measure
+from .suite import BENCHMARKS
+
+FITTED = 'fitted.prayer_times'
+EXACT = 'fitted.exact_prayer_times'
+
+
+def compare_fitted(min_time=0.2, repeat=5):
+    """Time a fitted lookup against compute_prayer_times on the same day.
+
+    :returns: The best time per call in seconds of each, as a
+              (fitted, exact) pair
+    """
+    return tuple(
+        measure(BENCHMARKS[name](), min_time=min_time, repeat=repeat)['min']
+        for name in (FITTED, EXACT)
+    )
+
+
+def main(argv=None):
+    """Exit with a non-zero status unless fitted lookups are the faster."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='minimum seconds per repetition')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='repetitions of each benchmark')
+    args = parser.parse_args(argv)
+
+    fitted, exact = compare_fitted(args.min_time, args.repeat)
+    print('fitted: %8.3f us' % (fitted * 1e6))
+    print('exact:  %8.3f us' % (exact * 1e6))
+    print('speedup: %.1fx' % (exact / fitted))
+    return 0 if fitted < exact else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+run.py - runs the benchmark suite and compares against a baseline.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+import argparse
+import json
+import platform
+import re
+import sys
+import timeit
+
+from .accuracy import run_accuracy
+from .suite import BENCHMARKS
+
+FORMAT_VERSION = 1
+
+
+def measure(func, min_time=0.2, repeat=5):
+    """Time a callable, returning statistics per call in seconds.
+
+    The number of calls per repetition is grown until one repetition takes at
+    least min_time, then the best and median of repeat repetitions are kept.
+    """
+    timer = timeit.Timer(func)
+
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    timings = sorted(
+        [elapsed] + timer.repeat(repeat=repeat - 1, number=number)
+    )
+    return {
+        'min': timings[0] / number,
+        'median': timings[len(timings) // 2] / number,
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def run_benchmarks(pattern=None, min_time=0.2, repeat=5, log=None):
+    """Run every registered benchmark whose name matches pattern.
+
+    :param pattern: Optional regular expression to select benchmarks by name
+    :param min_time: Minimum time in seconds for one repetition
+    :param repeat: Number of repetitions of each benchmark
+    :param log: Optional file to report progress to
+    :returns: A dict of benchmark name to statistics, benchmarks whose
+              optional dependencies are missing are left out
+    """
+    results = {}
+    for name, factory in BENCHMARKS.items():
+        if pattern and not re.search(pattern, name):
+            continue
+
+        func = factory()
+        if func is None:
+            continue
+
+        results[name] = measure(func, min_time=min_time, repeat=repeat)
+        if log is not None:
+            print('%-40s %12s' % (name, _format_time(results[name]['min'])),
+                  file=log)
+    return results
+
+
+def compare(results, baseline, threshold=0.1):
+    """Compare results to a baseline.
+
+    :param results: The benchmark results dict from run_benchmarks
+    :param baseline: A benchmark results dict to compare with
+    :param threshold: The relative slowdown above which a benchmark counts as
+                      regressed
+    :returns: A list of (name, baseline_min, current_min, ratio, regressed)
+              for every benchmark present in both
+    """
+    rows = []
+    for name in sorted(set(results) & set(baseline)):
+        before = baseline[name]['min']
+        after = results[name]['min']
+        ratio = after / before
+        rows.append((name, before, after, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def _format_time(seconds):
+    """Format a duration with a sensible unit."""
+    for unit, scale in (('s', 1), ('ms', 1e3), ('us', 1e6)):
+        if seconds * scale >= 1:
+            return '%.3f %s' % (seconds * scale, unit)
+    return '%.1f ns' % (seconds * 1e9)
+
+
+def main(argv=None):
+    """Run the benchmark suite from the command line."""
+    parser = argparse.ArgumentParser(
+        description='Run the adhan benchmark suite.'
+    )
+    parser.add_argument('-k', '--filter', metavar='PATTERN',
+                        help='only run benchmarks matching this regex')
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='minimum seconds per repetition')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='repetitions of each benchmark')
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help='write the results as JSON to this file')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='compare against results saved with --output')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown counted as a regression')
+    parser.add_argument('--accuracy', action='store_true',
+                        help='also measure the error of each solar backend')
+    parser.add_argument('--list', action='store_true',
+                        help='list the benchmarks and exit')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name in BENCHMARKS:
+            print(name)
+        return 0
+
+    results = run_benchmarks(args.filter, args.min_time, args.repeat,
+                             log=sys.stdout)
+    accuracy = run_accuracy(log=sys.stdout) if args.accuracy else None
+
+    if args.output:
+        report = {
+            'version': FORMAT_VERSION,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'results': results,
+        }
+        if accuracy is not None:
+            report['accuracy'] = accuracy
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+
+    if not args.compare:
+        return 0
+
+    with open(args.compare) as baseline_file:
+        baseline = json.load(baseline_file)['results']
+
+    regressed = False
+    print()
+    print('%-40s %12s %12s %8s' % (
+        'benchmark', 'baseline', 'current', 'ratio'
+    ))
+    for name, before, after, ratio, is_regression in compare(
+            results, baseline, args.threshold):
+        regressed = regressed or is_regression
+        print('%-40s %12s %12s %7.2fx%s' % (
+            name, _format_time(before), _format_time(after), ratio,
+            '  REGRESSED' if is_regression else ''
+        ))
+
+    return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
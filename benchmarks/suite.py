@@ -0,0 +1,478 @@
+"""
+suite.py - benchmarks covering every calculation entry point.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+import io
+import random
+
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+from adhan import adhan, calculations, methods, Location, PrayerCalculator
+from adhan.adhan import (
+    compute_prayer_times,
+    day_latitude_offsets,
+    prayer_times_from_offsets,
+    set_result_cache,
+    times_at_angles,
+)
+from adhan.events import EventIndex
+from adhan.fitted import FittedCalculator, FittedTimetable
+from adhan.grid import LatitudeGrid
+from adhan.parallel import build_timetables
+from adhan.queries import next_prayer
+from adhan.timetable import iter_times
+
+from adhan.sharedcache import SharedResultCache
+from adhan.store import LocationStore
+
+try:
+    from adhan.batch import adhan_grid, store_grid
+except ImportError:
+    adhan_grid = store_grid = None
+
+#
+# Each benchmark is a factory that does its setup and returns the callable
+# to time, so that setup cost never counts towards the measurement
+#
+BENCHMARKS = OrderedDict()
+
+DAY = date(2016, 6, 21)
+YEAR = (date(2016, 1, 1), date(2016, 12, 31))
+AUSTIN = (30.25, -97.75)
+HIGH_LATITUDE = (47.61, -122.33)    # Seattle, about as far north as ISNA goes
+NORTHERN = (57.48, -4.22)           # Inverness, needs a high latitude rule
+FAN_OUT_LOCATIONS = 1000
+EVENT_SITES = 10000
+STORE_SITES = 100000
+STORE_METHODS = ('isna', 'muslim_world_league', 'karachi:hanafi', 'makkah')
+STORE_TIMEZONES = ('-6', '3', '5.5', '')
+
+#
+# Twelve custom events: six twilight bands either side of Zuhr
+#
+EVENT_ANGLES = (18, 15, 12, 6, 0.833, -4)
+
+
+def benchmark(name):
+    """Register a benchmark factory under a name."""
+    def register(factory):
+        BENCHMARKS[name] = factory
+        return factory
+    return register
+
+
+def _parameters(method=None):
+    """Combine a method, ISNA by default, with the standard Asr method."""
+    if method is None:
+        method = methods.ISNA
+    parameters = {}
+    parameters.update(method)
+    parameters.update(methods.ASR_STANDARD)
+    return parameters
+
+
+def _locations(count):
+    """Generate reproducible random locations between 45S and 45N."""
+    rng = random.Random(0)
+    return [
+        (rng.uniform(-45, 45), rng.uniform(-180, 180)) for _ in range(count)
+    ]
+
+
+#
+# Single calls
+#
+@benchmark('calculations.sun_declination')
+def _sun_declination():
+    return lambda: calculations.sun_declination(DAY)
+
+
+@benchmark('calculations.equation_of_time')
+def _equation_of_time():
+    return lambda: calculations.equation_of_time(DAY)
+
+
+@benchmark('calculations.compute_zuhr_utc')
+def _compute_zuhr_utc():
+    return lambda: calculations.compute_zuhr_utc(DAY, AUSTIN[1])
+
+
+@benchmark('calculations.compute_time_at_sun_angle')
+def _compute_time_at_sun_angle():
+    return lambda: calculations.compute_time_at_sun_angle(DAY, AUSTIN[0], 15)
+
+
+@benchmark('calculations.time_at_shadow_length')
+def _time_at_shadow_length():
+    return lambda: calculations.time_at_shadow_length(DAY, AUSTIN[0], 1)
+
+
+@benchmark('calculations.angles_one_by_one')
+def _angles_one_by_one():
+    def run():
+        for angle in EVENT_ANGLES:
+            calculations.compute_time_at_sun_angle(DAY, AUSTIN[0], angle)
+            calculations.compute_time_at_sun_angle(DAY, AUSTIN[0], -angle)
+    return run
+
+
+@benchmark('calculations.times_at_angles')
+def _times_at_angles():
+    location = Location(*AUSTIN)
+    return lambda: times_at_angles(DAY, location, EVENT_ANGLES)
+
+
+@benchmark('adhan.single')
+def _adhan_single():
+    parameters = _parameters()
+    return lambda: adhan(DAY, AUSTIN, parameters, -6)
+
+
+@benchmark('adhan.single_cold_cache')
+def _adhan_single_cold_cache():
+    parameters = _parameters()
+
+    def run():
+        calculations.EPHEMERIS_CACHE.clear()
+        adhan(DAY, AUSTIN, parameters, -6)
+    return run
+
+
+@benchmark('calculator.times')
+def _calculator_times():
+    calculator = PrayerCalculator(AUSTIN, _parameters(), -6)
+    return lambda: calculator.times(DAY)
+
+
+@benchmark('fitted.calculator_times')
+def _fitted_calculator_times():
+    calculator = FittedCalculator(AUSTIN, _parameters(), -6)
+    calculator.times(DAY)
+    return lambda: calculator.times(DAY)
+
+
+@benchmark('fitted.prayer_times')
+def _fitted_prayer_times():
+    fitted = FittedTimetable(AUSTIN, _parameters(), DAY.year)
+    return lambda: fitted.prayer_times(DAY)
+
+
+@benchmark('fitted.exact_prayer_times')
+def _fitted_exact_prayer_times():
+    location = Location(*AUSTIN)
+    plan = methods.compile_method(_parameters())
+    return lambda: compute_prayer_times(DAY, location, plan)
+
+
+@benchmark('fitted.fit')
+def _fitted_fit():
+    parameters = _parameters()
+    return lambda: FittedTimetable(AUSTIN, parameters, DAY.year)
+
+
+@benchmark('query.next_prayer')
+def _query_next_prayer():
+    parameters = _parameters()
+    when = datetime(2016, 6, 21, 15, 0)
+    return lambda: next_prayer(AUSTIN, parameters, when, -6)
+
+
+@benchmark('query.next_prayer_after_isha')
+def _query_next_prayer_after_isha():
+    parameters = _parameters()
+    when = datetime(2016, 6, 21, 23, 0)
+    return lambda: next_prayer(AUSTIN, parameters, when, -6)
+
+
+def _register_methods():
+    """Register a single call benchmark for every method in adhan.methods."""
+    for method_name, method in methods.METHODS.items():
+        def factory(method=method):
+            parameters = _parameters(method)
+            return lambda: adhan(DAY, AUSTIN, parameters, -6)
+        benchmark('method.%s' % method_name)(factory)
+
+
+_register_methods()
+
+
+#
+# Solar backends
+#
+def _with_backend(name, func):
+    """Run a callable with a solar backend, restoring the previous one."""
+    def run():
+        previous = calculations.solar_backend()
+        calculations.set_solar_backend(name)
+        try:
+            func()
+        finally:
+            calculations.set_solar_backend(previous)
+    return run
+
+
+def _register_solar_backends():
+    """Register speed benchmarks for every solar backend.
+
+    Their accuracy is measured by benchmarks.accuracy.
+    """
+    for backend_name, backend in calculations.SOLAR_BACKENDS.items():
+        def ephemeris_factory(backend=backend):
+            return lambda: backend.ephemeris(DAY)
+        benchmark('solar.%s.ephemeris' % backend_name)(ephemeris_factory)
+
+        def year_factory(backend_name=backend_name):
+            parameters = _parameters()
+
+            def run():
+                for _ in iter_times(AUSTIN, parameters, YEAR[0], YEAR[1], -6):
+                    pass
+            return _with_backend(backend_name, run)
+        benchmark('solar.%s.iter_times' % backend_name)(year_factory)
+
+
+_register_solar_backends()
+
+
+#
+# Year long ranges
+#
+@benchmark('year.adhan_loop')
+def _year_adhan_loop():
+    parameters = _parameters()
+    days = [YEAR[0] + timedelta(days=i) for i in range(366)]
+
+    def run():
+        for day in days:
+            adhan(day, AUSTIN, parameters, -6)
+    return run
+
+
+@benchmark('year.calculator_times_range')
+def _year_calculator_times_range():
+    calculator = PrayerCalculator(AUSTIN, _parameters(), -6)
+
+    def run():
+        for _ in calculator.times_range(*YEAR):
+            pass
+    return run
+
+
+@benchmark('year.iter_times')
+def _year_iter_times():
+    parameters = _parameters()
+
+    def run():
+        for _ in iter_times(AUSTIN, parameters, YEAR[0], YEAR[1], -6):
+            pass
+    return run
+
+
+@benchmark('year.zoned_times_range')
+def _year_zoned_times_range():
+    calculator = PrayerCalculator(AUSTIN, _parameters(), 'America/Chicago')
+
+    def run():
+        for _ in calculator.times_range(*YEAR):
+            pass
+    return run
+
+
+@benchmark('year.high_latitude')
+def _year_high_latitude():
+    parameters = _parameters()
+
+    def run():
+        for _ in iter_times(HIGH_LATITUDE, parameters, YEAR[0], YEAR[1], -8):
+            pass
+    return run
+
+
+@benchmark('year.high_latitude_rule')
+def _year_high_latitude_rule():
+    parameters = _parameters(methods.MUSLIM_WORLD_LEAGUE)
+    parameters.update(methods.ANGLE_BASED)
+
+    def run():
+        for _ in iter_times(NORTHERN, parameters, YEAR[0], YEAR[1]):
+            pass
+    return run
+
+
+#
+# Many locations
+#
+@benchmark('fan_out.event_window')
+def _fan_out_event_window():
+    parameters = _parameters()
+    index = EventIndex(
+        [(location, parameters) for location in _locations(EVENT_SITES)], DAY
+    )
+    start = datetime(2016, 6, 21, 23, 0)
+    end = start + timedelta(minutes=10)
+    return lambda: index.window(start, end, ['maghrib'])
+
+
+@benchmark('fan_out.event_next')
+def _fan_out_event_next():
+    parameters = _parameters()
+    index = EventIndex(
+        [(location, parameters) for location in _locations(EVENT_SITES)], DAY
+    )
+    when = datetime(2016, 6, 21, 23, 0)
+    return lambda: index.next_events(when, 10)
+
+
+@benchmark('fan_out.adhan_loop')
+def _fan_out_adhan_loop():
+    parameters = _parameters()
+    locations = _locations(FAN_OUT_LOCATIONS)
+
+    def run():
+        for location in locations:
+            adhan(DAY, location, parameters)
+    return run
+
+
+@benchmark('fan_out.grid_query')
+def _fan_out_grid_query():
+    grid = LatitudeGrid(_parameters(), DAY, DAY)
+    locations = _locations(FAN_OUT_LOCATIONS)
+
+    def run():
+        for latitude, longitude in locations:
+            grid.prayer_times(DAY, latitude, longitude)
+    return run
+
+
+@benchmark('fan_out.city_offsets')
+def _fan_out_city_offsets():
+    plan = methods.compile_method(_parameters())
+    rng = random.Random(0)
+    sites = [
+        (30.25 + rng.uniform(-0.1, 0.1), -97.75 + rng.uniform(-0.1, 0.1))
+        for _ in range(FAN_OUT_LOCATIONS)
+    ]
+
+    def run():
+        ephemeris = calculations.solar_ephemeris(DAY)
+        for latitude, longitude in sites:
+            prayer_times_from_offsets(
+                calculations.compute_zuhr_utc(DAY, longitude, ephemeris),
+                day_latitude_offsets(DAY, latitude, plan),
+                plan,
+            )
+    return run
+
+
+@benchmark('fan_out.build_timetables')
+def _fan_out_build_timetables():
+    parameters = _parameters()
+    locations = _locations(FAN_OUT_LOCATIONS)
+    return lambda: build_timetables(
+        locations, parameters, (DAY, DAY), workers=1
+    )
+
+
+@benchmark('fan_out.batch_year')
+def _fan_out_batch_year():
+    if adhan_grid is None:
+        return None
+
+    parameters = _parameters()
+    latitudes, longitudes = zip(*_locations(FAN_OUT_LOCATIONS))
+    days = [YEAR[0] + timedelta(days=i) for i in range(366)]
+    return lambda: adhan_grid(days, latitudes, longitudes, parameters)
+
+
+#
+# Location stores
+#
+def _store_csv(count):
+    """Write a reproducible locations file with mixed methods and zones."""
+    rng = random.Random(0)
+    lines = ['id,latitude,longitude,method,timezone_offset']
+    for site_id, (latitude, longitude) in enumerate(_locations(count)):
+        lines.append('%d,%.4f,%.4f,%s,%s' % (
+            site_id, latitude, longitude, rng.choice(STORE_METHODS),
+            rng.choice(STORE_TIMEZONES)
+        ))
+    return '\n'.join(lines) + '\n'
+
+
+@benchmark('store.load_csv')
+def _store_load_csv():
+    text = _store_csv(STORE_SITES)
+    return lambda: LocationStore.from_csv(io.StringIO(text))
+
+
+@benchmark('store.lookup')
+def _store_lookup():
+    store = LocationStore.from_csv(io.StringIO(_store_csv(STORE_SITES)))
+    site_ids = random.Random(0).sample(range(STORE_SITES), 1000)
+    store.row(0)
+
+    def run():
+        for site_id in site_ids:
+            store.lookup(site_id)
+    return run
+
+
+@benchmark('store.grid')
+def _store_grid():
+    if store_grid is None:
+        return None
+
+    store = LocationStore.from_csv(io.StringIO(_store_csv(STORE_SITES)))
+    return lambda: store_grid([DAY], store)
+
+
+#
+# Shared result cache
+#
+def _warm_shared_cache():
+    """Create a cache holding DAY at AUSTIN.
+
+    The segment is unlinked straight away; this process keeps its mapping.
+    """
+    cache = SharedResultCache(capacity=1024)
+    cache.unlink()
+    cache.get(DAY, AUSTIN, methods.compile_method(_parameters()))
+    return cache
+
+
+@benchmark('shared_cache.get')
+def _shared_cache_get():
+    cache = _warm_shared_cache()
+    plan = methods.compile_method(_parameters())
+    return lambda: cache.get(DAY, AUSTIN, plan)
+
+
+@benchmark('shared_cache.adhan')
+def _shared_cache_adhan():
+    cache = _warm_shared_cache()
+    parameters = _parameters()
+
+    def run():
+        previous = set_result_cache(cache)
+        try:
+            adhan(DAY, AUSTIN, parameters, -6)
+        finally:
+            set_result_cache(previous)
+    return run
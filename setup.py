@@ -32,16 +32,25 @@ setup(
     url='https://github.com/hayalasalah/adhan.py',
     download_url='https://github.com/hayalasalah/adhan.py/releases/tag/0.1',
     packages=['adhan'],
+    python_requires='>=3.9',
     install_requires=requires,
+    extras_require={
+        'batch': ['numpy'],
+    },
+    entry_points={
+        'console_scripts': ['adhan = adhan.cli:main'],
+    },
     include_package_data=True,
     license='LGPL 3.0',
     keywords=['adhan', 'islam', 'muslim', 'religious'],
     classifiers=[
         'License :: OSI Approved :: GNU Lesser General Public License v3 (LGPLv3)',
-        'Programming Language :: Python :: 2.7',
-        'Programming Language :: Python :: 3.2',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
+        'Programming Language :: Python :: 3.12',
         'Topic :: Religion',
     ]
 )
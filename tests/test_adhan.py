@@ -17,9 +17,27 @@ You should have received a copy of the GNU Lesser General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 """
+import math
+
 from datetime import date, datetime
 
-from adhan import adhan, methods
+import pytest
+
+from adhan import adhan, methods, Location, PrayerCalculator
+from adhan.adhan import (
+    LATITUDE_OFFSETS_CACHE,
+    compute_prayer_time,
+    compute_prayer_times,
+    day_latitude_offsets,
+    prayer_times_from_offsets,
+    times_at_angles,
+)
+from adhan.calculations import (
+    compute_time_at_sun_angle,
+    compute_zuhr_utc,
+    solar_ephemeris,
+    time_at_shadow_length,
+)
 
 
 def test_functional_simple():
@@ -66,3 +84,175 @@ def test_functional_simple():
                 expected_time,
                 actual_time
             )
+
+
+def test_prayer_calculator_matches_adhan():
+    """Test that a PrayerCalculator gives the same times as adhan()."""
+    parameters = dict(methods.ISNA, **methods.ASR_HANAFI)
+    calculator = PrayerCalculator((30.25, -97.75), parameters, -6)
+
+    day = date(2015, 12, 22)
+    assert calculator.times(day) == \
+        adhan(day, (30.25, -97.75), parameters, -6)
+
+
+def test_prayer_calculator_range():
+    """Test that times_range covers every day up to and including the end."""
+    calculator = PrayerCalculator(Location(21.42, 39.83), methods.MAKKAH, 3)
+
+    result = list(calculator.times_range(date(2016, 2, 27), date(2016, 3, 1)))
+
+    assert [day for day, _ in result] == [
+        date(2016, 2, 27), date(2016, 2, 28), date(2016, 2, 29),
+        date(2016, 3, 1),
+    ]
+    for day, times in result:
+        assert times == adhan(day, (21.42, 39.83), methods.MAKKAH, 3)
+
+
+def test_minutes_output():
+    """Test that minute output converts lazily to the datetime output."""
+    parameters = dict(methods.ISNA, **methods.ASR_STANDARD)
+    day = date(2015, 12, 22)
+
+    expected = adhan(day, (30.25, -97.75), parameters, -6)
+    result = adhan(day, (30.25, -97.75), parameters, -6, output='minutes')
+
+    assert result.day == day
+    assert result.fajr == 6 * 60 + 13
+    assert result.to_datetimes() == expected
+    assert result.to_datetime('isha') == expected['isha']
+    assert result.to_strings()['maghrib'] == \
+        expected['maghrib'].strftime('%H:%M')
+
+
+def test_hours_output():
+    """Test that hour output gives unrounded local fractional hours."""
+    parameters = dict(methods.ISNA, **methods.ASR_STANDARD)
+    day = date(2015, 12, 22)
+
+    expected = adhan(day, (30.25, -97.75), parameters, -6, output='minutes')
+    result = adhan(day, (30.25, -97.75), parameters, -6, output='hours')
+
+    for name in result._fields:
+        hours = getattr(result, name)
+        assert math.ceil(60 * (hours + 6)) - 360 == getattr(expected, name)
+
+
+def test_unknown_output():
+    """Test that an unknown output format is rejected."""
+    with pytest.raises(ValueError):
+        adhan(date(2015, 12, 22), (30.25, -97.75), methods.ISNA,
+              output='json')
+
+
+def test_latitude_offsets_reproduce_prayer_times():
+    """Test that sites sharing a latitude only differ by their Zuhr."""
+    day = date(2015, 12, 22)
+    for parameters in (methods.ISNA, methods.MAKKAH):
+        plan = methods.compile_method(parameters)
+        offsets = day_latitude_offsets(day, 30.25, plan)
+
+        for longitude in (-97.75, -97.7, 12.5):
+            zuhr_time = compute_zuhr_utc(day, longitude, solar_ephemeris(day))
+            assert prayer_times_from_offsets(zuhr_time, offsets, plan) == \
+                compute_prayer_times(day, Location(30.25, longitude), plan)
+
+
+def test_latitude_offsets_are_shared():
+    """Test that nearby latitudes share one cached offset computation."""
+    day = date(2015, 12, 22)
+    plan = methods.compile_method(methods.ISNA)
+    LATITUDE_OFFSETS_CACHE.clear()
+
+    offsets = day_latitude_offsets(day, 30.2501, plan)
+    assert day_latitude_offsets(day, 30.2499, plan) is offsets
+    assert LATITUDE_OFFSETS_CACHE.misses == 1
+    assert LATITUDE_OFFSETS_CACHE.hits == 1
+
+    zuhr_time = compute_zuhr_utc(day, -97.75, solar_ephemeris(day))
+    times = prayer_times_from_offsets(zuhr_time, offsets, plan)
+    expected = compute_prayer_times(day, Location(30.2499, -97.75), plan)
+    for approximate, exact in zip(times, expected):
+        assert abs(approximate - exact) * 3600 < 1
+
+
+def test_high_latitude_rules():
+    """Test that high latitude rules keep Fajr and Isha within the night."""
+    day = date(2016, 6, 21)
+    location = (57.48, -4.22)
+    with pytest.raises(ValueError):
+        adhan(day, location, methods.MUSLIM_WORLD_LEAGUE, output='hours')
+
+    for rule, fraction in [(methods.MIDDLE_OF_NIGHT, 1 / 2),
+                           (methods.ONE_SEVENTH, 1 / 7),
+                           (methods.ANGLE_BASED, 18 / 60)]:
+        parameters = dict(methods.MUSLIM_WORLD_LEAGUE, **rule)
+        times = adhan(day, location, parameters, output='hours')
+
+        night = 24 - (times.maghrib - times.shuruq)
+        assert times.fajr == pytest.approx(times.shuruq - fraction * night)
+        assert times.isha <= times.maghrib + night / 2 + 1e-9
+
+        for name in ('fajr', 'isha'):
+            assert compute_prayer_time(
+                name, day, Location(*location),
+                methods.compile_method(parameters)
+            ) == getattr(times, name)
+
+
+def test_high_latitude_rule_keeps_defined_times():
+    """Test that a rule leaves times close enough to sunrise and sunset."""
+    day = date(2016, 12, 22)
+    parameters = dict(methods.ISNA, **methods.MIDDLE_OF_NIGHT)
+
+    assert adhan(day, (30.25, -97.75), parameters) == \
+        adhan(day, (30.25, -97.75), methods.ISNA)
+
+
+def test_times_at_angles_match_single_events():
+    """Test that every angle and shadow matches its own calculation."""
+    day = date(2016, 3, 20)
+    angles = [18, 15, 12, 6, 0.833]
+    shadows = [1, 2]
+    result = times_at_angles(day, (30.25, -97.75), angles + [-4.5], shadows)
+
+    assert result.zuhr == compute_zuhr_utc(day, -97.75, solar_ephemeris(day))
+    for angle, before, after in zip(angles, result.before, result.after):
+        delta = abs(compute_time_at_sun_angle(day, 30.25, angle))
+        assert before == pytest.approx(result.zuhr - delta, abs=1e-12)
+        assert after == pytest.approx(result.zuhr + delta, abs=1e-12)
+    for multiplier, time in zip(shadows, result.shadows):
+        assert time == pytest.approx(
+            result.zuhr + time_at_shadow_length(day, 30.25, multiplier),
+            abs=1e-12
+        )
+
+    # Negative angles are above the horizon, between sunrise and Zuhr
+    assert result.before[-2] < result.before[-1] < result.zuhr
+    assert result.zuhr < result.after[-1] < result.after[-2]
+
+
+def test_times_at_angles_reproduce_prayer_times():
+    """Test that the method angles give back the prayer times."""
+    day = date(2015, 12, 22)
+    location = Location(30.25, -97.75)
+    plan = methods.compile_method(dict(methods.ISNA, **methods.ASR_STANDARD))
+    times = compute_prayer_times(day, location, plan)
+
+    result = times_at_angles(day, location, [15, 0.833], [1])
+    assert result.before[0] == pytest.approx(times.fajr, abs=1e-12)
+    assert result.before[1] == pytest.approx(times.shuruq, abs=1e-12)
+    assert result.zuhr == times.zuhr
+    assert result.shadows[0] == pytest.approx(times.asr, abs=1e-12)
+    assert result.after[1] == pytest.approx(times.maghrib, abs=1e-12)
+    assert result.after[0] == pytest.approx(times.isha, abs=1e-12)
+
+
+def test_times_at_angles_undefined_events():
+    """Test that events the sun never reaches that day are NaN."""
+    result = times_at_angles(date(2016, 6, 21), (57.48, -4.22), [18, 0.833])
+
+    assert math.isnan(result.before[0]) and math.isnan(result.after[0])
+    assert not math.isnan(result.before[1])
+    assert len(result.shadows) == 0
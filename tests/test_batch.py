@@ -0,0 +1,181 @@
+"""
+test_batch.py - tests the vectorized adhan calculations.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+import math
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from adhan import Location, adhan, calculations, methods
+from adhan.adhan import compute_prayer_time
+from adhan.store import LocationStore
+
+np = pytest.importorskip('numpy')
+batch = pytest.importorskip('adhan.batch')
+
+LOCATIONS = [
+    (30.25, -97.75),    # Austin
+    (21.42, 39.83),     # Makkah
+    (-33.87, 151.21),   # Sydney
+    (40.71, -74.01),    # New York
+    (0.0, 0.0),
+]
+
+DAYS = [date(2016, 1, 1) + timedelta(days=i) for i in range(0, 366, 7)]
+
+
+def test_grid_shape():
+    """Test that the grid has a row per day and a column per location."""
+    latitudes, longitudes = zip(*LOCATIONS)
+
+    result = batch.adhan_grid(DAYS, latitudes, longitudes, methods.ISNA)
+
+    assert result.shape == (len(DAYS), len(LOCATIONS)), \
+        'unexpected shape %s' % (result.shape,)
+    assert result.dtype.names == batch.PRAYERS
+
+
+def test_grid_matches_scalar():
+    """Test that every grid entry matches adhan.adhan to the minute."""
+    latitudes, longitudes = zip(*LOCATIONS)
+
+    for method in (methods.ISNA, methods.MAKKAH, methods.EGYPT):
+        parameters = {}
+        parameters.update(method)
+        parameters.update(methods.ASR_HANAFI)
+
+        result = batch.adhan_grid(
+            DAYS, latitudes, longitudes, parameters, timezone_offset=-6
+        )
+
+        for i, day in enumerate(DAYS):
+            midnight = datetime(day.year, day.month, day.day)
+            for j, location in enumerate(LOCATIONS):
+                expected = adhan(day, location, parameters, -6)
+                for name in batch.PRAYERS:
+                    actual = midnight + timedelta(
+                        minutes=int(result[i, j][name])
+                    )
+                    assert actual == expected[name], \
+                        '%s on %s at %s: expected %s, actual %s' % (
+                            name, day, location, expected[name], actual
+                        )
+
+
+def test_grid_undefined_prayers():
+    """Test that prayers adhan() can't compute are marked, not raised."""
+    days = [date(2016, 6, 21), date(2016, 12, 21)]
+    latitudes, longitudes = [69.65, 65.0, 30.25], [18.96, 25.0, -97.75]
+    plan = methods.compile_method(methods.MUSLIM_WORLD_LEAGUE)
+
+    minutes = batch.adhan_grid(days, latitudes, longitudes, plan)
+    hours = batch.adhan_grid(days, latitudes, longitudes, plan,
+                             output='hours')
+
+    undefined = 0
+    for i, day in enumerate(days):
+        for j, location in enumerate(zip(latitudes, longitudes)):
+            for name in batch.PRAYERS:
+                try:
+                    expected = compute_prayer_time(
+                        name, day, Location(*location), plan
+                    )
+                except ValueError:
+                    undefined += 1
+                    assert minutes[i, j][name] == batch.UNDEFINED_MINUTES
+                    assert np.isnan(hours[i, j][name])
+                    continue
+                assert minutes[i, j][name] == math.ceil(60 * expected)
+                assert hours[i, j][name] == expected
+
+    assert undefined
+
+
+def test_grid_high_latitude_rule():
+    """Test that a rule replaces undefined times without raising."""
+    days = [date(2016, 1, 1) + timedelta(days=i) for i in range(366)]
+    latitudes, longitudes = [57.48, 30.25, 60.17], [-4.22, -97.75, 24.94]
+
+    for rule in (methods.MIDDLE_OF_NIGHT, methods.ONE_SEVENTH,
+                 methods.ANGLE_BASED):
+        for method in (methods.MUSLIM_WORLD_LEAGUE, methods.MAKKAH):
+            parameters = dict(method, **rule)
+            result = batch.adhan_grid(days, latitudes, longitudes,
+                                      parameters)
+
+            for i in range(0, len(days), 5):
+                for j, location in enumerate(zip(latitudes, longitudes)):
+                    expected = adhan(days[i], location, parameters,
+                                     output='minutes')
+                    assert tuple(result[i, j]) == expected[1:]
+
+
+def test_grid_hours_output():
+    """Test that hour output matches the scalar fractional hours."""
+    latitudes, longitudes = zip(*LOCATIONS)
+
+    result = batch.adhan_grid(DAYS, latitudes, longitudes, methods.ISNA, 3,
+                              output='hours')
+
+    assert result.dtype == batch.HOURS_DTYPE
+    for i, day in enumerate(DAYS):
+        for j, location in enumerate(LOCATIONS):
+            expected = adhan(day, location, methods.ISNA, 3, output='hours')
+            assert np.allclose(tuple(result[i, j]), expected, atol=1e-9)
+
+
+def test_grid_solar_backend():
+    """Test that the grid follows the selected solar backend."""
+    latitudes, longitudes = zip(*LOCATIONS)
+    parameters = dict(methods.ISNA, **methods.ASR_STANDARD)
+
+    try:
+        calculations.set_solar_backend('noaa')
+        result = batch.adhan_grid(DAYS, latitudes, longitudes, parameters)
+
+        for i, day in enumerate(DAYS):
+            for j, location in enumerate(LOCATIONS):
+                expected = adhan(day, location, parameters, output='minutes')
+                assert tuple(result[i, j]) == expected[1:]
+    finally:
+        calculations.set_solar_backend('spencer')
+
+
+def test_store_grid_matches_scalar():
+    """Test that a store's sites each get their own method and offset."""
+    store = LocationStore()
+    for site_id, (latitude, longitude) in enumerate(LOCATIONS):
+        store.add(site_id, latitude, longitude,
+                  ('isna', 'makkah:hanafi')[site_id % 2], site_id - 2)
+
+    result = batch.store_grid(DAYS, store)
+
+    assert result.shape == (len(DAYS), len(store))
+    for j in range(len(store)):
+        site = store.site(j)
+        for i, day in enumerate(DAYS):
+            expected = adhan(day, (site.latitude, site.longitude),
+                             site.parameters, site.timezone_offset,
+                             output='minutes')
+            assert tuple(result[i, j]) == tuple(expected[1:])
+
+    store.add(len(store), 0.0, 0.0, 'isna', 'UTC')
+    with pytest.raises(ValueError):
+        batch.store_grid(DAYS, store)
@@ -0,0 +1,58 @@
+"""
+test_benchmarks.py - tests the benchmark runner.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+from benchmarks import bench_fitted, run
+from benchmarks.suite import BENCHMARKS
+
+
+def test_every_benchmark_runs():
+    """Test that every registered benchmark can be set up and called."""
+    for factory in BENCHMARKS.values():
+        func = factory()
+        if func is not None:
+            func()
+
+
+def test_run_benchmarks_filter():
+    """Test that a pattern selects benchmarks and statistics are reported."""
+    results = run.run_benchmarks('^method\\.isna$', min_time=0, repeat=2)
+
+    assert list(results) == ['method.isna']
+    assert results['method.isna']['repeat'] == 2
+    assert 0 < results['method.isna']['min'] <= \
+        results['method.isna']['median']
+
+
+def test_compare_flags_regressions():
+    """Test that only slowdowns beyond the threshold count as regressions."""
+    baseline = {'a': {'min': 1.0}, 'b': {'min': 1.0}, 'c': {'min': 1.0}}
+    results = {'a': {'min': 1.05}, 'b': {'min': 1.5}, 'd': {'min': 1.0}}
+
+    rows = run.compare(results, baseline, threshold=0.1)
+
+    assert [(name, regressed) for name, _, _, _, regressed in rows] == [
+        ('a', False), ('b', True),
+    ]
+
+
+def test_fitted_lookup_is_faster():
+    """Test that a fitted lookup beats calculating the day."""
+    fitted, exact = bench_fitted.compare_fitted(min_time=0.02, repeat=3)
+
+    assert fitted < exact
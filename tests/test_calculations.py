@@ -18,8 +18,9 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 """
 from datetime import date
+from math import cos, radians, sin
 
-from mock import patch
+from unittest.mock import patch
 
 from adhan import calculations
 
@@ -161,3 +162,120 @@ def test_time_at_shadow_length(mock_declination):
     expected = 3.622
     assert _is_close(result, expected, 0.05), \
         "%.07f is not %.07f" % (result, expected)
+
+
+def test_ephemeris_matches_formulas():
+    """Test that an Ephemeris holds the same terms as the free functions."""
+    test_date = date(2015, 5, 12)
+
+    ephemeris = calculations.compute_ephemeris(test_date)
+    declination = radians(calculations.sun_declination(test_date))
+
+    assert ephemeris.declination == declination
+    assert ephemeris.sin_declination == sin(declination)
+    assert ephemeris.cos_declination == cos(declination)
+    assert ephemeris.equation_of_time == \
+        calculations.equation_of_time(test_date)
+
+
+def test_ephemeris_cache_counts_hits():
+    """Test that the ephemeris cache computes each day only once."""
+    cache = calculations.EphemerisCache(maxsize=4)
+
+    first = cache.get(date(2015, 5, 12))
+    second = cache.get(date(2015, 5, 12))
+
+    assert first is second
+    assert (cache.hits, cache.misses) == (1, 1), cache.info()
+
+
+def test_ephemeris_cache_is_bounded():
+    """Test that the least recently used day is evicted when full."""
+    cache = calculations.EphemerisCache(maxsize=2)
+
+    cache.get(date(2015, 5, 12))
+    cache.get(date(2015, 5, 13))
+    cache.get(date(2015, 5, 12))
+    cache.get(date(2015, 5, 14))
+
+    assert len(cache) == 2
+    cache.get(date(2015, 5, 12))
+    assert cache.misses == 3, cache.info()
+    cache.get(date(2015, 5, 13))
+    assert cache.misses == 4, cache.info()
+
+
+def test_noaa_solar_position():
+    """Test the NOAA model against the sun's position at the solstices."""
+    summer = calculations.noaa_solar_position(
+        calculations.gregorian_to_julian(date(2016, 6, 21))
+    )
+    winter = calculations.noaa_solar_position(
+        calculations.gregorian_to_julian(date(2016, 12, 21))
+    )
+
+    assert _is_close(summer.declination, radians(23.43), 0.001)
+    assert _is_close(winter.declination, radians(-23.43), 0.001)
+    # Equation of Time in hours: about -1.9 and +1.7 minutes
+    assert _is_close(summer.equation_of_time * 60, -1.89, 0.05)
+    assert _is_close(winter.equation_of_time * 60, 1.69, 0.05)
+
+
+def test_set_solar_backend():
+    """Test that switching backends changes results and clears the cache."""
+    day = date(2016, 11, 3)
+    spencer = calculations.solar_ephemeris(day)
+
+    try:
+        calculations.set_solar_backend('noaa')
+        assert len(calculations.EPHEMERIS_CACHE) == 0
+        assert calculations.solar_backend().name == 'noaa'
+
+        noaa = calculations.solar_ephemeris(day)
+        assert noaa != spencer
+        assert noaa == calculations.noaa_solar_position(
+            calculations.gregorian_to_julian(day)
+        )
+    finally:
+        calculations.set_solar_backend('spencer')
+
+    assert calculations.solar_ephemeris(day) == spencer
+
+
+def test_set_unknown_solar_backend():
+    """Test that an unknown backend name is rejected."""
+    try:
+        calculations.set_solar_backend('ptolemy')
+    except ValueError:
+        pass
+    else:
+        assert False, 'expected a ValueError'
+    assert calculations.solar_backend().name == 'spencer'
+
+
+def test_ephemeris_at_needs_day_of_year_backend():
+    """Test that compute_ephemeris_at refuses backends that need dates."""
+    try:
+        calculations.set_solar_backend('noaa')
+        calculations.compute_ephemeris_at(0)
+    except ValueError:
+        pass
+    else:
+        assert False, 'expected a ValueError'
+    finally:
+        calculations.set_solar_backend('spencer')
+
+
+def test_spencer_tables_match_formulas():
+    """Test that the lookup tables hold the formulas for every day."""
+    tables = calculations.spencer_tables()
+
+    assert tables is calculations.spencer_tables()
+    for day_index in range(calculations.DAYS_PER_TABLE):
+        declination = calculations.spencer_declination(day_index)
+        assert calculations.sun_declination_at(day_index) == declination
+        assert tables.declination[day_index] == radians(declination)
+        assert tables.sin_declination[day_index] == sin(radians(declination))
+        assert tables.cos_declination[day_index] == cos(radians(declination))
+        assert calculations.equation_of_time_at(day_index) == \
+            calculations.spencer_equation_of_time(day_index)
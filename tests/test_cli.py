@@ -0,0 +1,142 @@
+"""
+test_cli.py - tests the command line timetable generator.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+import csv
+import json
+
+from datetime import date
+
+import pytest
+
+from adhan import adhan, methods
+from adhan.cli import main
+from adhan.timetable import TimetableFile
+
+AUSTIN = (30.25, -97.75)
+NEW_YORK = (40.71, -74.01)
+
+
+def _clock(time):
+    """Format a datetime like the command line output."""
+    return time.strftime('%H:%M')
+
+
+def test_csv_output(tmpdir):
+    """Test that CSV rows match adhan() for every location and day."""
+    locations = tmpdir.join('locations.csv')
+    locations.write('id,latitude,longitude,method,timezone_offset\n'
+                    '1,30.25,-97.75,,-6\n'
+                    '2,40.71,-74.01,makkah:hanafi,America/New_York\n')
+    output = tmpdir.join('out.csv')
+
+    assert main(['--locations', str(locations), '-m', 'karachi',
+                 '--asr', 'hanafi', '-s', '2016-03-12', '-e', '2016-03-14',
+                 '-o', str(output), '-j', '1']) == 0
+
+    lines = output.read().splitlines()
+    assert lines[0] == 'location,date,fajr,shuruq,zuhr,asr,maghrib,isha'
+    assert len(lines) == 1 + 2 * 3
+    assert lines[4].startswith('2,2016-03-12,')
+
+    for line, location, parameters, timezone_offset in (
+            (lines[2], AUSTIN, methods.KARACHI, -6),
+            (lines[5], NEW_YORK, methods.MAKKAH, 'America/New_York')):
+        times = adhan(date(2016, 3, 13), location,
+                      dict(parameters, **methods.ASR_HANAFI), timezone_offset)
+        assert line.split(',')[2:] == [
+            _clock(times[name]) for name in
+            ('fajr', 'shuruq', 'zuhr', 'asr', 'maghrib', 'isha')
+        ]
+
+
+def test_bad_locations_file(tmpdir, capsys):
+    """Test that an invalid locations file is a usage error with its line."""
+    locations = tmpdir.join('locations.csv')
+    locations.write('id,latitude,longitude,method\n1,30.25,-97.75,sideways\n')
+
+    with pytest.raises(SystemExit) as error:
+        main(['--locations', str(locations), '-j', '1'])
+    assert error.value.code == 2
+    assert 'line 2' in capsys.readouterr().err
+
+
+def test_jsonl_output(capsys):
+    """Test that JSON lines go to standard output without --output."""
+    assert main(['-l', '30.25,-97.75', '-s', '2016-01-01', '-e',
+                 '2016-01-02', '-t', '-6', '-f', 'jsonl', '-j', '1']) == 0
+
+    rows = [json.loads(line) for line in capsys.readouterr().out.split('\n')
+            if line]
+    assert [row['date'] for row in rows] == ['2016-01-01', '2016-01-02']
+
+    expected = adhan(date(2016, 1, 2), AUSTIN, methods.ISNA, -6)
+    assert rows[1]['location'] == '30.25,-97.75'
+    assert rows[1]['isha'] == _clock(expected['isha'])
+
+
+def test_binary_output(tmpdir):
+    """Test that binary output writes readable timetable files."""
+    directory = tmpdir.join('timetables')
+
+    assert main(['-l', '30.25,-97.75', '-l', '40.71,-74.01', '-s',
+                 '2016-01-01', '-e', '2016-12-31', '-f', 'binary',
+                 '-o', str(directory), '-j', '2']) == 0
+
+    assert sorted(directory.listdir()) == [
+        directory.join('0.adhan'), directory.join('1.adhan')
+    ]
+    with TimetableFile(str(directory.join('1.adhan'))) as timetable:
+        assert tuple(timetable.location) == NEW_YORK
+        assert len(timetable) == 366
+        assert timetable.lookup(date(2016, 7, 4)).to_datetimes() == \
+            adhan(date(2016, 7, 4), NEW_YORK, methods.ISNA)
+
+
+@pytest.mark.parametrize('location', [
+    ['-l', '-33.87,151.21'],
+    ['--location', '-33.87,151.21'],
+    ['-l=-33.87,151.21'],
+    ['--location=-33.87,151.21'],
+])
+def test_negative_location(capsys, location):
+    """Test that a location starting with a minus sign is a value."""
+    assert main(location + ['-s', '2016-01-01', '-t', 'Australia/Sydney',
+                            '-j', '1']) == 0
+
+    expected = adhan(date(2016, 1, 1), (-33.87, 151.21), methods.ISNA,
+                     'Australia/Sydney')
+    row = list(csv.reader(capsys.readouterr().out.splitlines()))[1]
+    assert row[:2] == ['-33.87,151.21', '2016-01-01']
+    assert row[-1] == _clock(expected['isha'])
+
+
+@pytest.mark.parametrize('arguments', [
+    [],
+    ['-l', '30.25,-97.75', '-t', 'Mars/Olympus_Mons'],
+    ['-l', '69.65,18.96', '-s', '2016-06-21', '-m', 'muslim_world_league'],
+    ['-l', '30.25'],
+    ['-l', '30.25,-97.75', '-f', 'binary'],
+    ['-l', '30.25,-97.75', '-s', '2016-01-02', '-e', '2016-01-01'],
+    ['-l', '30.25,-97.75', '-m', 'unknown'],
+])
+def test_bad_arguments(arguments):
+    """Test that invalid arguments exit with a usage error."""
+    with pytest.raises(SystemExit) as error:
+        main(arguments)
+    assert error.value.code == 2
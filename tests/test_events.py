@@ -0,0 +1,171 @@
+"""
+test_events.py - tests cross-site prayer event indexes.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+import random
+
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from adhan import adhan, methods
+from adhan.adhan import PrayerTimes
+from adhan.events import EventIndex
+
+PARAMETERS = dict(methods.ISNA, **methods.ASR_STANDARD)
+
+DAY = date(2016, 6, 21)
+
+
+def _sites(count):
+    """Generate reproducible random sites with a mix of methods."""
+    rng = random.Random(0)
+    hanafi = dict(methods.MAKKAH, **methods.ASR_HANAFI)
+    return [
+        ((rng.uniform(-45, 45), rng.uniform(-180, 180)),
+         PARAMETERS if i % 3 else hanafi)
+        for i in range(count)
+    ]
+
+
+def _all_events(sites, days):
+    """Compute every event of the sites on the days with adhan()."""
+    events = []
+    for day in days:
+        midnight = datetime(day.year, day.month, day.day)
+        for site, (location, parameters) in enumerate(sites):
+            row = adhan(day, location, parameters, output='minutes')
+            for name, minutes in zip(row._fields[1:], row[1:]):
+                events.append(
+                    (midnight + timedelta(minutes=minutes), name, site)
+                )
+    return events
+
+
+def _expected_window(sites, start, end, prayers=None):
+    """Brute force the events in a window, in the index's order."""
+    days = [DAY + timedelta(days=offset) for offset in range(-1, 4)]
+    return sorted(
+        (
+            event for event in _all_events(sites, days)
+            if start <= event[0] < end and
+            (prayers is None or event[1] in prayers)
+        ),
+        key=lambda event: (event[0], PrayerTimes._fields.index(event[1]),
+                           event[2])
+    )
+
+
+def test_window_matches_adhan():
+    """Test that a window holds exactly the events adhan() gives in it."""
+    sites = _sites(200)
+    index = EventIndex(sites, DAY)
+    start = datetime(2016, 6, 21, 18, 0)
+    end = start + timedelta(hours=1)
+
+    found = index.window(start, end)
+
+    assert found
+    assert [tuple(event) for event in found] == \
+        _expected_window(sites, start, end)
+
+
+def test_window_of_some_prayers():
+    """Test restricting a window to some prayers."""
+    sites = _sites(200)
+    index = EventIndex(sites, DAY)
+    start = datetime(2016, 6, 22, 1, 0)
+    end = start + timedelta(minutes=10)
+
+    found = index.window(start, end, ['maghrib'])
+
+    assert [tuple(event) for event in found] == \
+        _expected_window(sites, start, end, ['maghrib'])
+
+
+def test_next_events():
+    """Test that the next events are the earliest ones after a moment."""
+    sites = _sites(200)
+    index = EventIndex(sites, DAY)
+    when = datetime(2016, 6, 21, 23, 57)
+
+    found = index.next_events(when, 25)
+
+    expected = _expected_window(sites, when + timedelta(seconds=1),
+                                datetime(2016, 6, 23))
+    assert [tuple(event) for event in found] == expected[:25]
+
+
+def test_next_events_aware_datetime():
+    """Test that aware datetimes are converted to UTC."""
+    index = EventIndex(_sites(50), DAY)
+    when = datetime(2016, 6, 21, 20, 0)
+    aware = when.replace(tzinfo=timezone(timedelta(hours=3))) + \
+        timedelta(hours=3)
+
+    assert index.next_events(aware, 5) == index.next_events(when, 5)
+
+
+def test_advance_matches_fresh_index():
+    """Test that advancing computes the same index as building anew."""
+    sites = _sites(100)
+    index = EventIndex(sites, DAY, ['fajr', 'isha'])
+    index.advance()
+    fresh = EventIndex(sites, DAY + timedelta(days=1), ['fajr', 'isha'])
+    start = datetime(2016, 6, 22)
+    end = datetime(2016, 6, 24)
+
+    assert index.day == fresh.day == DAY + timedelta(days=1)
+    assert index.window(start, end) == fresh.window(start, end)
+
+    index.roll_to(DAY + timedelta(days=10))
+    assert index.day == DAY + timedelta(days=10)
+    assert index.covers(datetime(2016, 7, 1, 12, 0))
+    assert not index.covers(start)
+
+
+def test_outside_covered_days():
+    """Test that queries outside the covered days are rejected."""
+    index = EventIndex(_sites(10), DAY)
+
+    with pytest.raises(KeyError):
+        index.next_events(datetime(2016, 6, 23, 0, 0))
+    with pytest.raises(KeyError):
+        index.window(datetime(2016, 6, 20, 23, 0), datetime(2016, 6, 21, 1))
+
+
+def test_undefined_prayers_are_skipped():
+    """Test that a site's undefined prayers have no events."""
+    sites = [((65.0, 25.0), methods.MUSLIM_WORLD_LEAGUE),
+             ((30.25, -97.75), methods.MUSLIM_WORLD_LEAGUE)]
+    index = EventIndex(sites, DAY)
+
+    found = index.window(datetime(2016, 6, 21), datetime(2016, 6, 22))
+
+    assert set(event.site for event in found if event.prayer == 'fajr') == \
+        set([1])
+    assert set(event.site for event in found) == set([0, 1])
+
+
+def test_unknown_prayers():
+    """Test that unknown prayer names are rejected."""
+    with pytest.raises(ValueError):
+        EventIndex(_sites(1), DAY, ['fajr', 'tahajjud'])
+    index = EventIndex(_sites(1), DAY, ['fajr'])
+    with pytest.raises(ValueError):
+        index.window(datetime(2016, 6, 21), datetime(2016, 6, 22), ['isha'])
@@ -0,0 +1,141 @@
+"""
+test_fitted.py - tests yearly fitted prayer times.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from adhan import adhan, Location, methods
+from adhan.adhan import compute_prayer_times
+from adhan.fitted import (
+    FittedCalculator,
+    FittedTimetable,
+    chebyshev_fit,
+    chebyshev_to_power,
+)
+
+PARAMETERS = dict(methods.ISNA, **methods.ASR_STANDARD)
+
+SITES = [
+    (30.25, -97.75),    # Austin
+    (21.42, 39.83),     # Makkah
+    (-33.87, 151.21),   # Sydney
+    (10.0, -179.0),     # Zuhr crosses midnight UTC
+]
+
+DAYS = [date(2016, 1, 1) + timedelta(days=i) for i in range(366)]
+
+
+def _max_error_seconds(fitted, location, parameters):
+    """Find the largest difference from compute_prayer_times in the year."""
+    plan = methods.compile_method(parameters)
+    return max(
+        abs(actual - expected) * 3600
+        for day in DAYS
+        for actual, expected in zip(
+            fitted.prayer_times(day),
+            compute_prayer_times(day, Location(*location), plan),
+        )
+    )
+
+
+def test_chebyshev_fit_is_exact_for_polynomials():
+    """Test that a cubic is fitted and converted back exactly."""
+    values = [1 - 2 * x + 0.5 * x ** 3 for x in
+              [2 * i / 9 - 1 for i in range(10)]]
+
+    power = chebyshev_to_power(chebyshev_fit(values, 3))
+
+    for actual, expected in zip(power, [1, -2, 0, 0.5]):
+        assert abs(actual - expected) < 1e-12
+
+
+@pytest.mark.parametrize('location', SITES)
+def test_fitted_error_is_bounded(location):
+    """Test that every day of the year is within the verified error."""
+    fitted = FittedTimetable(location, PARAMETERS, 2016)
+
+    error = _max_error_seconds(fitted, location, PARAMETERS)
+
+    assert error <= fitted.error + 1e-6 <= fitted.max_error_seconds + 1e-6
+    assert fitted.nbytes < 2048
+
+
+def test_fitted_tighter_bound_needs_more_segments():
+    """Test that a smaller error bound is met with more segments."""
+    loose = FittedTimetable(SITES[0], PARAMETERS, 2016)
+    tight = FittedTimetable(SITES[0], PARAMETERS, 2016, max_error_seconds=1)
+
+    assert tight.segments > loose.segments
+    assert _max_error_seconds(tight, SITES[0], PARAMETERS) <= 1
+
+
+def test_fitted_high_latitude_rule():
+    """Test fitting where a high latitude rule takes over in the summer."""
+    location = (57.48, -4.22)
+    parameters = dict(methods.MUSLIM_WORLD_LEAGUE, **methods.ANGLE_BASED)
+
+    fitted = FittedTimetable(location, parameters, 2016)
+
+    assert _max_error_seconds(fitted, location, parameters) <= 30
+
+
+def test_fitted_minutes_match_adhan():
+    """Test that rounded times are at most a minute from adhan()."""
+    parameters = dict(methods.MAKKAH, **methods.ASR_HANAFI)
+    fitted = FittedTimetable(SITES[1], parameters, 2016)
+
+    for day in DAYS:
+        actual = fitted.times(day, 3, output='minutes')
+        expected = adhan(day, SITES[1], parameters, 3, output='minutes')
+        assert actual.day == expected.day
+        assert all(abs(a - e) <= 1 for a, e in zip(actual[1:], expected[1:]))
+
+
+def test_fitted_outside_year():
+    """Test that days outside the fitted year are rejected."""
+    fitted = FittedTimetable(SITES[0], PARAMETERS, 2016)
+
+    assert date(2016, 12, 31) in fitted
+    assert date(2017, 1, 1) not in fitted
+    with pytest.raises(KeyError):
+        fitted.prayer_times(date(2017, 1, 1))
+
+
+def test_fitted_undefined_times():
+    """Test that a year with undefined prayer times fails like adhan()."""
+    with pytest.raises(ValueError):
+        FittedTimetable((65.0, 25.0), methods.MUSLIM_WORLD_LEAGUE, 2016)
+
+
+def test_fitted_calculator_fits_each_year_once():
+    """Test that a FittedCalculator keeps the fit of each year it is asked."""
+    calculator = FittedCalculator(SITES[0], PARAMETERS, 'America/Chicago')
+    day = date(2016, 6, 21)
+
+    times = calculator.times(day)
+    fitted = calculator.fitted(2016)
+    calculator.times(day + timedelta(days=1))
+
+    assert calculator.fitted(2016) is fitted
+    assert calculator.fitted(2017) is not fitted
+    expected = adhan(day, SITES[0], PARAMETERS, 'America/Chicago')
+    assert set(times) == set(expected)
+    assert all(abs((times[name] - expected[name]).total_seconds()) <= 60
+               for name in expected)
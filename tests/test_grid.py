@@ -0,0 +1,156 @@
+"""
+test_grid.py - tests precomputed latitude grids.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+import random
+
+from datetime import date, timedelta
+
+import pytest
+
+from adhan import Location, methods
+from adhan.adhan import compute_prayer_times
+from adhan.grid import LatitudeGrid
+from adhan.methods import compile_method
+
+START, END = date(2016, 3, 1), date(2016, 6, 30)
+
+
+@pytest.fixture(scope='module')
+def grid():
+    """A grid for a few months, up to latitudes where Fajr is undefined."""
+    return LatitudeGrid(methods.MUSLIM_WORLD_LEAGUE, START, END, step=0.5,
+                        min_latitude=-55, max_latitude=55)
+
+
+def test_grid_within_max_error(grid):
+    """Test that random points are within the grid's error of the exact."""
+    plan = compile_method(methods.MUSLIM_WORLD_LEAGUE)
+    rng = random.Random(0)
+
+    for _ in range(2000):
+        day = START + timedelta(days=rng.randrange((END - START).days + 1))
+        location = Location(rng.uniform(-55, 55), rng.uniform(-180, 180))
+        try:
+            expected = compute_prayer_times(day, location, plan)
+        except ValueError:
+            with pytest.raises(ValueError):
+                grid.prayer_times(day, *location)
+            continue
+
+        actual = grid.prayer_times(day, *location)
+        for name in expected._fields:
+            error = abs(getattr(expected, name) - getattr(actual, name))
+            assert error * 3600 <= grid.max_error_seconds + 1e-6, \
+                '%s on %s at %s off by %.2fs' % (
+                    name, day, location, error * 3600
+                )
+
+
+@pytest.mark.parametrize('parameters, step', [
+    (methods.ISNA, 0.25),
+    (dict(methods.MUSLIM_WORLD_LEAGUE, **methods.ASR_HANAFI), 1.0),
+    (methods.MAKKAH, 2.0),
+])
+def test_grid_within_max_error_inside_cells(parameters, step):
+    """Test the error bound across each cell, including at Asr's kink."""
+    start, end = date(2016, 3, 15), date(2016, 9, 30)
+    grid = LatitudeGrid(parameters, start, end, step=step,
+                        min_latitude=-30, max_latitude=30)
+    plan = compile_method(parameters)
+
+    _assert_cells_within_max_error(
+        grid, plan, (start, date(2016, 4, 10), date(2016, 6, 21),
+                     date(2016, 9, 20))
+    )
+
+
+@pytest.mark.parametrize('parameters, rule, step', [
+    (methods.MUSLIM_WORLD_LEAGUE, 'angle_based', 0.25),
+    (methods.ISNA, 'one_seventh', 1.0),
+    (methods.TEHRAN, 'one_seventh', 1.0),
+    (methods.MUSLIM_WORLD_LEAGUE, 'middle_of_night', 0.25),
+])
+def test_grid_error_where_rule_caps(parameters, rule, step):
+    """Test the error bound where a high latitude rule starts capping."""
+    parameters = dict(parameters, high_latitude_rule=rule)
+    plan = compile_method(parameters)
+
+    for day in (date(2024, 1, 28), date(2024, 3, 1), date(2024, 6, 17),
+                date(2024, 7, 17), date(2024, 10, 12)):
+        day_grid = LatitudeGrid(parameters, day, day, step=step)
+        _assert_cells_within_max_error(day_grid, plan, (day,))
+
+
+def _assert_cells_within_max_error(cell_grid, plan, days):
+    """Check 15 points inside every cell of the grid on some days."""
+    for day in days:
+        for cell in range(cell_grid.latitude_count - 1):
+            for sample in range(1, 16):
+                latitude = cell_grid.min_latitude + (cell + sample / 16) * \
+                    cell_grid.step
+                expected = compute_prayer_times(day, Location(latitude, 0),
+                                                plan)
+                actual = cell_grid.prayer_times(day, latitude, 0)
+                for name in expected._fields:
+                    error = abs(getattr(expected, name) -
+                                getattr(actual, name))
+                    assert error * 3600 <= cell_grid.max_error_seconds + 1e-6, \
+                        '%s on %s at %.4f off by %.2fs' % (
+                            name, day, latitude, error * 3600
+                        )
+
+
+def test_grid_query_output(grid):
+    """Test that a query returns adhan()'s output formats."""
+    result = grid.query(date(2016, 4, 1), (30.25, -97.75), -6,
+                        output='minutes')
+
+    assert result.day == date(2016, 4, 1)
+    assert set(result.to_datetimes()) == set(result._fields[1:])
+
+
+def test_grid_outside(grid):
+    """Test that days and latitudes outside the grid raise KeyError."""
+    assert (date(2016, 4, 1), 30) in grid
+    assert (date(2016, 7, 1), 30) not in grid
+    with pytest.raises(KeyError):
+        grid.prayer_times(date(2016, 7, 1), 30, 0)
+    with pytest.raises(KeyError):
+        grid.prayer_times(date(2016, 4, 1), 56, 0)
+
+
+def test_grid_save_load(grid, tmpdir):
+    """Test that a saved grid loads back with identical answers."""
+    path = str(tmpdir.join('grid.bin'))
+    grid.save(path)
+
+    loaded = LatitudeGrid.load(path)
+
+    assert (loaded.start, loaded.end) == (START, END)
+    assert loaded.plan == grid.plan
+    assert loaded.max_error_seconds == grid.max_error_seconds
+    for latitude in (-54.9, -20.1, 0, 23.4, 51.7):
+        day = date(2016, 5, 5)
+        try:
+            expected = grid.prayer_times(day, latitude, 10)
+        except ValueError:
+            with pytest.raises(ValueError):
+                loaded.prayer_times(day, latitude, 10)
+            continue
+        assert loaded.prayer_times(day, latitude, 10) == expected
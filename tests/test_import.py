@@ -0,0 +1,83 @@
+"""
+test_import.py - tests that importing the package stays lightweight.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+import adhan
+
+#
+# Generous enough for a slow CI machine, but well below what importing
+# NumPy or asyncio would cost
+#
+IMPORT_TIME_LIMIT = 0.5
+
+HEAVY_MODULES = ('numpy', 'asyncio', 'mmap', 'multiprocessing', 'zoneinfo')
+
+SCRIPT = """
+import sys
+import time
+
+start = time.perf_counter()
+import adhan
+elapsed = time.perf_counter() - start
+
+print(elapsed)
+print(' '.join(sorted(
+    name for name in %r if name in sys.modules
+)))
+""" % (HEAVY_MODULES,)
+
+
+def _run_import():
+    """Import adhan in a fresh interpreter, return time and heavy imports."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(adhan.__file__)))
+    environment = dict(os.environ, PYTHONPATH=root)
+    output = subprocess.check_output(
+        [sys.executable, '-c', SCRIPT], env=environment
+    ).decode()
+    elapsed, modules = output.split('\n', 1)
+    return float(elapsed), modules.split()
+
+
+def test_import_is_lightweight():
+    """Test that importing adhan is quick and skips optional backends."""
+    elapsed, modules = _run_import()
+
+    assert modules == []
+    assert elapsed < IMPORT_TIME_LIMIT, \
+        'import adhan took %.3fs' % elapsed
+
+
+def test_lazy_attributes():
+    """Test that optional backends load on first attribute access."""
+    from adhan import LatitudeGrid, iter_times
+    from adhan.grid import LatitudeGrid as grid_class
+    from adhan.timetable import iter_times as timetable_iter_times
+
+    assert LatitudeGrid is grid_class
+    assert iter_times is timetable_iter_times
+    assert adhan.timetable.TimetableFile is adhan.TimetableFile
+    assert 'PrayerScheduler' in dir(adhan)
+
+    with pytest.raises(AttributeError):
+        adhan.no_such_attribute  # pylint: disable=pointless-statement
@@ -0,0 +1,86 @@
+"""
+test_instrumentation.py - tests the calculation stage counters and timers.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+import sys
+
+from datetime import date
+
+from adhan import adhan, calculations, methods
+from adhan.instrumentation import STAGES, collect, is_enabled
+
+DAY = date(2016, 1, 1)
+AUSTIN = (30.25, -97.75)
+
+
+def _stage_functions():
+    """Return every module attribute bound to a stage function."""
+    bindings = {}
+    for name, module in list(sys.modules.items()):
+        if module is None or name.split('.')[0] != 'adhan':
+            continue
+        for key, value in vars(module).items():
+            if callable(value) and getattr(value, '__name__', None) in \
+                    [attribute for _, attribute in STAGES.values()]:
+                bindings[(name, key)] = value
+    return bindings
+
+
+def test_collect_counts_stages():
+    """Test that each stage is counted and timed while collecting."""
+    calculations.EPHEMERIS_CACHE.clear()
+
+    with collect() as collector:
+        assert is_enabled()
+        for _ in range(3):
+            adhan(DAY, AUSTIN, methods.ISNA, -6)
+
+    result = collector.as_dict()
+    stages = result['stages']
+    assert stages['prayer_times']['calls'] == 3
+    assert stages['hour_angle']['calls'] == 3 * 4
+    assert stages['to_datetime']['calls'] == 3 * 6
+    assert stages['ephemeris']['calls'] == 1
+    assert stages['prayer_times']['seconds'] >= \
+        stages['latitude_offsets']['seconds'] > 0
+    assert 'zone_offsets' not in stages
+
+    assert result['caches']['ephemeris'] == {
+        'hits': 2, 'misses': 1, 'hit_rate': 2 / 3,
+    }
+    assert result['caches']['zone_transitions']['hit_rate'] is None
+
+
+def test_collect_restores_functions():
+    """Test that nothing stays wrapped once collection ends."""
+    before = _stage_functions()
+
+    with collect() as outer:
+        with collect() as inner:
+            adhan(DAY, AUSTIN, methods.ISNA)
+        adhan(DAY, AUSTIN, methods.ISNA)
+        assert _stage_functions() != before
+
+    assert not is_enabled()
+    assert _stage_functions() == before
+
+    assert inner.as_dict()['stages']['prayer_times']['calls'] == 1
+    assert outer.as_dict()['stages']['prayer_times']['calls'] == 2
+
+    adhan(DAY, AUSTIN, methods.ISNA)
+    assert outer.as_dict()['stages']['prayer_times']['calls'] == 2
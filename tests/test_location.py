@@ -0,0 +1,53 @@
+"""
+test_location.py - tests fixed places of interest.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+from math import cos, radians, sin
+
+from adhan.location import Location, as_location
+
+
+def test_location_latitude_terms():
+    """Test that a Location precomputes the sine and cosine of its latitude."""
+    location = Location(30.25, -97.75)
+
+    assert location.latitude_rad == radians(30.25)
+    assert location.sin_latitude == sin(radians(30.25))
+    assert location.cos_latitude == cos(radians(30.25))
+
+
+def test_location_unpacks_like_tuple():
+    """Test that a Location can be used where a coordinate pair is expected."""
+    latitude, longitude = Location(30.25, -97.75)
+
+    assert (latitude, longitude) == (30.25, -97.75)
+    assert Location(30.25, -97.75) == Location(30.25, -97.75)
+    assert len(set([Location(1, 2), Location(1, 2)])) == 1
+
+
+def test_location_has_no_dict():
+    """Test that Locations use slots rather than a per-instance dict."""
+    assert not hasattr(Location(30.25, -97.75), '__dict__')
+
+
+def test_as_location():
+    """Test that pairs are converted and Locations passed through."""
+    location = Location(30.25, -97.75)
+
+    assert as_location(location) is location
+    assert as_location((30.25, -97.75)) == location
@@ -0,0 +1,117 @@
+"""
+test_methods.py - tests the calculation methods and compiled plans.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+from datetime import date
+from math import radians, sin
+
+import pytest
+
+from adhan import adhan, methods
+
+
+def test_compile_method_angles():
+    """Test that a compiled plan holds the sines of the method's angles."""
+    plan = methods.compile_method(methods.MUSLIM_WORLD_LEAGUE)
+
+    assert plan.fajr_angle == 18
+    assert plan.sin_fajr_angle == sin(radians(18))
+    assert plan.sin_isha_angle == sin(radians(17))
+    assert plan.isha_delay is None
+    assert plan.asr_multiplier == methods.ASR_STANDARD['asr_multiplier']
+
+
+def test_compile_method_isha_delay():
+    """Test that a method with an Isha delay compiles to the delay strategy."""
+    plan = methods.compile_method(dict(methods.MAKKAH, **methods.ASR_HANAFI))
+
+    assert plan.isha_delay == 1.5
+    assert plan.isha_angle is None
+    assert plan.asr_multiplier == 2
+
+
+def test_compile_method_high_latitude_rule():
+    """Test that a high latitude rule compiles to portions of the night."""
+    plan = methods.compile_method(dict(methods.ISNA, **methods.ANGLE_BASED))
+    assert plan.high_latitude_rule == 'angle_based'
+    assert plan.fajr_night_portion == plan.isha_night_portion == 15 / 60
+
+    plan = methods.compile_method(dict(methods.MAKKAH, **methods.ONE_SEVENTH))
+    assert plan.fajr_night_portion == 1 / 7
+    assert plan.isha_night_portion is None
+
+    plan = methods.compile_method(methods.ISNA)
+    assert plan.high_latitude_rule is None
+    assert plan.fajr_night_portion is None
+
+
+def test_compile_method_is_idempotent():
+    """Test that compiling a plan returns the plan itself."""
+    plan = methods.compile_method(methods.ISNA)
+
+    assert methods.compile_method(plan) is plan
+
+
+@pytest.mark.parametrize('parameters', [
+    {'isha_angle': 15},
+    {'fajr_angle': 15},
+    {'fajr_angle': 15, 'isha_angle': -15},
+    {'fajr_angle': '15', 'isha_angle': 15},
+    {'fajr_angle': 15, 'isha_angle': 15, 'asr_multiplier': 0},
+    {'fajr_angle': 15, 'isha_angle': 15, 'ishaa_angle': 15},
+    {'fajr_angle': 15, 'isha_angle': 15, 'high_latitude_rule': 'nearest'},
+])
+def test_compile_method_rejects_bad_parameters(parameters):
+    """Test that invalid parameter dicts are rejected up front."""
+    with pytest.raises(ValueError):
+        methods.compile_method(parameters)
+
+
+def test_lenient_compile_method():
+    """Test that implicit compilation keeps what adhan() always accepted."""
+    plan = methods.compile_method(
+        {'fajr_angle': -15, 'isha_angle': 15, 'name': 'ISNA'}, strict=False
+    )
+
+    assert plan == methods.compile_method(methods.ISNA)
+
+    with pytest.raises(ValueError):
+        methods.compile_method({'fajr_angle': 0, 'isha_angle': 15},
+                               strict=False)
+
+
+def test_adhan_ignores_extra_keys():
+    """Test that adhan() ignores keys that are not parameters."""
+    parameters = dict(methods.ISNA, name='ISNA', **methods.ASR_STANDARD)
+
+    expected = adhan(date(2016, 3, 1), (30.25, -97.75), methods.ISNA, -6)
+    actual = adhan(date(2016, 3, 1), (30.25, -97.75), parameters, -6)
+
+    assert actual == expected, '%s != %s' % (actual, expected)
+
+
+def test_adhan_accepts_plan():
+    """Test that adhan gives the same times for a dict and its plan."""
+    parameters = dict(methods.EGYPT, **methods.ASR_HANAFI)
+    plan = methods.compile_method(parameters)
+
+    for location in [(30.25, -97.75), (-33.87, 151.21)]:
+        expected = adhan(date(2016, 3, 1), location, parameters, 2)
+        actual = adhan(date(2016, 3, 1), location, plan, 2)
+
+        assert actual == expected, '%s != %s' % (actual, expected)
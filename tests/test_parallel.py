@@ -0,0 +1,114 @@
+"""
+test_parallel.py - tests building timetables on multiple cores.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+from datetime import date
+
+import pytest
+
+from adhan import Location, calculations, methods
+from adhan.parallel import build_timetables, iter_timetables
+from adhan.store import LocationStore
+from adhan.timetable import iter_times
+
+LOCATIONS = [
+    Location(30.25, -97.75),
+    (21.42, 39.83),
+    (-33.87, 151.21),
+    (40.71, -74.01),
+    (0.0, 0.0),
+]
+
+DATE_RANGE = (date(2016, 12, 1), date(2017, 1, 31))
+
+
+def _expected(location, timezone_offset):
+    """Flatten iter_times rows the way build_timetables lays them out."""
+    result = []
+    for row in iter_times(location, methods.ISNA, DATE_RANGE[0],
+                          DATE_RANGE[1], timezone_offset):
+        result.extend(row[1:])
+    return result
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_build_timetables_matches_iter_times(workers):
+    """Test that every location's array matches its streamed timetable."""
+    offsets = [-6, 3, 10, -5, 0]
+
+    result = build_timetables(
+        LOCATIONS, methods.ISNA, DATE_RANGE, workers=workers,
+        timezone_offset=offsets
+    )
+
+    assert len(result) == len(LOCATIONS)
+    for location, offset, timetable in zip(LOCATIONS, offsets, result):
+        assert list(timetable) == _expected(location, offset), location
+
+
+def test_build_timetables_offset_count():
+    """Test that a mismatched list of timezone offsets is rejected."""
+    with pytest.raises(ValueError):
+        build_timetables(LOCATIONS, methods.ISNA, DATE_RANGE, workers=1,
+                         timezone_offset=[0, 1])
+
+
+def test_iter_timetables_reversed_range():
+    """Test that a range ending before it starts is rejected on the call."""
+    with pytest.raises(ValueError):
+        iter_timetables(LOCATIONS, methods.ISNA,
+                        (DATE_RANGE[1], DATE_RANGE[0]), workers=1)
+
+
+def test_build_timetables_solar_backend():
+    """Test that worker processes use the parent's solar backend."""
+    try:
+        calculations.set_solar_backend('noaa')
+        expected = [_expected(location, 0) for location in LOCATIONS]
+        result = build_timetables(LOCATIONS, methods.ISNA, DATE_RANGE,
+                                  workers=2)
+    finally:
+        calculations.set_solar_backend('spencer')
+
+    assert [list(timetable) for timetable in result] == expected
+    assert expected != [_expected(location, 0) for location in LOCATIONS]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_build_timetables_from_store(workers):
+    """Test that a LocationStore's sites keep their own method and zone."""
+    store = LocationStore()
+    for site_id, location in enumerate(LOCATIONS):
+        latitude, longitude = location
+        store.add(site_id, latitude, longitude,
+                  ('isna', 'egypt:hanafi', 'makkah')[site_id % 3],
+                  (-6, 'America/New_York', 10)[site_id % 3])
+
+    result = build_timetables(store, None, DATE_RANGE, workers=workers)
+
+    for row, timetable in enumerate(result):
+        site = store.site(row)
+        expected = []
+        for times in iter_times((site.latitude, site.longitude),
+                                site.parameters, DATE_RANGE[0], DATE_RANGE[1],
+                                site.timezone_offset):
+            expected.extend(times[1:])
+        assert list(timetable) == expected
+
+    with pytest.raises(ValueError):
+        build_timetables(store, methods.ISNA, DATE_RANGE, workers=1)
@@ -0,0 +1,140 @@
+"""
+test_queries.py - tests finding the prayer nearest to a moment in time.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+import random
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from adhan import adhan, methods
+from adhan.adhan import compute_prayer_time, compute_prayer_times
+from adhan.location import Location
+from adhan.methods import compile_method
+from adhan.queries import next_prayer, previous_prayer
+
+SITES = [
+    ((30.25, -97.75), -6),
+    ((21.42, 39.83), 3),
+    ((-33.87, 151.21), 10),
+    ((-14.0, -171.0), 13),      # far enough from its offset to cross midnight
+]
+
+
+def _all_prayers(location, timezone_offset, day):
+    """List (datetime, name) for every prayer on the days around day."""
+    result = []
+    for delta in (-2, -1, 0, 1, 2):
+        times = adhan(day + timedelta(days=delta), location, methods.MAKKAH,
+                      timezone_offset)
+        result.extend((value, name) for name, value in times.items())
+    return sorted(result)
+
+
+def test_compute_prayer_time_matches_all():
+    """Test that computing one prayer matches computing the whole day."""
+    location = Location(30.25, -97.75)
+    plan = compile_method(dict(methods.MAKKAH, **methods.ASR_HANAFI))
+    day = date(2016, 8, 1)
+
+    times = compute_prayer_times(day, location, plan)
+    for name in times._fields:
+        assert compute_prayer_time(name, day, location, plan) == \
+            getattr(times, name)
+
+
+def test_next_and_previous_prayer():
+    """Test against scanning the full days around random moments."""
+    rng = random.Random(0)
+
+    for location, timezone_offset in SITES:
+        for _ in range(50):
+            when = datetime(2016, 1, 1) + timedelta(
+                minutes=rng.randrange(366 * 1440)
+            )
+            events = _all_prayers(location, timezone_offset, when.date())
+
+            expected_next = min(event for event in events if event[0] > when)
+            expected_previous = max(
+                event for event in events if event[0] <= when
+            )
+
+            name, value = next_prayer(location, methods.MAKKAH, when,
+                                      timezone_offset)
+            assert (value, name) == expected_next, when
+
+            name, value = previous_prayer(location, methods.MAKKAH, when,
+                                          timezone_offset)
+            assert (value, name) == expected_previous, when
+
+
+@pytest.mark.parametrize('day', [date(2016, 3, 13), date(2016, 11, 6)])
+def test_next_and_previous_prayer_in_zone(day):
+    """Test that a zone name gives each prayer its own day's UTC offset."""
+    location = (30.25, -97.75)
+    events = _all_prayers(location, 'America/Chicago', day)
+
+    for hour in range(-12, 36):
+        when = datetime(day.year, day.month, day.day) + timedelta(hours=hour)
+        expected_next = min(
+            (event for event in events
+             if event[0].replace(tzinfo=None) > when),
+            key=lambda event: event[0].replace(tzinfo=None)
+        )
+        expected_previous = max(
+            (event for event in events
+             if event[0].replace(tzinfo=None) <= when),
+            key=lambda event: event[0].replace(tzinfo=None)
+        )
+
+        name, value = next_prayer(location, methods.MAKKAH, when,
+                                  'America/Chicago')
+        assert (value, name) == expected_next, when
+        assert value.utcoffset() == expected_next[0].utcoffset()
+
+        name, value = previous_prayer(location, methods.MAKKAH, when,
+                                      'America/Chicago')
+        assert (value, name) == expected_previous, when
+
+
+def test_next_prayer_at_exact_time():
+    """Test that a prayer happening exactly at when is previous, not next."""
+    times = adhan(date(2016, 5, 1), (30.25, -97.75), methods.ISNA, -6)
+
+    assert next_prayer((30.25, -97.75), methods.ISNA, times['asr'], -6) == \
+        ('maghrib', times['maghrib'])
+    assert previous_prayer((30.25, -97.75), methods.ISNA, times['asr'],
+                           -6) == ('asr', times['asr'])
+
+
+def test_next_prayer_subset_crosses_midnight():
+    """Test that restricting the prayers skips to the next day's Fajr."""
+    times = adhan(date(2016, 5, 2), (30.25, -97.75), methods.ISNA, -6)
+
+    result = next_prayer((30.25, -97.75), methods.ISNA,
+                         datetime(2016, 5, 1, 21, 0), -6, prayers=('fajr',))
+
+    assert result == ('fajr', times['fajr'])
+
+
+def test_unknown_prayer():
+    """Test that unknown prayer names are rejected."""
+    with pytest.raises(ValueError):
+        next_prayer((30.25, -97.75), methods.ISNA, datetime(2016, 5, 1),
+                    prayers=('tahajjud',))
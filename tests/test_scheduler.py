@@ -0,0 +1,178 @@
+"""
+test_scheduler.py - tests the asyncio prayer time scheduler.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+import asyncio
+import time
+
+from datetime import datetime
+
+import pytest
+
+from adhan import adhan, methods
+from adhan.scheduler import PrayerScheduler
+
+START = (datetime(2016, 5, 1, 12, 0) - datetime(1970, 1, 1)).total_seconds()
+
+
+class FakeClock:
+    """A settable clock for driving the scheduler in tests."""
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_subscribers_are_grouped():
+    """Test that identical subscriptions share a group."""
+    scheduler = PrayerScheduler(clock=FakeClock(START))
+
+    scheduler.subscribe('a', (30.25, -97.75), methods.ISNA, -6)
+    scheduler.subscribe('b', (30.25, -97.75), dict(methods.ISNA), -6)
+    scheduler.subscribe('c', (30.25, -97.75), methods.ISNA, -5)
+
+    assert len(scheduler) == 3
+    assert scheduler.group_count == 2
+
+
+def test_events_follow_prayer_times():
+    """Test that due events come out in order at adhan()'s times."""
+    clock = FakeClock(START)
+    scheduler = PrayerScheduler(clock=clock)
+    scheduler.subscribe('austin', (30.25, -97.75), methods.ISNA, -6)
+    scheduler.subscribe('makkah', (21.42, 39.83), methods.MAKKAH, 3)
+
+    assert scheduler.pop_due() is None
+
+    clock.now = START + 2 * 86400
+    events = []
+    while True:
+        event = scheduler.pop_due()
+        if event is None:
+            break
+        events.append(event)
+
+    timestamps = [event.timestamp for event in events]
+    assert timestamps == sorted(timestamps)
+    assert START < timestamps[0] and timestamps[-1] <= clock.now
+
+    for event in events:
+        (subscriber,) = event.subscribers
+        location, parameters, offset = {
+            'austin': ((30.25, -97.75), methods.ISNA, -6),
+            'makkah': ((21.42, 39.83), methods.MAKKAH, 3),
+        }[subscriber]
+        expected = adhan(event.day, location, parameters, offset)
+        assert expected[event.name] == event.time, event
+
+
+def test_events_in_zone():
+    """Test a zone name across the switch to daylight saving time."""
+    start = (datetime(2016, 3, 12, 12, 0) - datetime(1970, 1, 1)) \
+        .total_seconds()
+    clock = FakeClock(start)
+    scheduler = PrayerScheduler(clock=clock)
+    scheduler.subscribe('austin', (30.25, -97.75), methods.ISNA,
+                        'America/Chicago')
+
+    clock.now = start + 2 * 86400
+    event = scheduler.pop_due()
+    offsets = set()
+    while event is not None:
+        expected = adhan(event.day, (30.25, -97.75), methods.ISNA,
+                         'America/Chicago')[event.name]
+        assert event.time == expected, event
+        assert event.time.utcoffset() == expected.utcoffset(), event
+        assert event.timestamp == expected.timestamp(), event
+        offsets.add(event.time.utcoffset())
+        event = scheduler.pop_due()
+
+    assert len(offsets) == 2
+
+
+def test_unsubscribe_stops_events():
+    """Test that a group whose subscribers all left fires no more events."""
+    clock = FakeClock(START)
+    scheduler = PrayerScheduler(clock=clock)
+    scheduler.subscribe('a', (30.25, -97.75), methods.ISNA, -6)
+    scheduler.subscribe('b', (30.25, -97.75), methods.ISNA, -6)
+    scheduler.subscribe('c', (21.42, 39.83), methods.MAKKAH, 3)
+
+    scheduler.unsubscribe('a')
+    scheduler.unsubscribe('c')
+    scheduler.unsubscribe('missing')
+
+    clock.now = START + 86400
+    event = scheduler.pop_due()
+    assert event.subscribers == frozenset(['b'])
+    while event is not None:
+        assert event.subscribers == frozenset(['b'])
+        event = scheduler.pop_due()
+
+
+def test_next_event_waits():
+    """Test that next_event sleeps until the next prayer and delivers it."""
+    scheduler = PrayerScheduler(clock=FakeClock(START))
+    scheduler.subscribe('austin', (30.25, -97.75), methods.ISNA, -6)
+    first = scheduler._peek()[0]    # pylint: disable=protected-access
+
+    #
+    # Run the clock from just before the first prayer in real time
+    #
+    origin = time.time()
+    scheduler.clock = lambda: first - 0.05 + (time.time() - origin)
+
+    received = []
+
+    async def main():
+        scheduler.callback = received.append
+        try:
+            await asyncio.wait_for(scheduler.run(), 0.5)
+        except asyncio.TimeoutError:
+            pass
+
+    asyncio.run(main())
+
+    assert [event.timestamp for event in received] == [first]
+    assert time.time() - origin >= 0.05
+
+
+def test_unsubscribe_compacts_heap():
+    """Test that churning subscriptions doesn't grow the heap forever."""
+    scheduler = PrayerScheduler(clock=FakeClock(START))
+    scheduler.subscribe('austin', (30.25, -97.75), methods.ISNA, -6)
+
+    for i in range(100):
+        scheduler.subscribe(i, (i / 10, 0), methods.ISNA)
+        scheduler.unsubscribe(i)
+
+    heap = scheduler._heap      # pylint: disable=protected-access
+    assert len(heap) <= 2 * scheduler.group_count
+    assert scheduler.pop_due(START + 86400).subscribers == \
+        frozenset(['austin'])
+
+
+def test_run_without_callback():
+    """Test that run() without a callback is rejected before waiting."""
+    scheduler = PrayerScheduler(clock=FakeClock(START))
+    scheduler.subscribe('austin', (30.25, -97.75), methods.ISNA, -6)
+
+    with pytest.raises(ValueError):
+        asyncio.run(scheduler.run())
@@ -0,0 +1,149 @@
+"""
+test_sharedcache.py - tests the prayer time cache in shared memory.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+import multiprocessing
+import sys
+
+from datetime import date, timedelta
+
+import pytest
+
+from adhan import adhan, methods
+from adhan.adhan import result_cache, set_result_cache
+from adhan.methods import compile_method
+from adhan.sharedcache import CHECKSUM_OFFSET, HEADER, SLOT, SharedResultCache
+
+PARAMETERS = dict(methods.ISNA, **methods.ASR_STANDARD)
+
+LOCATIONS = [
+    (30.25, -97.75),
+    (21.42, 39.83),
+    (-33.87, 151.21),
+]
+
+DAYS = [date(2016, 3, 1) + timedelta(days=i) for i in range(0, 120, 3)]
+
+
+@pytest.fixture
+def cache():
+    """Create a small cache, destroyed after the test."""
+    cache = SharedResultCache(capacity=64)
+    yield cache
+    set_result_cache(None)
+    cache.close()
+    cache.unlink()
+
+
+def test_adhan_with_cache(cache):
+    """Test that adhan() gives the same results through the cache."""
+    cases = [
+        (day, location, timezone_offset, output)
+        for day in DAYS[:4] for location in LOCATIONS
+        for timezone_offset in (-6, 5.5, 'America/Chicago')
+        for output in ('datetime', 'minutes', 'hours')
+    ]
+    expected = [adhan(day, location, PARAMETERS, offset, output)
+                for day, location, offset, output in cases]
+
+    assert set_result_cache(cache) is None
+    assert result_cache() is cache
+    for _ in range(2):
+        assert [adhan(day, location, PARAMETERS, offset, output)
+                for day, location, offset, output in cases] == expected
+
+    # 'hours' is unrounded, so it never goes through the cache
+    lookups = 2 * len(cases) * 2 // 3
+    assert cache.misses == len(DAYS[:4]) * len(LOCATIONS)
+    assert cache.hits == lookups - cache.misses
+
+
+def test_eviction_keeps_results_correct(cache):
+    """Test that a full cache evicts entries and stays correct."""
+    plan = compile_method(PARAMETERS)
+    keys = [(day, location) for day in DAYS for location in LOCATIONS]
+    assert len(keys) > cache.capacity
+
+    expected = [
+        tuple(adhan(day, location, plan, output='minutes')[1:])
+        for day, location in keys
+    ]
+    for _ in range(3):
+        assert [cache.get(day, location, plan)
+                for day, location in keys] == expected
+
+    # The most recent entry is still there
+    hits = cache.hits
+    cache.get(keys[-1][0], keys[-1][1], plan)
+    assert cache.hits == hits + 1
+
+
+def test_torn_slot_is_a_miss(cache):
+    """Test that a slot failing its checksum is recomputed."""
+    plan = compile_method(PARAMETERS)
+    expected = cache.get(DAYS[0], LOCATIONS[0], plan)
+
+    buffer = cache._buffer
+    for slot in range(cache.capacity):
+        offset = HEADER.size + slot * SLOT.size
+        if SLOT.unpack_from(buffer, offset)[0]:
+            buffer[offset + CHECKSUM_OFFSET - 1] ^= 0xff
+    assert cache.get(DAYS[0], LOCATIONS[0], plan) == expected
+    assert cache.misses == 2
+
+    assert cache.get(DAYS[0], LOCATIONS[0], plan) == expected
+    assert cache.hits == 1
+
+
+def _fill(name, day, location):
+    """Compute a day in another process through the cache it attaches to."""
+    cache = SharedResultCache(name=name, create=False)
+    try:
+        cache.get(day, location, compile_method(PARAMETERS))
+    finally:
+        cache.close()
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='needs fork')
+def test_shared_between_processes(cache):
+    """Test that a day computed by one process is a hit in another."""
+    process = multiprocessing.get_context('fork').Process(
+        target=_fill, args=(cache.name, DAYS[0], LOCATIONS[1])
+    )
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+
+    minutes = cache.get(DAYS[0], LOCATIONS[1], compile_method(PARAMETERS))
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert minutes == tuple(
+        adhan(DAYS[0], LOCATIONS[1], PARAMETERS, output='minutes')[1:]
+    )
+
+
+def test_attach_to_other_segment():
+    """Test that attaching to a segment that is not a cache fails."""
+    from multiprocessing import shared_memory
+
+    memory = shared_memory.SharedMemory(create=True, size=4096)
+    try:
+        with pytest.raises(ValueError):
+            SharedResultCache(name=memory.name, create=False)
+    finally:
+        memory.close()
+        memory.unlink()
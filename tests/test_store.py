@@ -0,0 +1,124 @@
+"""
+test_store.py - tests the columnar location store.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+import io
+
+import pytest
+
+from adhan import methods
+from adhan.store import LocationStore
+
+SITES_CSV = """id,latitude,longitude,method,timezone_offset
+42,30.25,-97.75,isna,-6
+7,21.42,39.83,makkah,3
+1000,-33.87,151.21,,10
+3,57.48,-4.22,muslim_world_league:hanafi:angle_based,
+"""
+
+
+def _store():
+    """Load the sites above."""
+    return LocationStore.from_csv(io.StringIO(SITES_CSV), method='karachi')
+
+
+def test_load_csv_columns():
+    """Test that the columns hold the file in order."""
+    store = _store()
+
+    assert len(store) == 4
+    assert list(store.ids) == [42, 7, 1000, 3]
+    assert list(store.latitudes) == [30.25, 21.42, -33.87, 57.48]
+    assert list(store.longitudes) == [-97.75, 39.83, 151.21, -4.22]
+    assert store.timezones == [0, -6, 3, 10]
+    assert [store.timezones[code] for code in store.timezone_codes] == \
+        [-6, 3, 10, 0]
+
+
+def test_methods_are_interned():
+    """Test that each distinct method is compiled once and shared."""
+    store = _store()
+
+    assert store.lookup(1000).parameters == \
+        methods.compile_method(methods.KARACHI)
+    assert store.lookup(3).parameters == methods.compile_method(dict(
+        methods.MUSLIM_WORLD_LEAGUE, **dict(methods.ASR_HANAFI,
+                                             **methods.ANGLE_BASED)
+    ))
+
+    assert store.method_code('isna') == store.method_code(methods.ISNA)
+    assert store.add(5, 0.0, 0.0, 'isna:standard') == 4
+    assert len(store.plans) == 4
+    assert store.method_codes[0] == store.method_codes[4]
+
+
+def test_lookup_by_id():
+    """Test that sites are found by id, whatever order they were added."""
+    store = _store()
+
+    site = store.lookup(7)
+    assert (site.id, site.latitude, site.longitude) == (7, 21.42, 39.83)
+    assert site.parameters == methods.compile_method(methods.MAKKAH)
+    assert site.timezone_offset == 3
+    assert store.row(3) == 3
+    assert tuple(store.location(0)) == (30.25, -97.75)
+
+    with pytest.raises(KeyError):
+        store.lookup(8)
+
+    store.add(8, 1.0, 2.0)
+    assert store.lookup(8).latitude == 1.0
+
+    store.add(8, 1.0, 2.0)
+    with pytest.raises(ValueError):
+        store.lookup(8)
+
+
+@pytest.mark.parametrize('text', [
+    'latitude,longitude\n1,2\n',
+    'id,latitude,longitude\nx,1,2\n',
+    'id,latitude,longitude,method\n1,1,2,unknown\n',
+    'id,latitude,longitude,method\n1,1,2,isna:sideways\n',
+    'id,latitude,longitude,method\n1,1,2\n',
+    'id,latitude,longitude,method,timezone_offset\n1,1,2,isna\n',
+])
+def test_invalid_files(text):
+    """Test that missing columns and bad values raise ValueError."""
+    store = LocationStore()
+    with pytest.raises(ValueError):
+        store.load_csv(io.StringIO(text))
+    assert len(store) == 0
+
+
+def test_extra_methods():
+    """Test that extra method names are looked up first."""
+    custom = {'fajr_angle': 12, 'isha_angle': 12}
+    store = LocationStore(methods={'local': custom, 'isna': methods.MAKKAH})
+
+    store.add(1, 0.0, 0.0, 'local')
+    store.add(2, 0.0, 0.0, 'isna')
+
+    assert store.lookup(1).parameters == methods.compile_method(custom)
+    assert store.lookup(2).parameters == methods.compile_method(methods.MAKKAH)
+
+
+def test_short_row_reports_line():
+    """Test that a row missing an optional column names its line."""
+    text = 'id,latitude,longitude,method\n1,1,2,isna\n2,3,4\n'
+    with pytest.raises(ValueError, match='line 3'):
+        LocationStore().load_csv(io.StringIO(text))
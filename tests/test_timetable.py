@@ -0,0 +1,125 @@
+"""
+test_timetable.py - tests streaming timetables.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+from datetime import date, datetime, timedelta
+from types import GeneratorType
+
+import pytest
+
+from adhan import adhan, methods
+from adhan.timetable import TimetableFile, iter_times, write_timetable
+
+
+def test_iter_times_is_lazy():
+    """Test that iter_times returns a generator rather than a list."""
+    result = iter_times((30.25, -97.75), methods.ISNA, date(2016, 1, 1),
+                        date(2116, 1, 1))
+
+    assert isinstance(result, GeneratorType)
+    assert next(result).day == date(2016, 1, 1)
+
+
+def test_iter_times_matches_adhan():
+    """Test that streamed rows match adhan() across year and leap days."""
+    location = (30.25, -97.75)
+    parameters = dict(methods.MUSLIM_WORLD_LEAGUE, **methods.ASR_HANAFI)
+    start, end = date(2015, 12, 25), date(2017, 1, 5)
+
+    rows = list(iter_times(location, parameters, start, end, -6))
+
+    assert len(rows) == (end - start).days + 1
+    for row in rows:
+        expected = adhan(row.day, location, parameters, -6)
+        midnight = datetime(row.day.year, row.day.month, row.day.day)
+        for name, value in expected.items():
+            actual = midnight + timedelta(minutes=getattr(row, name))
+            assert actual == value, \
+                '%s on %s: expected %s, actual %s' % (
+                    name, row.day, value, actual
+                )
+
+
+def test_timetable_file_round_trip(tmpdir):
+    """Test that a written timetable file reads back the streamed rows."""
+    path = str(tmpdir.join('austin.adhan'))
+    parameters = dict(methods.MAKKAH, **methods.ASR_HANAFI)
+    start, end = date(2016, 1, 1), date(2018, 12, 31)
+
+    write_timetable(path, (30.25, -97.75), parameters, start, end, -6)
+
+    with TimetableFile(path) as timetable:
+        assert len(timetable) == (end - start).days + 1
+        assert (timetable.start, timetable.end) == (start, end)
+        assert tuple(timetable.location) == (30.25, -97.75)
+        assert timetable.timezone_offset == -6
+        assert timetable.parameters == {
+            'fajr_angle': 18.5, 'isha_delay': 1.5, 'asr_multiplier': 2,
+        }
+
+        expected = list(
+            iter_times((30.25, -97.75), parameters, start, end, -6)
+        )
+        assert list(timetable) == expected
+        assert timetable.lookup(date(2017, 6, 1)) == \
+            expected[(date(2017, 6, 1) - start).days]
+
+
+def test_timetable_file_high_latitude_rule(tmpdir):
+    """Test that the high latitude rule is kept in the file header."""
+    path = str(tmpdir.join('inverness.adhan'))
+    parameters = dict(methods.MUSLIM_WORLD_LEAGUE, **methods.ONE_SEVENTH)
+    start, end = date(2016, 6, 1), date(2016, 6, 30)
+
+    write_timetable(path, (57.48, -4.22), parameters, start, end)
+
+    with TimetableFile(path) as timetable:
+        assert timetable.parameters == dict(parameters, asr_multiplier=1)
+        assert list(timetable) == \
+            list(iter_times((57.48, -4.22), parameters, start, end))
+
+
+def test_timetable_file_lookup_out_of_range(tmpdir):
+    """Test that looking up a day outside the timetable raises KeyError."""
+    path = str(tmpdir.join('austin.adhan'))
+    write_timetable(path, (30.25, -97.75), methods.ISNA,
+                    date(2016, 1, 1), date(2016, 1, 31))
+
+    with TimetableFile(path) as timetable:
+        assert date(2016, 2, 1) not in timetable
+        with pytest.raises(KeyError):
+            timetable.lookup(date(2016, 2, 1))
+
+
+def test_write_timetable_rejects_reversed_range(tmpdir):
+    """Test that a timetable ending before it starts is not written."""
+    path = tmpdir.join('austin.adhan')
+
+    with pytest.raises(ValueError):
+        write_timetable(str(path), (30.25, -97.75), methods.ISNA,
+                        date(2016, 1, 31), date(2016, 1, 1))
+    assert not path.exists()
+
+
+def test_timetable_file_rejects_other_files(tmpdir):
+    """Test that opening a file that isn't a timetable raises ValueError."""
+    path = tmpdir.join('other.adhan')
+    path.write_binary(b'x' * 100)
+
+    with pytest.raises(ValueError):
+        TimetableFile(str(path))
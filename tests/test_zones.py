@@ -0,0 +1,115 @@
+"""
+test_zones.py - tests time zone support.
+
+Copyright (C) 2015  Zuhair Parvez
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+from datetime import date, datetime, timedelta, timezone
+
+from zoneinfo import ZoneInfo
+
+from adhan import adhan, methods, PrayerCalculator
+from adhan.timetable import iter_times
+from adhan.zones import ZONE_TRANSITIONS_CACHE, zone_transitions
+
+AUSTIN = (30.25, -97.75)
+
+PARAMETERS = dict(methods.ISNA, **methods.ASR_STANDARD)
+
+
+def _expected(day, zone):
+    """Localize the UTC datetimes of adhan() with a full tz conversion."""
+    return dict(
+        (name, time.replace(tzinfo=timezone.utc).astimezone(zone))
+        for name, time in adhan(day, AUSTIN, PARAMETERS).items()
+    )
+
+
+def _assert_same_local_times(result, expected):
+    """Check wall time, fold and instant of aware datetimes all match."""
+    assert result == expected
+    for name, time in result.items():
+        assert time.replace(tzinfo=None) == \
+            expected[name].replace(tzinfo=None)
+        assert time.fold == expected[name].fold
+        assert time.utcoffset() == expected[name].utcoffset()
+
+
+def test_zone_matches_tz_conversion():
+    """Test zoned datetimes against a tz conversion for a whole year."""
+    zone = ZoneInfo('America/Chicago')
+    day = date(2016, 1, 1)
+    while day.year == 2016:
+        _assert_same_local_times(
+            adhan(day, AUSTIN, PARAMETERS, 'America/Chicago'),
+            _expected(day, zone)
+        )
+        day += timedelta(days=1)
+
+
+def test_transition_between_prayers():
+    """Test days when the clocks change between Maghrib and Isha."""
+    zone = ZoneInfo('Europe/London')
+
+    spring = adhan(date(2016, 3, 26), AUSTIN, PARAMETERS, zone)
+    assert spring['maghrib'].utcoffset() == timedelta(0)
+    assert spring['isha'].utcoffset() == timedelta(hours=1)
+    _assert_same_local_times(spring, _expected(date(2016, 3, 26), zone))
+
+    #
+    # After the clocks go back, an hour of local times happens twice
+    #
+    autumn_day = date(2016, 10, 29)
+    autumn = adhan(autumn_day, AUSTIN, PARAMETERS, zone)
+    _assert_same_local_times(autumn, _expected(autumn_day, zone))
+
+    transitions = zone_transitions(zone, 2016)
+    assert datetime(2016, 10, 30, 1, tzinfo=timezone.utc).timestamp() in \
+        transitions.instants
+    offsets = transitions.day_offsets(date(2016, 10, 30), [60, 90, 120])
+    assert offsets == [(0, 1), (0, 1), (0, 0)]
+    offsets = transitions.day_offsets(date(2016, 10, 30), [30])
+    assert offsets == [(3600, 0)]
+
+
+def test_zone_minutes_and_hours():
+    """Test that minute and hour outputs use each prayer's own offset."""
+    day = date(2016, 3, 26)
+    result = adhan(day, AUSTIN, PARAMETERS, 'Europe/London', output='minutes')
+    utc = adhan(day, AUSTIN, PARAMETERS, output='minutes')
+    assert result.maghrib == utc.maghrib
+    assert result.isha == utc.isha + 60
+
+    hours = adhan(day, AUSTIN, PARAMETERS, 'Europe/London', output='hours')
+    utc_hours = adhan(day, AUSTIN, PARAMETERS, output='hours')
+    assert hours.maghrib == utc_hours.maghrib
+    assert hours.isha == utc_hours.isha + 1
+
+
+def test_zone_timetable_caches_transitions():
+    """Test that a year of zoned rows reuses one transition table."""
+    ZONE_TRANSITIONS_CACHE.clear()
+    calculator = PrayerCalculator(AUSTIN, PARAMETERS, 'America/Chicago')
+
+    rows = iter_times(AUSTIN, PARAMETERS, date(2016, 1, 1),
+                      date(2016, 12, 31), 'America/Chicago')
+    for row in rows:
+        assert row.to_datetimes() == dict(
+            (name, time.replace(tzinfo=None))
+            for name, time in calculator.times(row.day).items()
+        )
+
+    assert ZONE_TRANSITIONS_CACHE.misses == 1